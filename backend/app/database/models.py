@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal, Optional
 from datetime import datetime
 from uuid import UUID
 
@@ -35,6 +35,7 @@ class SingleProductRequest(BaseModel):
     """Request model for single product analysis"""
     patent_id: str
     product: Dict
+    bypass_cache: bool = False
 
 class InfringingProduct(BaseModel):
     """Model for product infringement analysis results"""
@@ -52,9 +53,35 @@ class InfringementRequest(BaseModel):
     Attributes:
         patent_id: Identifier of the patent to analyze against
         company_name: Name of the company whose products will be analyzed
+        bypass_cache: Skip the cached result and run a fresh analysis
+        strategy: "single_prompt" analyzes all products in one generation,
+            "fanout" analyzes each product concurrently and merges the results,
+            "two_phase" scores all products briefly and fully analyzes the top 2
     """
     patent_id: str
     company_name: str
+    bypass_cache: bool = False
+    strategy: Literal["single_prompt", "fanout", "two_phase"] = "single_prompt"
+
+class BatchPair(BaseModel):
+    """A (patent, company) pair in a batch analysis"""
+    patent_id: str
+    company_name: str
+
+class BatchRequest(BaseModel):
+    """
+    Request model for analyzing many patent/company pairs at once.
+    
+    Attributes:
+        pairs: Pairs to analyze; repeated pairs are analyzed once
+        strategy: Analysis strategy used for every pair
+        bypass_cache: Skip cached results and run fresh analyses
+        concurrency: Pairs analyzed at the same time (defaults to BATCH_CONCURRENCY)
+    """
+    pairs: List[BatchPair] = Field(min_length=1, max_length=500)
+    strategy: Literal["single_prompt", "fanout", "two_phase"] = "single_prompt"
+    bypass_cache: bool = False
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
 
 class InfringementAnalysis(BaseModel):
     """
@@ -67,6 +94,10 @@ class InfringementAnalysis(BaseModel):
         analysis_date: Timestamp of the analysis
         top_infringing_products: List of most likely infringing products
         overall_risk_assessment: Overall risk level assessment
+        partial: True if some products timed out or failed (fan-out and two-phase strategies)
+        timed_out_products: Names of products cut off by the fan-out deadline
+        failed_products: Products whose analysis failed, as {"product_name", "error"}
+        screening_scores: Phase-one score of every product (two-phase strategy only)
     """
     analysis_id: str
     patent_id: str
@@ -74,7 +105,47 @@ class InfringementAnalysis(BaseModel):
     analysis_date: datetime
     top_infringing_products: List[Dict]  # List[InfringingProduct]
     overall_risk_assessment: str
+    partial: bool = False
+    timed_out_products: List[str] = []
+    failed_products: List[Dict] = []
+    screening_scores: List[Dict] = []
+    
+class ScreeningRequest(BaseModel):
+    """
+    Request model for screening a patent against every product in the catalog.
     
+    Attributes:
+        patent_id: Identifier of the patent to screen
+        top_k: Number of most similar products sent to full LLM analysis
+        bypass_cache: Skip cached analyses of the candidates
+    """
+    patent_id: str
+    top_k: int = Field(default=5, ge=1, le=50)
+    bypass_cache: bool = False
+
+class ScreenedProduct(BaseModel):
+    """A screening candidate with its similarity and LLM analysis"""
+    company_name: str
+    product_name: str
+    similarity: float
+    analysis: Optional[Dict] = None  # InfringingProduct
+    error: Optional[str] = None
+
+class ScreeningResult(BaseModel):
+    """
+    Catalog screening result for a patent.
+    
+    Attributes:
+        patent_id: Identifier of the screened patent
+        analysis_date: Timestamp of the screening
+        products_screened: Number of catalog products scored by similarity
+        candidates: Top-k products ordered by infringement score, then similarity
+    """
+    patent_id: str
+    analysis_date: datetime
+    products_screened: int
+    candidates: List[ScreenedProduct]
+
 class SearchMatch(BaseModel):
     """Single search result"""
     confidence: float
@@ -87,6 +158,66 @@ class SearchResponse(BaseModel):
     matches: List[SearchMatch]
     suggestion: Optional[str] = None
 
+class BatchSearchRequest(BaseModel):
+    """
+    Request model for resolving many search queries at once.
+    
+    Attributes:
+        queries: Search strings, answered in the same order
+        target: "company" names, "patent" publication numbers or "patent_title" titles
+        threshold: Minimum confidence of a match
+        limit: Maximum matches per query
+    """
+    queries: List[str] = Field(min_length=1, max_length=1000)
+    target: Literal["company", "patent", "patent_title"] = "company"
+    threshold: int = Field(default=60, ge=0, le=100)
+    limit: int = Field(default=5, ge=1, le=20)
+
+class BatchSearchResponse(BaseModel):
+    """Batch search response, one result per query"""
+    results: List[SearchResponse]
+
+class FullTextMatch(BaseModel):
+    """Single full-text search result"""
+    publication_number: str
+    title: str
+    score: float
+    abstract: Optional[str] = None
+
+class FullTextSearchResponse(BaseModel):
+    """
+    Full-text search response.
+    
+    Attributes:
+        query: The query as sent
+        total: Number of patents matching the query
+        matches: Best matches by BM25 score
+    """
+    query: str
+    total: int
+    matches: List[FullTextMatch]
+
+class SemanticSearchRequest(BaseModel):
+    """
+    Request model for finding patents similar to a text.
+    
+    Attributes:
+        text: Product description or any other text to compare patents with
+        limit: Maximum number of patents to return
+    """
+    text: str = Field(min_length=1)
+    limit: int = Field(default=10, ge=1, le=100)
+
+class SemanticMatch(BaseModel):
+    """Single semantic search result"""
+    publication_number: str
+    title: str
+    similarity: float
+
+class SemanticSearchResponse(BaseModel):
+    """Semantic search response, most similar patents first"""
+    matches: List[SemanticMatch]
+
 class SavedProduct(BaseModel):
     """Product in analysis result"""
     product_name: str
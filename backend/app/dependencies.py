@@ -0,0 +1,142 @@
+import gc
+import os
+import threading
+from typing import Optional
+from fastapi import HTTPException
+from app.services.analyzer_service import AnalyzerService
+from app.services.background_build import BackgroundBuild
+from app.services.data_service import DataService
+from app.services.fulltext_index import FullTextIndex, patent_documents
+from app.services.fuzzy_matcher import FuzzyMatcher
+from app.services.job_service import JobQueue
+from app.services.screening_service import ProductScreener
+from app.services.semantic_index import SemanticIndex, patent_texts
+
+# Process-wide service instances, created on first use and shared by all routers
+_lock = threading.Lock()
+_data_service: Optional[DataService] = None
+_analyzer_service: Optional[AnalyzerService] = None
+_matcher: Optional[FuzzyMatcher] = None
+_screener: Optional[ProductScreener] = None
+_job_queue: Optional[JobQueue] = None
+
+def get_data_service() -> DataService:
+    """Shared DataService, loading the corpus on first use"""
+    global _data_service
+    if _data_service is None:
+        with _lock:
+            if _data_service is None:
+                _data_service = DataService()
+    return _data_service
+
+def get_analyzer_service() -> AnalyzerService:
+    """Shared AnalyzerService backed by the shared DataService"""
+    global _analyzer_service
+    if _analyzer_service is None:
+        data_service = get_data_service()
+        with _lock:
+            if _analyzer_service is None:
+                _analyzer_service = AnalyzerService(data_service=data_service)
+    return _analyzer_service
+
+def get_matcher() -> FuzzyMatcher:
+    """Shared FuzzyMatcher over the shared DataService"""
+    global _matcher
+    if _matcher is None:
+        data_service = get_data_service()
+        with _lock:
+            if _matcher is None:
+                _matcher = FuzzyMatcher(data_service)
+    return _matcher
+
+def get_screener() -> ProductScreener:
+    """Shared ProductScreener over the shared DataService's catalog"""
+    global _screener
+    if _screener is None:
+        data_service = get_data_service()
+        with _lock:
+            if _screener is None:
+                _screener = ProductScreener(data_service)
+    return _screener
+
+def get_job_queue() -> JobQueue:
+    """Shared queue of background company analyses, with its persisted jobs loaded on first use"""
+    global _job_queue
+    if _job_queue is None:
+        # The handler lives with the analysis routes, which import this module
+        from app.routers.analysis import run_company_job
+        with _lock:
+            if _job_queue is None:
+                _job_queue = JobQueue.from_env(run_company_job)
+    return _job_queue
+
+def _build_fulltext_index() -> FullTextIndex:
+    index = FullTextIndex.from_env()
+    changes = index.sync(patent_documents(get_data_service()))
+    print(f"Full-text index synced: {changes}")
+    return index
+
+# Syncing reads every patent's claims and description, so it runs in the background
+fulltext_build: BackgroundBuild[FullTextIndex] = BackgroundBuild("full-text index", _build_fulltext_index)
+
+def get_fulltext_index() -> FullTextIndex:
+    """
+    Shared full-text index, loaded from disk and synced with the shared DataService
+    in the background; requests get a 503 until it is ready.
+    """
+    index = fulltext_build.get()
+    if index is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Full-text index is still being built, retry shortly",
+            headers={"Retry-After": "30"}
+        )
+    return index
+
+def _build_semantic_index() -> SemanticIndex:
+    index = SemanticIndex.from_env()
+    changes = index.sync(patent_texts(get_data_service()))
+    print(f"Semantic index synced: {changes}")
+    return index
+
+# A first build embeds the whole corpus, which takes minutes at a million patents
+semantic_build: BackgroundBuild[SemanticIndex] = BackgroundBuild("semantic index", _build_semantic_index)
+
+def get_semantic_index() -> SemanticIndex:
+    """
+    Shared embedding index, loaded from disk and re-embedding patents changed in the
+    shared DataService in the background; requests get a 503 until it is ready.
+    """
+    index = semantic_build.get()
+    if index is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Semantic index is still being built, retry shortly",
+            headers={"Retry-After": "60"}
+        )
+    return index
+
+def preload():
+    """
+    Load the corpus and build the search structures now instead of on first request.
+    gc.freeze() moves everything loaded so far into a permanent generation so the
+    garbage collector does not write to those pages, which keeps them shared
+    copy-on-write between forked workers (gunicorn --preload).
+    """
+    get_data_service()
+    get_matcher()
+    get_screener()
+    gc.freeze()
+
+def start_index_builds():
+    """Start building the search indexes in the background, ahead of their first request"""
+    fulltext_build.start()
+    semantic_build.start()
+
+def index_builds_enabled() -> bool:
+    """Whether SEARCH_INDEX_PRELOAD asks for the search indexes to be built at startup"""
+    return os.getenv("SEARCH_INDEX_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+def preload_enabled() -> bool:
+    """Whether PRELOAD_DATA asks for the corpus to be loaded at import time"""
+    return os.getenv("PRELOAD_DATA", "false").lower() in ("1", "true", "yes")
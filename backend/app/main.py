@@ -1,10 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import analysis, search, reports
+from .routers import analysis, search, semantic_search, reports
+from .dependencies import get_analyzer_service, get_job_queue, index_builds_enabled, preload, preload_enabled, start_index_builds
 from dotenv import load_dotenv
+import os
 
 load_dotenv()
 
+# With PRELOAD_DATA the corpus is loaded at import time, before a preloading
+# server (gunicorn --preload) forks its workers, so they share it copy-on-write
+if preload_enabled():
+    preload()
+
 app = FastAPI(title="Patent Infringement Analysis API")
 
 # Configure CORS
@@ -19,8 +26,33 @@ app.add_middleware(
 # Include routers
 app.include_router(analysis.router)
 app.include_router(search.router)
+app.include_router(semantic_search.router)
 app.include_router(reports.router)
 
+@app.on_event("startup")
+async def start_services():
+    """
+    Load the corpus, start background analysis workers, analysis cache flushing,
+    LLM health checks and search index builds, and preload the model
+    """
+    preload()
+    if index_builds_enabled():
+        start_index_builds()
+    await get_job_queue().start()
+    analyzer_service = get_analyzer_service()
+    await analyzer_service.cache.start()
+    await analyzer_service.client.start()
+    if os.getenv("OLLAMA_PRELOAD", "true").lower() in ("1", "true", "yes"):
+        await analyzer_service.model_keeper.start()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    """Stop background workers, write pending cache changes and release pooled LLM connections"""
+    await get_job_queue().stop()
+    await get_analyzer_service().cache.stop()
+    await get_analyzer_service().model_keeper.stop()
+    await get_analyzer_service().client.aclose()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
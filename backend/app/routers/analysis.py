@@ -1,54 +1,359 @@
-from fastapi import APIRouter, HTTPException, Body
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Body, Query, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.database.models import (
     InfringementRequest,
     InfringementAnalysis,
     SingleProductRequest,
-    InfringingProduct
+    InfringingProduct,
+    ScreeningRequest,
+    ScreeningResult,
+    BatchRequest
 )
 from app.services.analyzer_service import AnalyzerService, AnalyzerError
 from app.services.data_service import DataService
-from app.services.fuzzy_matcher import FuzzyMatcher
-from typing import List
+from app.services.screening_service import ProductScreener
+from app.dependencies import get_data_service, get_analyzer_service, get_job_queue, get_screener
+from app.services.job_service import JobQueue, QueueFullError
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import time
 import uuid
 from datetime import datetime
 
 router = APIRouter(prefix="/api/analysis", tags=["analysis"])
 
-# Initialize services
-data_service = DataService()
-analyzer_service = AnalyzerService()
-matcher = FuzzyMatcher(data_service)
+async def run_company_analysis(
+    request: InfringementRequest,
+    progress: Optional[Callable[[float], None]] = None
+) -> Dict:
+    """
+    Analyze all products of a company against a patent.
+    Returns {"status_code", "data"} where data is an InfringementAnalysis payload,
+    or {"status_code", "error"} on failure.
+    """
+    data_service = get_data_service()
+    patent = data_service.get_patent(request.patent_id)
+    if not patent:
+        return {
+            "status_code": 404,
+            "error": f"Patent with ID {request.patent_id} not found"
+        }
+        
+    company = data_service.get_company(request.company_name)
+    if not company:
+        return {
+            "status_code": 404,
+            "error": f"Company {request.company_name} not found"
+        }
+    return await analyze_company(request, patent, company, progress)
+
+async def analyze_company(
+    request: InfringementRequest,
+    patent: Dict,
+    company: Dict,
+    progress: Optional[Callable[[float], None]] = None
+) -> Dict:
+    """Analyze all products of an already resolved company against an already resolved patent"""
+    analyzer_service = get_analyzer_service()
+    if progress:
+        progress(0.1)
+    if request.strategy == "fanout":
+        result = await analyzer_service.analyze_products_fanout_async(
+            patent,
+            company["products"],
+            use_cache=not request.bypass_cache,
+            progress=(lambda value: progress(0.1 + 0.9 * value)) if progress else None
+        )
+    elif request.strategy == "two_phase":
+        result = await analyzer_service.analyze_products_two_phase_async(
+            patent,
+            company["products"],
+            use_cache=not request.bypass_cache,
+            progress=(lambda value: progress(0.1 + 0.9 * value)) if progress else None
+        )
+    else:
+        result = await analyzer_service.analyze_multiple_products_async(
+            patent,
+            company["products"],
+            use_cache=not request.bypass_cache
+        )
+    if "error" in result:
+        return result
+
+    analysis = _build_company_analysis(request, result["data"])
+    if request.strategy in ("fanout", "two_phase"):
+        analysis["partial"] = result["partial"]
+        analysis["timed_out_products"] = result["timed_out"]
+        analysis["failed_products"] = result["failed"]
+    if request.strategy == "two_phase":
+        analysis["screening_scores"] = result["screening"]
+    return {
+        "status_code": 200,
+        "data": analysis
+    }
+
+async def run_screening(
+    request: ScreeningRequest,
+    data_service: DataService,
+    analyzer_service: AnalyzerService,
+    screener: ProductScreener
+) -> Dict:
+    """
+    Screen every catalog product against a patent by TF-IDF similarity and run
+    the full single-product analysis on the top_k candidates only, at most
+    FANOUT_CONCURRENCY at a time.
+    """
+    patent = data_service.get_patent(request.patent_id)
+    if not patent:
+        return {
+            "status_code": 404,
+            "error": f"Patent with ID {request.patent_id} not found"
+        }
+
+    candidates = screener.screen(patent, request.top_k)
+    semaphore = asyncio.Semaphore(analyzer_service.fanout_concurrency)
+
+    async def analyze(candidate: Dict) -> Dict:
+        async with semaphore:
+            result = await analyzer_service.analyze_single_product_async(
+                patent,
+                candidate["product"],
+                use_cache=not request.bypass_cache
+            )
+        return {
+            "company_name": candidate["company_name"],
+            "product_name": candidate["product"].get("name", ""),
+            "similarity": candidate["similarity"],
+            "analysis": result.get("data"),
+            "error": result.get("error"),
+        }
+
+    screened = await asyncio.gather(*(analyze(candidate) for candidate in candidates))
+    screened.sort(key=lambda c: (
+        -((c["analysis"] or {}).get("infringement_score") or 0),
+        -c["similarity"]
+    ))
+    return {
+        "status_code": 200,
+        "data": {
+            "patent_id": request.patent_id,
+            "analysis_date": datetime.now().isoformat(),
+            "products_screened": len(screener.catalog),
+            "candidates": screened,
+        }
+    }
+
+async def run_batch(request: BatchRequest) -> AsyncIterator[Dict]:
+    """
+    Analyze many patent/company pairs through a bounded pool of concurrent analyses.
+    Pairs are grouped by patent: each patent is looked up and its claims are
+    formatted and indexed once, and its pairs are queued back to back, so they
+    reuse its prompt prefix (and prefix session) while it is still warm.
+    Repeated pairs run once and their result is reported for every occurrence.
+    Yields a "start" event, one "pair" event per requested pair as soon as its
+    analysis finishes, and a closing "summary" event with throughput figures.
+    """
+    data_service = get_data_service()
+    analyzer_service = get_analyzer_service()
+    groups: Dict[str, Dict[str, List[int]]] = {}
+    for index, pair in enumerate(request.pairs):
+        groups.setdefault(pair.patent_id, {}).setdefault(pair.company_name.lower(), []).append(index)
+    unique_pairs = sum(len(companies) for companies in groups.values())
+    concurrency = request.concurrency or int(os.getenv("BATCH_CONCURRENCY", "4"))
+    # The semaphore wakes waiters in order, so pairs start in the grouped order
+    semaphore = asyncio.Semaphore(concurrency)
+    patents: Dict[str, Optional[Dict]] = {}
+
+    def patent_for(patent_id: str) -> Optional[Dict]:
+        """Look up and prepare a patent on its first pair"""
+        if patent_id not in patents:
+            patent = data_service.get_patent(patent_id)
+            if patent:
+                analyzer_service.prepare_patent(patent)
+            patents[patent_id] = patent
+        return patents[patent_id]
+
+    async def analyze(patent_id: str, indexes: List[int]) -> Tuple[List[int], Dict]:
+        pair = request.pairs[indexes[0]]
+        async with semaphore:
+            patent = patent_for(patent_id)
+            company = data_service.get_company(pair.company_name)
+            if not patent:
+                result = {"status_code": 404, "error": f"Patent with ID {patent_id} not found"}
+            elif not company:
+                result = {"status_code": 404, "error": f"Company {pair.company_name} not found"}
+            else:
+                result = await analyze_company(InfringementRequest(
+                    patent_id=pair.patent_id,
+                    company_name=pair.company_name,
+                    bypass_cache=request.bypass_cache,
+                    strategy=request.strategy
+                ), patent, company)
+        return indexes, result
+
+    started = time.perf_counter()
+    completed = failed = 0
+    yield {
+        "event": "start",
+        "pairs": len(request.pairs),
+        "unique_pairs": unique_pairs,
+        "patents": len(groups),
+        "concurrency": concurrency
+    }
+    tasks = [
+        asyncio.ensure_future(analyze(patent_id, indexes))
+        for patent_id, companies in groups.items()
+        for indexes in companies.values()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, result = await next_done
+            for index in indexes:
+                pair = request.pairs[index]
+                event = {
+                    "event": "pair",
+                    "index": index,
+                    "patent_id": pair.patent_id,
+                    "company_name": pair.company_name,
+                    "status_code": result["status_code"],
+                }
+                if "error" in result:
+                    failed += 1
+                    event["error"] = result["error"]
+                else:
+                    completed += 1
+                    event["data"] = result["data"]
+                yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "summary",
+        "pairs": len(request.pairs),
+        "unique_pairs": unique_pairs,
+        "completed": completed,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 3),
+        "pairs_per_minute": round(len(request.pairs) / elapsed * 60, 2) if elapsed else None
+    }
+
+def _build_company_analysis(request: InfringementRequest, top_products: List[Dict]) -> Dict:
+    """Wrap the top infringing products in an InfringementAnalysis payload"""
+    return {
+        "analysis_id": str(uuid.uuid4()),
+        "patent_id": request.patent_id,
+        "company_name": request.company_name,
+        "analysis_date": datetime.now().isoformat(),
+        "top_infringing_products": top_products,
+        "overall_risk_assessment": "High risk" if any(
+            p["infringement_likelihood"] == "High" 
+            for p in top_products
+        ) else "Moderate risk"
+    }
+
+async def _ndjson_events(events: AsyncIterator[Dict], finalize: Callable[[Dict], Dict]) -> AsyncIterator[str]:
+    """
+    Serialize analysis events as NDJSON lines.
+    A "start" line is sent immediately and finalize() shapes the payload of the "result" event.
+    """
+    yield json.dumps({"event": "start"}) + "\n"
+    async for event in events:
+        if event["event"] == "result":
+            event = {"event": "result", "data": finalize(event["data"]["data"])}
+        yield json.dumps(event) + "\n"
+
+def _lookup_error(request: InfringementRequest) -> Optional[JSONResponse]:
+    """Return a 404 response if the patent or company does not exist"""
+    data_service = get_data_service()
+    if not data_service.get_patent(request.patent_id):
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"Patent with ID {request.patent_id} not found"}
+        )
+    if not data_service.get_company(request.company_name):
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"Company {request.company_name} not found"}
+        )
+    return None
+
+async def run_company_job(payload: Dict, progress: Callable[[float], None]) -> Dict:
+    """Job queue handler for background company analyses"""
+    return await run_company_analysis(InfringementRequest(**payload), progress)
+
+def _company_job_key(request: InfringementRequest) -> str:
+    """Identical in-flight company analyses share one job"""
+    return "|".join([
+        "company",
+        get_analyzer_service().model,
+        request.patent_id,
+        request.company_name.lower(),
+        request.strategy,
+        str(request.bypass_cache)
+    ])
+
+def _job_view(job: Dict) -> Dict:
+    """Public representation of a job record"""
+    started_at = job["started_at"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "request": job["payload"],
+        "created_at": datetime.fromtimestamp(job["created_at"]).isoformat(),
+        "started_at": datetime.fromtimestamp(started_at).isoformat() if started_at else None,
+        "finished_at": datetime.fromtimestamp(job["finished_at"]).isoformat() if job["finished_at"] else None,
+        "wait_seconds": (started_at or time.time()) - job["created_at"],
+        "status_code": job["status_code"],
+        "result": job["result"],
+        "error": job["error"],
+    }
 
 @router.post("/company", response_model=InfringementAnalysis)
-def analyze_patent_infringement(
+async def analyze_patent_infringement(
     request: InfringementRequest = Body(
         example={
             "patent_id": "US-RE49889-E1",
             "company_name": "Walmart Inc."
         }
-    )
+    ),
+    stream: bool = Query(default=False),
+    data_service: DataService = Depends(get_data_service),
+    analyzer_service: AnalyzerService = Depends(get_analyzer_service)
 ):
     """
     Analyze potential patent infringement for a company's products.
     Returns top 2 potentially infringing products with detailed analysis.
+    Set strategy="fanout" to analyze each product concurrently under a deadline,
+    or strategy="two_phase" to score all products briefly and fully analyze only the top 2.
+    With stream=true the response is NDJSON: generated tokens, each product as it
+    completes, and a final result event with the full analysis.
     """
     try:
-        patent = data_service.get_patent(request.patent_id)
-        if not patent:
+        if stream and request.strategy != "single_prompt":
             return JSONResponse(
-                status_code=404,
-                content={"error": f"Patent with ID {request.patent_id} not found"}
+                status_code=400,
+                content={"error": "Streaming is only supported for the single_prompt strategy"}
             )
-            
-        company = data_service.get_company(request.company_name)
-        if not company:
-            return JSONResponse(
-                status_code=404,
-                content={"error": f"Company {request.company_name} not found"}
+        if stream:
+            error_response = _lookup_error(request)
+            if error_response:
+                return error_response
+            events = analyzer_service.stream_multiple_products(
+                data_service.get_patent(request.patent_id),
+                data_service.get_company(request.company_name)["products"],
+                use_cache=not request.bypass_cache
             )
-            
-        result = analyzer_service.analyze_multiple_products(patent, company["products"])
+            return StreamingResponse(
+                _ndjson_events(events, lambda data: _build_company_analysis(request, data)),
+                media_type="application/x-ndjson"
+            )
+
+        result = await run_company_analysis(request)
         
         if "error" in result:
             return JSONResponse(
@@ -58,17 +363,7 @@ def analyze_patent_infringement(
             
         return JSONResponse(
             status_code=200,
-            content={
-                "analysis_id": str(uuid.uuid4()),
-                "patent_id": request.patent_id,
-                "company_name": request.company_name,
-                "analysis_date": datetime.now().isoformat(),
-                "top_infringing_products": result["data"],
-                "overall_risk_assessment": "High risk" if any(
-                    p["infringement_likelihood"] == "High" 
-                    for p in result["data"]
-                ) else "Moderate risk"
-            }
+            content=result["data"]
         )
         
     except Exception as e:
@@ -78,7 +373,7 @@ def analyze_patent_infringement(
         )
 
 @router.post("/product", response_model=InfringingProduct)
-def analyze_product_infringement(
+async def analyze_product_infringement(
     request: SingleProductRequest = Body(
         example={
             "patent_id": "US-RE49889-E1",
@@ -87,11 +382,15 @@ def analyze_product_infringement(
                 "description": "Mobile application with integrated shopping list and advertisement features"
             }
         }
-    )
+    ),
+    stream: bool = Query(default=False),
+    data_service: DataService = Depends(get_data_service),
+    analyzer_service: AnalyzerService = Depends(get_analyzer_service)
 ):
     """
     Analyze potential patent infringement for a single product.
     Returns detailed analysis of infringement likelihood.
+    With stream=true the response is NDJSON: generated tokens and a final result event.
     """
     try:
         patent = data_service.get_patent(request.patent_id)
@@ -101,7 +400,22 @@ def analyze_product_infringement(
                 content={"error": f"Patent with ID {request.patent_id} not found"}
             )
             
-        result = analyzer_service.analyze_single_product(patent, request.product)
+        if stream:
+            events = analyzer_service.stream_single_product(
+                patent,
+                request.product,
+                use_cache=not request.bypass_cache
+            )
+            return StreamingResponse(
+                _ndjson_events(events, lambda data: data),
+                media_type="application/x-ndjson"
+            )
+
+        result = await analyzer_service.analyze_single_product_async(
+            patent,
+            request.product,
+            use_cache=not request.bypass_cache
+        )
         
         if "error" in result:
             return JSONResponse(
@@ -124,4 +438,149 @@ def analyze_product_infringement(
         return JSONResponse(
             status_code=500,
             content={"error": f"Unexpected error: {str(e)}"}
-        )
\ No newline at end of file
+        )
+
+@router.post("/batch")
+async def analyze_batch(
+    request: BatchRequest = Body(
+        example={
+            "pairs": [
+                {"patent_id": "US-RE49889-E1", "company_name": "Walmart Inc."},
+                {"patent_id": "US-RE49889-E1", "company_name": "Target Corporation"}
+            ]
+        }
+    ),
+    stream: bool = Query(default=True)
+):
+    """
+    Analyze a list of patent/company pairs.
+    By default the response is NDJSON: a start line, one line per pair as it
+    completes (with its index in the request), and a summary line with
+    throughput in pairs per minute. With stream=false the pair results are
+    returned together, in request order, once all have finished.
+    """
+    if stream:
+        return StreamingResponse(
+            (json.dumps(event) + "\n" async for event in run_batch(request)),
+            media_type="application/x-ndjson"
+        )
+
+    try:
+        results = [None] * len(request.pairs)
+        summary = None
+        async for event in run_batch(request):
+            if event["event"] == "pair":
+                results[event["index"]] = {k: v for k, v in event.items() if k != "event"}
+            elif event["event"] == "summary":
+                summary = {k: v for k, v in event.items() if k != "event"}
+        return {"results": results, "summary": summary}
+
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Unexpected error: {str(e)}"}
+        )
+
+@router.post("/screen", response_model=ScreeningResult)
+async def screen_patent(
+    request: ScreeningRequest = Body(
+        example={
+            "patent_id": "US-RE49889-E1",
+            "top_k": 5
+        }
+    ),
+    data_service: DataService = Depends(get_data_service),
+    analyzer_service: AnalyzerService = Depends(get_analyzer_service),
+    screener: ProductScreener = Depends(get_screener)
+):
+    """
+    Rank the products of all companies against a patent.
+    A vectorized similarity pass scores the whole catalog and only the top_k
+    candidates get a full LLM analysis.
+    """
+    try:
+        result = await run_screening(request, data_service, analyzer_service, screener)
+        if "error" in result:
+            return JSONResponse(
+                status_code=result["status_code"],
+                content={"error": result["error"]}
+            )
+        return JSONResponse(
+            status_code=200,
+            content=result["data"]
+        )
+
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Unexpected error: {str(e)}"}
+        )
+
+@router.get("/cache/stats")
+async def get_cache_stats(analyzer_service: AnalyzerService = Depends(get_analyzer_service)):
+    """Get analysis result cache hit/miss counters"""
+    return analyzer_service.cache.stats()
+
+@router.get("/llm/endpoints")
+async def get_llm_endpoints(analyzer_service: AnalyzerService = Depends(get_analyzer_service)):
+    """Get health, load and latency statistics of each LLM endpoint"""
+    return {"endpoints": analyzer_service.client.stats()}
+
+@router.get("/llm/metrics")
+async def get_llm_metrics(analyzer_service: AnalyzerService = Depends(get_analyzer_service)):
+    """Get model load, prompt evaluation and generation time breakdown, warm-keeping, prefix session, parsing, request coalescing and claim budgeting state"""
+    return {
+        "generations": analyzer_service.llm_metrics.stats(),
+        "model_keeper": analyzer_service.model_keeper.stats(),
+        "prefix_sessions": analyzer_service.prefix_sessions.stats(),
+        "parsing": analyzer_service.parse_metrics.stats(),
+        "single_flight": analyzer_service.single_flight.stats(),
+        "prompt_budget": {
+            "prompts": analyzer_service.prompt_budgeter.stats(),
+            "sessions": analyzer_service.session_budgeter.stats(),
+        },
+    }
+
+@router.post("/jobs", status_code=202)
+async def submit_analysis_job(
+    request: InfringementRequest = Body(
+        example={
+            "patent_id": "US-RE49889-E1",
+            "company_name": "Walmart Inc."
+        }
+    ),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Queue a company analysis in the background and return its job ID immediately.
+    Identical requests that are still queued or running share the same job.
+    """
+    try:
+        job = job_queue.submit(request.model_dump(), _company_job_key(request))
+    except QueueFullError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)}
+        )
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "coalesced": job["coalesced"],
+        "queue_depth": job_queue.queue_depth()
+    }
+
+@router.get("/jobs/stats")
+async def get_job_stats(job_queue: JobQueue = Depends(get_job_queue)):
+    """Get job queue depth and wait time statistics"""
+    return job_queue.stats()
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    """Get status, progress and result of a background analysis job"""
+    job = job_queue.get(job_id)
+    if not job:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"Job {job_id} not found"}
+        )
+    return _job_view(job)
@@ -1,19 +1,22 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List
 from uuid import uuid4, UUID
 from datetime import datetime
 from app.database.models import SavedReport
 from app.services.report_service import ReportService
 from app.services.data_service import DataService
+from app.dependencies import get_data_service
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
 # Initialize services
 report_service = ReportService()
-data_service = DataService()
 
 @router.post("/", response_model=SavedReport)
-async def save_report(analysis_result: dict):
+async def save_report(
+    analysis_result: dict,
+    data_service: DataService = Depends(get_data_service)
+):
     """Save analysis result as a report"""
     # Get full patent info
     patent = data_service.get_patent(analysis_result["patent_id"])
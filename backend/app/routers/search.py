@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Query
-from app.services.fuzzy_matcher import FuzzyMatcher
-from app.database.models import SearchResponse, SearchMatch
+from fastapi import APIRouter, Body, Query, Depends, HTTPException
 from app.services.data_service import DataService
-from typing import List, Dict
+from app.services.fulltext_index import FullTextIndex
+from app.services.fuzzy_matcher import FuzzyMatcher
+from app.database.models import (
+    BatchSearchRequest, BatchSearchResponse, FullTextMatch, FullTextSearchResponse, SearchResponse, SearchMatch
+)
+from app.dependencies import get_data_service, get_fulltext_index, get_matcher
+from typing import List, Dict, Optional
 
 router = APIRouter(prefix="/api/search", tags=["search"])
-# Initialize services
-data_service = DataService()
-matcher = FuzzyMatcher(data_service)
 
 @router.get("/patent/{query}")
 async def search_patent(
     query: str,
-    threshold: int = Query(default=80, ge=0, le=100)
+    threshold: int = Query(default=80, ge=0, le=100),
+    matcher: FuzzyMatcher = Depends(get_matcher)
 ) -> SearchResponse:
     """Search for patents by ID using fuzzy matching"""
     matches = matcher.find_patent(query, threshold)
@@ -33,7 +35,8 @@ async def search_patent(
 @router.get("/company/{query}")
 async def search_company(
     query: str,
-    threshold: int = Query(default=60, ge=0, le=100)
+    threshold: int = Query(default=60, ge=0, le=100),
+    matcher: FuzzyMatcher = Depends(get_matcher)
 ) -> SearchResponse:
     """Search for companies using fuzzy matching"""
     matches = matcher.find_company(query, threshold)
@@ -55,17 +58,21 @@ async def search_company(
 async def suggest_patents(
     query: str,
     limit: int = Query(default=5, ge=1, le=20),
-    threshold: int = Query(default=60, ge=0, le=100)
+    threshold: int = Query(default=60, ge=0, le=100),
+    matcher: FuzzyMatcher = Depends(get_matcher)
 ) -> List[Dict]:
     """
-    Suggest patents based on partial title input.
+    Suggest patents based on partial title or publication number input.
+    Prefix matches on the title, its words and the publication number at or
+    above threshold come first, best first; fuzzy title matching is used only
+    when none exist.
     Returns a list of potential matches with their confidence scores.
     """
-    matches = matcher.find_patent_by_title(query, threshold)
+    matches = matcher.suggest_patents(query, limit, threshold)
     return [
         {
             "id": m["patent"]["publication_number"],
-            "title": m["patent"]["title"],
+            "title": m["patent"].get("title") or "",
             "confidence": m["confidence"],
             # "abstract": m["patent"].get("abstract", "")
         }
@@ -76,13 +83,16 @@ async def suggest_patents(
 async def suggest_companies(
     query: str,
     limit: int = Query(default=5, ge=1, le=20),
-    threshold: int = Query(default=60, ge=0, le=100)
+    threshold: int = Query(default=60, ge=0, le=100),
+    matcher: FuzzyMatcher = Depends(get_matcher)
 ) -> List[Dict]:
     """
     Suggest companies based on partial input.
+    Prefix matches on the name and its words at or above threshold come
+    first, best first; fuzzy matching is used only when none exist.
     Returns a list of potential matches with their confidence scores.
     """
-    matches = matcher.find_company(query, threshold)
+    matches = matcher.suggest_companies(query, limit, threshold)
     return [
         {
             "name": m["company"]["name"],
@@ -95,7 +105,8 @@ async def suggest_companies(
 async def search_patent_by_title(
     query: str,
     limit: int = Query(default=5, ge=1, le=20),
-    threshold: int = Query(default=60, ge=0, le=100)
+    threshold: int = Query(default=60, ge=0, le=100),
+    matcher: FuzzyMatcher = Depends(get_matcher)
 ) -> List[Dict]:
     """
     Search patents by title.
@@ -105,9 +116,82 @@ async def search_patent_by_title(
     return [
         {
             "id": m["patent"]["publication_number"],
-            "title": m["patent"]["title"],
+            "title": m["patent"].get("title") or "",
             "confidence": m["confidence"],
             "abstract": m["patent"].get("abstract", "")
         }
         for m in matches[:limit]
-    ] 
\ No newline at end of file
+    ] 
+
+@router.get("/fulltext")
+async def search_fulltext(
+    q: str = Query(..., min_length=1, description='Terms and "quoted phrases"'),
+    limit: int = Query(default=10, ge=1, le=100),
+    fields: Optional[str] = Query(default=None, description="Comma-separated subset of title,abstract,claims,description"),
+    index: FullTextIndex = Depends(get_fulltext_index),
+    data_service: DataService = Depends(get_data_service)
+) -> FullTextSearchResponse:
+    """
+    Search titles, abstracts, claims and descriptions.
+    Results are ranked by BM25 with title and abstract matches weighted
+    highest; every quoted phrase must appear in one of the searched fields.
+    """
+    selected = None
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in index.boosts]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    total, hits = index.search(q, limit, selected)
+    matches = []
+    for publication_number, score in hits:
+        patent = data_service.get_patent(publication_number)
+        if patent:
+            matches.append(FullTextMatch(
+                publication_number=publication_number,
+                title=patent.get("title") or "",
+                score=round(score, 4),
+                abstract=patent.get("abstract")
+            ))
+    return FullTextSearchResponse(query=q, total=total, matches=matches)
+
+@router.post("/batch")
+async def search_batch(
+    request: BatchSearchRequest = Body(
+        example={
+            "queries": ["walmart", "amazon"],
+            "target": "company"
+        }
+    ),
+    matcher: FuzzyMatcher = Depends(get_matcher)
+) -> BatchSearchResponse:
+    """
+    Resolve many search queries in one call.
+    Company and title queries are scored together in one multi-threaded pass.
+    """
+    if request.target == "company":
+        batches = matcher.find_companies(request.queries, request.threshold, request.limit)
+        key, label = "company", "name"
+    elif request.target == "patent_title":
+        batches = matcher.find_patents_by_title(request.queries, request.threshold, request.limit)
+        key, label = "patent", "publication_number"
+    else:
+        batches = [matcher.find_patent(query, request.threshold)[:request.limit] for query in request.queries]
+        key, label = "patent", "publication_number"
+
+    return BatchSearchResponse(results=[
+        SearchResponse(
+            query=query,
+            matches=[
+                SearchMatch(
+                    confidence=m["confidence"],
+                    is_exact=m["is_exact"],
+                    data=m[key]
+                )
+                for m in matches
+            ],
+            suggestion=matches[0][key][label] if matches else None
+        )
+        for query, matches in zip(request.queries, batches)
+    ])
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Body, Depends
+from app.services.data_service import DataService
+from app.services.semantic_index import SemanticIndex
+from app.database.models import SemanticMatch, SemanticSearchRequest, SemanticSearchResponse
+from app.dependencies import get_data_service, get_semantic_index
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+@router.post("/semantic")
+async def search_semantic(
+    request: SemanticSearchRequest = Body(
+        example={
+            "text": "Robotic lawn mower that charges from a solar panel",
+            "limit": 5
+        }
+    ),
+    index: SemanticIndex = Depends(get_semantic_index),
+    data_service: DataService = Depends(get_data_service)
+) -> SemanticSearchResponse:
+    """
+    Find the patents whose title, abstract and claims are most similar to a
+    text such as a product description, by cosine similarity of embeddings.
+    """
+    matches = []
+    for publication_number, similarity in index.search(request.text, request.limit):
+        patent = data_service.get_patent(publication_number)
+        if patent:
+            matches.append(SemanticMatch(
+                publication_number=publication_number,
+                title=patent.get("title") or "",
+                similarity=round(similarity, 4)
+            ))
+    return SemanticSearchResponse(matches=matches)
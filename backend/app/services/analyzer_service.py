@@ -1,18 +1,48 @@
-import requests
+import httpx
 import os
-from typing import Dict, List, Union, Literal
-import json
-from pydantic import BaseModel
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, Union, Literal, Optional
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
+from app.services.cache_service import AnalysisCache, make_cache_key
+from app.services.llm_client import LLMClient, create_llm_client
+from app.services.endpoint_pool import EndpointPool
+from app.services.llm_metrics import LLMMetrics
+from app.services.model_keeper import ModelKeeper
+from app.services.response_parser import IncrementalObjectParser, ParseMetrics, parse_tolerant
+from app.services.patent_store import decode_claims
+from app.services.claim_formatter import ClaimFormatter, FormattedClaim, FormattedClaims, render_claims
+from app.services.prompt_budget import PromptBudgeter, PromptTooLargeError
+from app.services.claim_retriever import ClaimRetriever, is_independent
+from app.services.prefix_session import PrefixSession, PrefixSessionCache
+from app.services.single_flight import SingleFlight
+from app.services.data_service import DataService
+from app.database.models import Claim
 
 load_dotenv()
 
+# Bump whenever a prompt template changes so cached results are not reused
+PROMPT_TEMPLATE_VERSION = "4"
+
+# Marks where the budgeted claims are inserted into a prompt template
+CLAIMS_PLACEHOLDER = "\x00CLAIMS\x00"
+# Closes the patent turn of a prefix session; the product follows in the next turn
+SESSION_ACKNOWLEDGE = """
+        The product to analyze follows in the next message. Reply with OK.
+        """
+
 class AnalyzerError(Exception):
     def __init__(self, message: str, status_code: int = 500):
         self.message = message
         self.status_code = status_code
         super().__init__(self.message)
 
+class ResponseParseError(AnalyzerError):
+    """The generated text could not be parsed or salvaged"""
+    def __init__(self, message: str):
+        super().__init__(message, 502)
+
 class InfringementAnalysis(BaseModel):
     product_name: str
     infringement_score: float
@@ -24,74 +54,163 @@ class InfringementAnalysis(BaseModel):
 class InfringementResults(BaseModel):
     products: List[InfringementAnalysis]
 
+class ProductScore(BaseModel):
+    product_name: str
+    infringement_score: float
+
+class ProductScores(BaseModel):
+    products: List[ProductScore]
+
 class AnalyzerService:
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[AnalysisCache] = None,
+        client: Optional[Union[LLMClient, EndpointPool]] = None,
+        data_service: Optional[DataService] = None,
+        claim_retriever: Optional[ClaimRetriever] = None
+    ):
         self.ollama_host = os.getenv("OLLAMA_HOST", "http://ollama:11434")
         self.model = os.getenv("MODEL_NAME", "phi")
         print(f"Ollama host: {self.ollama_host}")
         print(f"Model: {self.model}")
-        # Token limits for different models
+        # Context window (in tokens) for different models
         self.token_limits = {
             "phi": 2048,
             "mistral": 8192,  # mistral supports longer context
         }
+        self.context_limit = int(os.getenv(
+            "MODEL_CONTEXT_TOKENS",
+            str(self.token_limits.get(self.model, 2048))
+        ))
+        # Tokens kept free for the generated JSON
+        self.output_reserve = int(os.getenv("OUTPUT_TOKEN_RESERVE", "1024"))
+        self.prompt_budgeter = PromptBudgeter(self.context_limit, self.output_reserve)
         # Default timeout setting
         self.timeout = float(os.getenv("OLLAMA_TIMEOUT", "300.0"))  # 5 minutes timeout
+        # Source of pre-decoded claims, optional
+        self.data_service = data_service
+        # Claims rendered once per patent and reused by every prompt
+        self.claim_formatter = ClaimFormatter(int(os.getenv("CLAIM_FORMAT_CACHE_SIZE", "1024")))
+        # BM25 pre-filter: only independent claims and the top-N relevant claims reach the LLM
+        self.claim_retriever = claim_retriever if claim_retriever is not None else ClaimRetriever.from_env()
+        # Result cache shared by both analysis methods
+        self.cache = cache if cache is not None else AnalysisCache.from_env()
+        # Pooled async client used by the *_async methods, routed across OLLAMA_HOSTS
+        self.client = client or create_llm_client(self.ollama_host, self.timeout)
+        # How long Ollama keeps the model loaded after each request
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # Load / prompt-eval / generation time breakdown of every generation
+        self.llm_metrics = LLMMetrics()
+        # Preloads the model at startup and keeps it resident while traffic is expected
+        self.model_keeper = ModelKeeper.from_env(self.client, self.model, self.llm_metrics)
+        # Prefix sessions: the patent part of single-product prompts is evaluated once
+        # and its Ollama context reused for every product
+        self.prefix_sessions_enabled = os.getenv("PREFIX_SESSIONS", "false").lower() in ("1", "true", "yes")
+        self.prefix_sessions = PrefixSessionCache(int(os.getenv("PREFIX_SESSION_CACHE_SIZE", "32")))
+        # A session's claims must leave room for any product turn, not just the first one
+        self.session_budgeter = PromptBudgeter(
+            self.context_limit,
+            self.output_reserve + int(os.getenv("SESSION_SUFFIX_RESERVE", "512"))
+        )
+        # Fan-out strategy: concurrent single-product generations under a shared deadline
+        self.fanout_concurrency = int(os.getenv("FANOUT_CONCURRENCY", "4"))
+        self.fanout_deadline = float(os.getenv("FANOUT_DEADLINE", str(self.timeout)))
+        # Two-phase strategy: output token cap per product for the score-only pass
+        self.score_tokens_per_product = int(os.getenv("SCORE_TOKENS_PER_PRODUCT", "24"))
+        # Malformed output is repaired or salvaged first; only then regenerated this many times
+        self.parse_retries = int(os.getenv("PARSE_RETRIES", "1"))
+        self.parse_metrics = ParseMetrics()
+        # Identical concurrent analyses share one generation
+        self.single_flight = SingleFlight()
+
+    def _cache_key(self, kind: str, patent: Dict, products: List[Dict]) -> str:
+        """Build the result cache key for an analysis request"""
+        return make_cache_key(
+            kind,
+            self.model,
+            PROMPT_TEMPLATE_VERSION,
+            patent["publication_number"],
+            products,
+            self._prompt_settings()
+        )
+
+    def _prompt_settings(self) -> Dict:
+        """Configuration that changes which claims reach the prompt, part of every cache key"""
+        return {
+            "num_ctx": self.context_limit,
+            "output_reserve": self.prompt_budgeter.output_reserve,
+            "session_reserve": self.session_budgeter.output_reserve,
+            "claim_top_n": self.claim_retriever.top_n if self.claim_retriever is not None else None,
+        }
 
-    def _truncate_prompt(self, prompt: str, max_length: int = 2048) -> str:
-        """Truncate prompt to meet token limit"""
-        # Simple character count method, should use tokenizer in production
-        if len(prompt) > max_length:
-            print(f"Warning: Truncating prompt from {len(prompt)} to {max_length} characters")
-            return prompt[:max_length]
-        return prompt
+    def _fit_prompt(self, prompt: str, patent: Dict, products: List[Dict]) -> str:
+        """Fill the claims placeholder with as many relevant claims as the context window allows"""
+        prefix, suffix = prompt.split(CLAIMS_PLACEHOLDER)
+        query = "\n".join(f"{p['name']} {p['description']}" for p in products)
+        claims = self._formatted_claims(patent)
+        ranked = None
+        if self.claim_retriever is not None and claims.claims:
+            ranked = self.claim_retriever.select(patent.get("publication_number", ""), claims, query)
+        return self._fit_claims(self.prompt_budgeter, prefix, claims, suffix, query, ranked)
 
-    def analyze_multiple_products(self, patent: Dict, products: List[Dict]) -> Dict:
+    def _fit_claims(
+        self,
+        budgeter: PromptBudgeter,
+        prefix: str,
+        claims: FormattedClaims,
+        suffix: str,
+        query: str,
+        ranked: Optional[List[FormattedClaim]]
+    ) -> str:
+        """Budget claims into a prompt, refusing with a 413 rather than sending a prompt without claims"""
+        try:
+            return budgeter.fit(prefix, claims, suffix, query, ranked)
+        except PromptTooLargeError as e:
+            raise AnalyzerError(str(e), 413)
+
+    def prepare_patent(self, patent: Dict) -> FormattedClaims:
+        """
+        Format a patent's claims and load their claim index ahead of a run of
+        analyses of that patent, which then find both memoized.
         """
-        Analyze multiple products for patent infringement in a single request
+        claims = self._formatted_claims(patent)
+        if self.claim_retriever is not None and claims.claims:
+            self.claim_retriever.index_for(patent.get("publication_number", ""), claims)
+        return claims
+
+    async def analyze_multiple_products_async(self, patent: Dict, products: List[Dict], use_cache: bool = True) -> Dict:
+        """
+        Analyze multiple products for patent infringement in a single generation.
+        Set use_cache=False to skip the cache lookup; the fresh result still refreshes the cache.
+        Concurrent identical requests share one generation.
         """
+        cache_key = self._cache_key("multiple", patent, products)
+        return await self.single_flight.do(
+            (cache_key, use_cache),
+            lambda: self._analyze_multiple_products_async(cache_key, patent, products, use_cache)
+        )
+
+    async def _analyze_multiple_products_async(
+        self,
+        cache_key: str,
+        patent: Dict,
+        products: List[Dict],
+        use_cache: bool
+    ) -> Dict:
         try:
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
             prompt = self._create_multiple_products_prompt(patent, products)
-            print("prompt:")
-            print(prompt)
-            response = requests.post(
-                f"{self.ollama_host}/api/generate",
-                json={
-                    "model": self.model,
-                    "stream": False,
-                    "format": InfringementResults.model_json_schema(),
-                    "prompt": prompt,
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=300.0
+            result = await self._generate_parsed(
+                self._generate_payload(prompt, InfringementResults),
+                self._parse_multiple_products_response
             )
-            
-            # Handle HTTP errors
-            try:
-                response.raise_for_status()
-            except requests.exceptions.HTTPError as e:
-                raise AnalyzerError(f"API request failed: {str(e)}", 503)
-            
-            # Parse response
-            try:
-                result = response.json()["response"]
-                analysis = InfringementResults.model_validate_json(result)
-                
-                # Sort and limit results
-                sorted_results = sorted(
-                    analysis.products,
-                    key=lambda x: x.infringement_score,
-                    reverse=True
-                )
-                
-                return {
-                    "status_code": 200,
-                    "data": [result.model_dump() for result in sorted_results[:2]]
-                }
-                
-            except (KeyError, json.JSONDecodeError) as e:
-                raise AnalyzerError(f"Failed to parse API response: {str(e)}", 502)
-                
+            self.cache.set(cache_key, result)
+            return result
+
         except AnalyzerError as e:
             return {
                 "status_code": e.status_code,
@@ -103,44 +222,200 @@ class AnalyzerService:
                 "error": f"Unexpected error: {str(e)}"
             }
 
-    def analyze_single_product(self, patent: Dict, product: Dict) -> Dict:
+    async def analyze_single_product_async(self, patent: Dict, product: Dict, use_cache: bool = True) -> Dict:
         """
-        Analyze a single product for patent infringement
-        Returns a dictionary with status code and either results or error message
+        Analyze a single product for patent infringement.
+        Concurrent identical requests share one generation.
         """
+        use_session = self._use_prefix_sessions()
+        cache_key = self._cache_key("single-session" if use_session else "single", patent, [product])
+        return await self.single_flight.do(
+            (cache_key, use_cache),
+            lambda: self._analyze_single_product_async(cache_key, use_session, patent, product, use_cache)
+        )
+
+    async def _analyze_single_product_async(
+        self,
+        cache_key: str,
+        use_session: bool,
+        patent: Dict,
+        product: Dict,
+        use_cache: bool
+    ) -> Dict:
         try:
-            prompt = self._create_single_product_prompt(patent, product)
-            print("prompt:")
-            print(prompt)
-            response = requests.post(
-                f"{self.ollama_host}/api/generate",
-                json={
-                    "model": self.model,
-                    "stream": False,
-                    "format": InfringementAnalysis.model_json_schema(),
-                    "prompt": prompt,
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=self.timeout  # 使用配置的超時時間
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            if use_session:
+                result = await self._generate_in_session(
+                    patent, product, InfringementAnalysis, self._parse_single_product_response
+                )
+            else:
+                prompt = self._create_single_product_prompt(patent, product)
+                result = await self._generate_parsed(
+                    self._generate_payload(prompt, InfringementAnalysis),
+                    self._parse_single_product_response
+                )
+            self.cache.set(cache_key, result)
+            return result
+
+        except AnalyzerError as e:
+            return {
+                "status_code": e.status_code,
+                "error": e.message
+            }
+        except Exception as e:
+            return {
+                "status_code": 500,
+                "error": f"Unexpected error: {str(e)}"
+            }
+
+    async def analyze_products_fanout_async(
+        self,
+        patent: Dict,
+        products: List[Dict],
+        top_k: int = 2,
+        use_cache: bool = True,
+        concurrency: Optional[int] = None,
+        deadline: Optional[float] = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Dict:
+        """
+        Analyze each product with its own generation, at most `concurrency` at a time,
+        and return the top_k by score. Products still running when the deadline expires
+        are cancelled and reported in "timed_out"; the result is then marked partial.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.fanout_concurrency)
+        deadline = deadline if deadline is not None else self.fanout_deadline
+
+        async def analyze(product: Dict) -> Dict:
+            async with semaphore:
+                return await self.analyze_single_product_async(patent, product, use_cache)
+
+        tasks = {
+            asyncio.create_task(analyze(product)): product for product in products
+        }
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + deadline
+        pending = set(tasks)
+        while pending:
+            remaining = end_time - loop.time()
+            if remaining <= 0:
+                break
+            _, pending = await asyncio.wait(
+                pending,
+                timeout=remaining,
+                return_when=asyncio.FIRST_COMPLETED
             )
-            
-            # Handle HTTP errors
-            try:
-                response.raise_for_status()
-            except requests.exceptions.HTTPError as e:
-                raise AnalyzerError(f"API request failed: {str(e)}", 503)
-            
-            # Parse response
-            try:
-                result = response.json()["response"]
-                analysis = InfringementAnalysis.model_validate_json(result)
+            if progress:
+                progress((len(tasks) - len(pending)) / len(tasks))
+
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        analyses, failed, error_status = [], [], 502
+        for task, product in tasks.items():
+            if task in pending:
+                continue
+            result = task.result()
+            if "error" in result:
+                failed.append({"product_name": product["name"], "error": result["error"]})
+                error_status = result["status_code"]
+            else:
+                analyses.append(result["data"])
+        timed_out = [tasks[task]["name"] for task in pending]
+
+        if not analyses:
+            if timed_out:
                 return {
-                    "status_code": 200,
-                    "data": analysis.model_dump()
+                    "status_code": 504,
+                    "error": f"Fan-out analysis exceeded its {deadline:.0f}s deadline"
                 }
-            except (KeyError, json.JSONDecodeError) as e:
-                raise AnalyzerError(f"Failed to parse API response: {str(e)}", 502)
-            
+            return {
+                "status_code": error_status if failed else 400,
+                "error": failed[-1]["error"] if failed else "No products to analyze"
+            }
+
+        analyses.sort(key=lambda x: x["infringement_score"], reverse=True)
+        return {
+            "status_code": 200,
+            "data": analyses[:top_k],
+            "partial": bool(timed_out or failed),
+            "timed_out": timed_out,
+            "failed": failed
+        }
+
+    async def analyze_products_two_phase_async(
+        self,
+        patent: Dict,
+        products: List[Dict],
+        top_k: int = 2,
+        use_cache: bool = True,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Dict:
+        """
+        Rank products with a cheap score-only generation, then run the full
+        analysis (explanation, features, claims) only for the top_k.
+        Returns the fan-out result for the top_k plus "screening", the phase-one
+        scores of every product.
+        """
+        scores = await self.score_products_async(patent, products, use_cache)
+        if "error" in scores:
+            return scores
+        if progress:
+            progress(0.3)
+
+        by_name = {product["name"].lower(): product for product in products}
+        candidates = [by_name[score["product_name"].lower()] for score in scores["data"][:top_k]]
+        result = await self.analyze_products_fanout_async(
+            patent,
+            candidates,
+            top_k=top_k,
+            use_cache=use_cache,
+            progress=(lambda value: progress(0.3 + 0.7 * value)) if progress else None
+        )
+        result["screening"] = scores["data"]
+        return result
+
+    async def score_products_async(self, patent: Dict, products: List[Dict], use_cache: bool = True) -> Dict:
+        """
+        Score every product in one short generation: a small schema with only
+        product_name and infringement_score, capped by num_predict.
+        data lists every input product by descending score; products the model
+        skipped come last with a score of None.
+        Concurrent identical requests share one generation.
+        """
+        cache_key = self._cache_key("scores", patent, products)
+        return await self.single_flight.do(
+            (cache_key, use_cache),
+            lambda: self._score_products_async(cache_key, patent, products, use_cache)
+        )
+
+    async def _score_products_async(
+        self,
+        cache_key: str,
+        patent: Dict,
+        products: List[Dict],
+        use_cache: bool
+    ) -> Dict:
+        try:
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            prompt = self._create_score_prompt(patent, products)
+            num_predict = self.score_tokens_per_product * len(products) + 16
+            result = await self._generate_parsed(
+                self._generate_payload(prompt, ProductScores, num_predict=num_predict),
+                lambda body: self._parse_score_response(body, products)
+            )
+            self.cache.set(cache_key, result)
+            return result
+
         except AnalyzerError as e:
             return {
                 "status_code": e.status_code,
@@ -152,23 +427,317 @@ class AnalyzerService:
                 "error": f"Unexpected error: {str(e)}"
             }
 
+    def stream_multiple_products(self, patent: Dict, products: List[Dict], use_cache: bool = True) -> AsyncIterator[Dict]:
+        """
+        Stream a multi-product analysis as events: "token" for generated text,
+        "product" for each product object as soon as it completes, then a final
+        "result" (same shape as analyze_multiple_products) or "error".
+        """
+        return self._stream_analysis(
+            self._cache_key("multiple", patent, products),
+            lambda: self._create_multiple_products_prompt(patent, products),
+            InfringementResults,
+            self._parse_multiple_products_response,
+            use_cache
+        )
+
+    def stream_single_product(self, patent: Dict, product: Dict, use_cache: bool = True) -> AsyncIterator[Dict]:
+        """
+        Stream a single-product analysis as "token" events followed by a final "result" or "error"
+        """
+        return self._stream_analysis(
+            self._cache_key("single", patent, [product]),
+            lambda: self._create_single_product_prompt(patent, product),
+            InfringementAnalysis,
+            self._parse_single_product_response,
+            use_cache
+        )
+
+    async def _stream_analysis(
+        self,
+        cache_key: str,
+        build_prompt: Callable[[], str],
+        schema: type,
+        parse_response: Callable[[Dict], Dict],
+        use_cache: bool
+    ) -> AsyncIterator[Dict]:
+        try:
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    if isinstance(cached["data"], list):
+                        for product in cached["data"]:
+                            yield {"event": "product", "data": product}
+                    yield {"event": "result", "data": cached}
+                    return
+
+            parser = IncrementalObjectParser()
+            payload = self._generate_payload(build_prompt(), schema, stream=True)
+            async for chunk in self._generate_stream_async(payload):
+                token = chunk.get("response", "")
+                if token:
+                    yield {"event": "token", "data": token}
+                    for obj in parser.feed(token):
+                        try:
+                            product = InfringementAnalysis.model_validate(obj)
+                        except ValidationError:
+                            continue
+                        yield {"event": "product", "data": product.model_dump()}
+                if chunk.get("done"):
+                    break
+
+            result = parse_response({"response": parser.buffer})
+            self.cache.set(cache_key, result)
+            yield {"event": "result", "data": result}
+
+        except AnalyzerError as e:
+            yield {
+                "event": "error",
+                "data": {"status_code": e.status_code, "error": e.message}
+            }
+        except Exception as e:
+            yield {
+                "event": "error",
+                "data": {"status_code": 500, "error": f"Unexpected error: {str(e)}"}
+            }
+
+    def _generate_payload(
+        self,
+        prompt: str,
+        schema: type,
+        stream: bool = False,
+        num_predict: Optional[int] = None
+    ) -> Dict:
+        """Build the /api/generate request body"""
+        # Ollama silently truncates to its default context unless told otherwise
+        options = {"num_ctx": self.context_limit}
+        if num_predict is not None:
+            options["num_predict"] = num_predict
+        return {
+            "model": self.model,
+            "stream": stream,
+            "format": schema.model_json_schema(),
+            "prompt": prompt,
+            "options": options,
+            "keep_alive": self.keep_alive,
+        }
+
+    async def _generate_async(self, payload: Dict, host: Optional[str] = None) -> Dict:
+        """Send a generate request through the pooled async client, optionally pinned to a host"""
+        try:
+            body = await self.client.generate(payload, host=host)
+        except httpx.TimeoutException as e:
+            raise AnalyzerError(f"API request timed out: {str(e)}", 504)
+        except httpx.HTTPError as e:
+            raise AnalyzerError(f"API request failed: {str(e)}", 503)
+        self.llm_metrics.record(body)
+        return body
+
+    async def _generate_parsed(
+        self,
+        payload: Dict,
+        parse_response: Callable[[Dict], Dict],
+        host: Optional[str] = None
+    ) -> Dict:
+        """
+        Generate and parse. Output that cannot be parsed even after repair and
+        salvage is regenerated up to parse_retries times with a constrained
+        payload; the tokens of every discarded generation are counted as wasted.
+        """
+        for attempt in range(self.parse_retries + 1):
+            if attempt:
+                payload = self._constrained_payload(payload)
+            body = await self._generate_async(payload, host)
+            try:
+                result = parse_response(body)
+            except ResponseParseError as e:
+                self.parse_metrics.record_wasted(body.get("eval_count"))
+                if attempt:
+                    self.parse_metrics.record_retry(False)
+                if attempt == self.parse_retries:
+                    raise
+                print(f"Unparseable LLM response, retrying: {e.message}")
+                continue
+            if attempt:
+                self.parse_metrics.record_retry(True)
+            return result
+
+    def _constrained_payload(self, payload: Dict) -> Dict:
+        """Payload for a retry: greedy decoding and an explicit demand for short, complete JSON"""
+        return {
+            **payload,
+            "prompt": payload["prompt"] + """
+        Your previous reply was not valid JSON. Return ONLY the JSON value described
+        above, with no text before or after it, and keep every explanation under
+        40 words so the response is complete.
+        """,
+            "options": {**payload.get("options", {}), "temperature": 0},
+        }
+
+    def _use_prefix_sessions(self) -> bool:
+        """Sessions need a backend that returns and accepts Ollama's context"""
+        return self.prefix_sessions_enabled and self.client.supports_context
+
+    async def _generate_in_session(
+        self,
+        patent: Dict,
+        product: Dict,
+        schema: type,
+        parse_response: Callable[[Dict], Dict]
+    ) -> Dict:
+        """
+        Generate a single-product analysis on top of the patent's warm prefix.
+        Only the product turn is sent; the prefix is replayed from its context
+        on the host that evaluated it, where Ollama still has it cached.
+        """
+        claims = self._formatted_claims(patent)
+        key = (self.model, PROMPT_TEMPLATE_VERSION, patent.get("publication_number", ""), hash(claims.text))
+        session = await self.prefix_sessions.get_or_create(key, lambda: self._evaluate_prefix(patent, claims))
+
+        payload = self._generate_payload(self._single_product_suffix(product), schema)
+        payload["context"] = session.context
+        try:
+            return await self._generate_parsed(payload, parse_response, host=session.host)
+        except ResponseParseError:
+            raise
+        except AnalyzerError:
+            self.prefix_sessions.invalidate(key)
+            raise
+
+    async def _evaluate_prefix(self, patent: Dict, claims: FormattedClaims) -> PrefixSession:
+        """
+        Evaluate the patent turn once and keep the context Ollama returns.
+        The prefix is product independent, so claims are not filtered by
+        relevance; if they do not fit, independent claims are kept first.
+        """
+        prefix, suffix = self._single_product_prefix(patent).split(CLAIMS_PLACEHOLDER)
+        ranked = sorted(claims.claims, key=lambda claim: not is_independent(claim))
+        prompt = self._fit_claims(self.session_budgeter, prefix, claims, suffix + SESSION_ACKNOWLEDGE, "", ranked)
+        pick = getattr(self.client, "pick", None)
+        host = pick().host if pick else None
+
+        started = time.perf_counter()
+        body = await self._generate_async({
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"num_ctx": self.context_limit, "num_predict": 1},
+        }, host=host)
+        if not body.get("context"):
+            raise AnalyzerError("LLM backend returned no context for the patent prefix", 502)
+        return PrefixSession(
+            context=body["context"],
+            host=host,
+            prefix_tokens=body.get("prompt_eval_count") or 0,
+            eval_seconds=(body.get("prompt_eval_duration") or 0) / 1e9 or time.perf_counter() - started
+        )
+
+    async def _generate_stream_async(self, payload: Dict) -> AsyncIterator[Dict]:
+        """Stream generate chunks through the pooled async client"""
+        try:
+            async for chunk in self.client.generate_stream(payload):
+                if chunk.get("done"):
+                    self.llm_metrics.record(chunk)
+                yield chunk
+        except httpx.TimeoutException as e:
+            raise AnalyzerError(f"API request timed out: {str(e)}", 504)
+        except httpx.HTTPError as e:
+            raise AnalyzerError(f"API request failed: {str(e)}", 503)
+
+    def _parse_multiple_products_response(self, body: Dict) -> Dict:
+        """Validate a multi-product generation and keep the top 2 products"""
+        products = self._parse_products(body, InfringementAnalysis)
+
+        # Sort and limit results
+        sorted_results = sorted(
+            products,
+            key=lambda x: x.infringement_score,
+            reverse=True
+        )
+        return {
+            "status_code": 200,
+            "data": [result.model_dump() for result in sorted_results[:2]]
+        }
+
+    def _parse_score_response(self, body: Dict, products: List[Dict]) -> Dict:
+        """Validate a score-only generation and order every input product by score"""
+        by_name = {}
+        for score in self._parse_products(body, ProductScore):
+            by_name.setdefault(score.product_name.strip().lower(), score.infringement_score)
+        ranked = [
+            {"product_name": product["name"], "infringement_score": by_name.get(product["name"].lower())}
+            for product in products
+        ]
+        ranked.sort(key=lambda x: -1 if x["infringement_score"] is None else x["infringement_score"], reverse=True)
+        return {
+            "status_code": 200,
+            "data": ranked
+        }
+
+    def _parse_single_product_response(self, body: Dict) -> Dict:
+        """Validate a single-product generation, repairing malformed JSON if possible"""
+        value, outcome = parse_tolerant(body.get("response", ""))
+        try:
+            if not isinstance(value, dict):
+                raise ValueError(f"expected a JSON object, got {outcome} output")
+            analysis = InfringementAnalysis.model_validate(value)
+        except (ValueError, ValidationError) as e:
+            self.parse_metrics.record("failed")
+            raise ResponseParseError(f"Failed to parse API response: {str(e)}")
+        self.parse_metrics.record(outcome)
+        return {
+            "status_code": 200,
+            "data": analysis.model_dump()
+        }
+
+    def _parse_products(self, body: Dict, item_model: type) -> List[BaseModel]:
+        """
+        Validate the items of a {"products": [...]} generation one by one.
+        Malformed JSON is repaired, complete items are salvaged from truncated
+        output and invalid items are dropped; raises ResponseParseError only
+        when nothing usable is left.
+        """
+        value, outcome = parse_tolerant(body.get("response", ""))
+        if isinstance(value, dict):
+            value = value.get("products")
+        items = value if isinstance(value, list) else []
+
+        products = []
+        for item in items:
+            try:
+                products.append(item_model.model_validate(item))
+            except ValidationError:
+                continue
+        dropped = len(items) - len(products)
+        if outcome == "failed" or not isinstance(value, list) or (dropped and not products):
+            self.parse_metrics.record("failed")
+            raise ResponseParseError(f"Failed to parse API response: no valid products in {outcome} output")
+        if dropped and outcome == "clean":
+            outcome = "salvaged"
+        self.parse_metrics.record(outcome, dropped)
+        return products
+
     def _create_single_product_prompt(self, patent: Dict, product: Dict) -> str:
         """
-        Create a comprehensive analysis prompt using full patent information
+        Create a comprehensive analysis prompt using full patent information.
+        The patent part comes first and the product last, so consecutive prompts
+        for the same patent share the longest possible prefix.
         """
-        prompt = f"""You are a strict patent analysis expert. Analyze the product's potential patent infringement carefully and critically.
+        prompt = self._single_product_prefix(patent) + self._single_product_suffix(product)
+        return self._fit_prompt(prompt, patent, [product])
+
+    def _single_product_prefix(self, patent: Dict) -> str:
+        """Instructions, patent information and claims placeholder, identical for every product"""
+        return f"""You are a strict patent analysis expert. Analyze the product's potential patent infringement carefully and critically.
 
         Patent Information:
         Patent Number: {patent["publication_number"]}
         Patent Title: {patent["title"]}
         Abstract: {patent["abstract"]}
         
-        Product to Analyze:
-        Name: {product["name"]}
-        Description: {product["description"]}
-        
         Patent Claims:
-        {self._format_claims(patent["claims"])}
+        {CLAIMS_PLACEHOLDER}
         
         ANALYSIS GUIDELINES:
         1. Compare the product against ALL patent claims
@@ -181,6 +750,14 @@ class AnalyzerService:
         - High (75-100): Product clearly implements ALL elements of at least one claim
         - Moderate (40-74): Product matches SOME key elements but lacks others
         - Low (0-39): Product has minimal or no overlap with patent claims
+        """
+
+    def _single_product_suffix(self, product: Dict) -> str:
+        """Product and response format"""
+        return f"""
+        Product to Analyze:
+        Name: {product["name"]}
+        Description: {product["description"]}
         
         RESPONSE FORMAT:
         Return a JSON object with these EXACT fields:
@@ -200,63 +777,13 @@ class AnalyzerService:
         - Consider both matching and non-matching features
         - Return valid JSON object only, no additional text
         """
-        # 獲取當前模型的 token 限制
-        token_limit = self.token_limits.get(self.model, 2048)
-        return self._truncate_prompt(prompt, token_limit)
 
-    def _format_claims(self, claims_data: Union[str, List[Dict]]) -> str:
+    def _format_claims(self, claims_data: Union[str, List[Dict], List[Claim]]) -> str:
         """
         Format patent claims data into readable text
         """
         try:
-            # If input is a string, clean up Unicode characters first
-            if isinstance(claims_data, str):
-                # Remove outer quotes if present
-                claims_text = claims_data.strip('"')
-                
-                # First round of Unicode cleanup
-                try:
-                    # Try to decode as JSON first
-                    claims_data = json.loads(claims_text)
-                except json.JSONDecodeError:
-                    # If JSON decode fails, try to clean up the string
-                    claims_text = claims_text.encode('latin1').decode('unicode_escape')
-                    claims_data = json.loads(claims_text)
-                
-                # Define common Unicode character replacements
-                unicode_replacements = {
-                    '\u00e2\u0080\u009c': '"',  # left double quotation
-                    '\u00e2\u0080\u009d': '"',  # right double quotation
-                    '\u00e2\u0080\u0098': "'",  # left single quotation
-                    '\u00e2\u0080\u0099': "'",  # right single quotation
-                    '\u00e2\u0080\u009e': '"',  # double low-9 quotation
-                    '\u00e2\u0080\u009f': '"',  # double high-reversed-9 quotation
-                    '\u00e2\u0080\u0094': '-',  # em dash
-                    'â': '"',                    # fallback for any remaining â
-                    'â': '-',                    # fallback for any remaining â
-                }
-                
-                # Process each claim's text
-                if isinstance(claims_data, list):
-                    for claim in claims_data:
-                        if 'text' in claim:
-                            text = claim['text']
-                            # Apply Unicode replacements
-                            for old, new in unicode_replacements.items():
-                                text = text.replace(old, new)
-                            claim['text'] = text
-            
-            # Ensure data is in list format
-            if not isinstance(claims_data, list):
-                raise ValueError("Claims data must be a list")
-            
-            # Format each claim
-            formatted_claims = []
-            for claim in claims_data:
-                claim_text = claim.get("text", "")
-                formatted_claims.append(f"Claim {claim.get('num', '?')}: {claim_text}")
-            
-            return "\n\n".join(formatted_claims)
+            return render_claims(decode_claims(claims_data)).text
             
         except Exception as e:
             print(f"Error formatting claims: {str(e)}")
@@ -265,6 +792,29 @@ class AnalyzerService:
                 print(f"Raw claims string: {claims_data}")
             return "Error: Unable to format claims data"
 
+    def _formatted_claims(self, patent: Dict) -> FormattedClaims:
+        """Memoized claims of a patent, ready to embed in a prompt"""
+        try:
+            return self.claim_formatter.format(
+                patent["publication_number"],
+                self._get_claims(patent)
+            )
+        except Exception as e:
+            print(f"Error formatting claims: {str(e)}")
+            return FormattedClaims(
+                claims=[],
+                text="Error: Unable to format claims data",
+                tokens=0
+            )
+
+    def _get_claims(self, patent: Dict) -> Union[str, List[Claim]]:
+        """Use the claims decoded at load time when the patent comes from the data service"""
+        if self.data_service is not None:
+            claims = self.data_service.get_claims(patent["publication_number"])
+            if claims is not None:
+                return claims
+        return patent["claims"]
+
     def _parse_llm_response(self, response: str) -> Dict:
         """Parse LLM response into structured data"""
         try:
@@ -312,7 +862,7 @@ class AnalyzerService:
         {products_text}
         
         Patent Claims:
-        {self._format_claims(patent["claims"])}
+        {CLAIMS_PLACEHOLDER}
         
         ANALYSIS GUIDELINES:
         1. Compare each product against ALL patent claims
@@ -349,28 +899,44 @@ class AnalyzerService:
         - Return valid JSON array with exactly 2 items
         - Sort results by infringement score (highest first)
         """
-        # 獲取當前模型的 token 限制
-        token_limit = self.token_limits.get(self.model, 2048)
-        return self._truncate_prompt(prompt, token_limit)
+        return self._fit_prompt(prompt, patent, products)
 
-    def _parse_bulk_llm_response(self, response: str, products: List[Dict]) -> List[Dict]:
-        """Parse the LLM response for multiple products"""
-        try:
-            analysis = InfringementResults.model_validate_json(response)
-            
-            # Sort results by infringement score
-            sorted_results = sorted(
-                analysis.products,
-                key=lambda x: x.infringement_score,
-                reverse=True
-            )
-            
-            return [result.model_dump() for result in sorted_results[:2]]
-            
-        except Exception as e:
-            print(f"Error parsing bulk response: {str(e)}")
-            print(f"Raw response: {response}")
-            return [
-                self._create_error_response(product["name"], "Failed to parse analysis results")
-                for product in products[:2]
-            ]
+    def _create_score_prompt(self, patent: Dict, products: List[Dict]) -> str:
+        """
+        Create a prompt asking only for a score per product, for the first
+        phase of the two-phase strategy
+        """
+        products_text = "\n\n".join([
+            f"{i+1}:\nName: {product['name']}\nDescription: {product['description']}"
+            for i, product in enumerate(products)
+        ])
+
+        prompt = f"""You are a strict patent analysis expert. Score each product's potential patent infringement.
+
+        Patent Information:
+        Patent Number: {patent["publication_number"]}
+        Patent Title: {patent["title"]}
+        Abstract: {patent["abstract"]}
+        
+        Products to Score:
+        {products_text}
+        
+        Patent Claims:
+        {CLAIMS_PLACEHOLDER}
+        
+        Scoring criteria:
+        - High (75-100): Product clearly implements ALL elements of at least one claim
+        - Moderate (40-74): Product matches SOME key elements but lacks others
+        - Low (0-39): Product has minimal or no overlap with patent claims
+        
+        RESPONSE FORMAT:
+        Return a JSON object with a "products" array holding one object per product:
+        {{"product_name": "exact product name from the list above", "infringement_score": number (0-100)}}
+
+        CRITICAL REQUIREMENTS:
+        - Score EVERY product in the list
+        - Use EXACT product names from the input list
+        - Default to lower scores unless clear evidence exists
+        - Return only the scores, no explanations
+        """
+        return self._fit_prompt(prompt, patent, products)
@@ -0,0 +1,166 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from heapq import merge
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse punctuation and whitespace into single spaces"""
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+class PrefixIndex:
+    """
+    Sorted arrays of (key, record) pairs, one per key length.
+    A prefix query bisects each length's array to the first key >= prefix and
+    walks while keys still start with it. Lengths are visited shortest first,
+    so matches come out shortest (closest to complete) first, then
+    alphabetically, and the walk can stop at a maximum key length.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]] = ()):
+        self._buckets: Dict[int, List[Tuple[str, int]]] = {}
+        for key, record in sorted(set(entries)):
+            self._buckets.setdefault(len(key), []).append((key, record))
+        self._lengths: List[int] = sorted(self._buckets)
+        self._size = sum(len(bucket) for bucket in self._buckets.values())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: str, record: int):
+        if len(key) not in self._buckets:
+            self._buckets[len(key)] = []
+            insort(self._lengths, len(key))
+        insort(self._buckets[len(key)], (key, record))
+        self._size += 1
+
+    def search(self, prefix: str, max_length: Optional[int] = None) -> Iterable[Tuple[str, int]]:
+        """Yield (key, record) for every key starting with prefix, shortest keys first"""
+        for length in self._lengths[bisect_left(self._lengths, len(prefix)):]:
+            if max_length is not None and length > max_length:
+                break
+            entries = self._buckets[length]
+            for i in range(bisect_left(entries, (prefix, -1)), len(entries)):
+                key, record = entries[i]
+                if not key.startswith(prefix):
+                    break
+                yield key, record
+
+
+class Autocomplete:
+    """
+    Typeahead over records (patents, companies) by position.
+    Each record has whole-name keys (e.g. title, publication number) and token
+    keys (each word of the title). Confidence of a prefix match is the share
+    of the matched key the query covers, 100 for a complete key. Prefix
+    matches below threshold are dropped and the rest are listed by confidence,
+    whole-name matches before token matches on ties; a record is listed once,
+    at its best confidence. Only when no key starts with the query at or above
+    threshold does it fall back to fuzzy scoring. Results are cached per query.
+    """
+
+    def __init__(
+        self,
+        fallback: Callable[[str, int, int], List[Tuple[int, float]]],
+        cache_size: int = 1024
+    ):
+        # fallback(query, threshold, limit) -> [(record, confidence)], best first
+        self.fallback = fallback
+        self.cache_size = cache_size
+        self.names = PrefixIndex()
+        self.tokens = PrefixIndex()
+        self._cache: "OrderedDict[Tuple[str, int, int], List[Tuple[int, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def build(self, records: Iterable[Tuple[int, Iterable[str], Iterable[str]]]):
+        """Index (record, names, token sources) triples in one sort"""
+        names, tokens = [], []
+        for record, record_names, token_sources in records:
+            names.extend((key, record) for key in self._name_keys(record_names))
+            tokens.extend((key, record) for key in self._token_keys(token_sources))
+        self.names = PrefixIndex(names)
+        self.tokens = PrefixIndex(tokens)
+        self.clear_cache()
+
+    def add(self, record: int, names: Iterable[str], token_sources: Iterable[str]):
+        """Index one more record; cached suggestions are dropped"""
+        for key in self._name_keys(names):
+            self.names.add(key, record)
+        for key in self._token_keys(token_sources):
+            self.tokens.add(key, record)
+        self.clear_cache()
+
+    def _name_keys(self, names: Iterable[str]) -> set:
+        keys = set()
+        for name in names:
+            key = normalize(name)
+            if key:
+                keys.add(key)
+                # "US-11950524-B2" is also found as "us1195..."
+                keys.add(key.replace(" ", ""))
+        return keys
+
+    def _token_keys(self, sources: Iterable[str]) -> set:
+        return {token for source in sources for token in normalize(source).split()}
+
+    def suggest(self, query: str, limit: int = 5, threshold: int = 60) -> List[Tuple[int, float]]:
+        """(record, confidence) pairs for a partial query, best first"""
+        prefix = normalize(query)
+        key = (prefix, limit, threshold)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        results = self._prefix_matches(prefix, limit, threshold) if prefix else []
+        if not results:
+            self.fallbacks += 1
+            results = self.fallback(query, threshold, limit)
+
+        with self._lock:
+            self._cache[key] = results
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+    def _prefix_matches(self, prefix: str, limit: int, threshold: int) -> List[Tuple[int, float]]:
+        # Confidence falls as keys get longer, so keys past this length are below threshold
+        max_length = 100 * len(prefix) // threshold if threshold > 0 else None
+        matches = merge(
+            self.names.search(prefix, max_length),
+            self.tokens.search(prefix, max_length),
+            key=lambda entry: len(entry[0]),
+        )
+        results: Dict[int, float] = {}
+        for key, record in matches:
+            if record not in results:
+                results[record] = round(100 * len(prefix) / len(key), 1)
+                if len(results) >= limit:
+                    break
+        return list(results.items())
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "names": len(self.names),
+                "tokens": len(self.tokens),
+                "cache_size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "fallbacks": self.fallbacks,
+            }
@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundBuild(Generic[T]):
+    """
+    Builds a value once in a daemon thread, so that slow structures (search
+    indexes over the whole corpus) never hold up startup or a request.
+    get() starts the build on first use and returns None until it is ready;
+    callers answer "not ready yet" meanwhile. A failed build is reported and
+    started again by the next get().
+    """
+
+    def __init__(self, name: str, build: Callable[[], T]):
+        self.name = name
+        self.build = build
+        self.value: Optional[T] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def start(self):
+        """Start the build unless it is done or already running"""
+        with self._lock:
+            if self.value is not None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name=f"build {self.name}", daemon=True)
+            self._thread.start()
+
+    def get(self) -> Optional[T]:
+        """The built value, or None while it is being built"""
+        if self.value is None:
+            self.start()
+        return self.value
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[T]:
+        """Start the build if needed and block until it finishes"""
+        self.start()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.value
+
+    def _run(self):
+        try:
+            value = self.build()
+        except Exception as e:
+            print(f"Error building {self.name}: {str(e)}")
+            self.error = str(e)
+            return
+        self.build_seconds = time.perf_counter() - self.started_at
+        self.error = None
+        self.value = value
+
+    def stats(self) -> Dict:
+        """Build state, duration and last error"""
+        return {
+            "ready": self.ready,
+            "building": self._thread is not None and self._thread.is_alive(),
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+            "error": self.error,
+        }
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def normalize_product(product: Dict) -> Dict:
+    """Reduce a product payload to the fields that influence the analysis"""
+    return {
+        "name": " ".join(str(product.get("name", "")).split()),
+        "description": " ".join(str(product.get("description", "")).split()),
+    }
+
+
+def make_cache_key(
+    kind: str,
+    model: str,
+    prompt_version: str,
+    publication_number: str,
+    products: List[Dict],
+    settings: Optional[Dict] = None
+) -> str:
+    """
+    Build a content-addressed cache key for an analysis request.
+    Products are normalized and sorted so that whitespace and ordering
+    differences in the payload map onto the same entry. settings holds the
+    configuration that shapes the prompt (context size, claim selection), so
+    changing it does not serve results of the old prompts.
+    """
+    payload = {
+        "kind": kind,
+        "model": model,
+        "prompt_version": prompt_version,
+        "patent": publication_number,
+        "products": sorted(
+            (normalize_product(p) for p in products),
+            key=lambda p: (p["name"], p["description"])
+        ),
+        "settings": settings or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent analysis result cache with TTL expiry and LRU size bound.
+    Entries are kept in an OrderedDict (least recently used first) and
+    written to a JSON file so results survive a backend restart.
+    Changes only mark the cache dirty; start() flushes it to disk every
+    flush_interval seconds in a worker thread and stop() flushes once more,
+    so analyses never wait on the file. A flush_interval of 0 writes
+    through on every change instead.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: float = 86400.0,
+        max_entries: int = 512,
+        enabled: bool = True,
+        flush_interval: float = 5.0
+    ):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes file writes, which happen outside _lock
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> "AnalysisCache":
+        """Create a cache configured from environment variables"""
+        default_path = Path(__file__).parent.parent / "data" / "analysis_cache.json"
+        return cls(
+            path=Path(os.getenv("ANALYSIS_CACHE_PATH", str(default_path))),
+            ttl=float(os.getenv("ANALYSIS_CACHE_TTL", "86400")),
+            max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "512")),
+            enabled=os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            flush_interval=float(os.getenv("ANALYSIS_CACHE_FLUSH_INTERVAL", "5.0")),
+        )
+
+    async def start(self):
+        """Start flushing changes to disk in the background"""
+        if self._task is None and self.path and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background flush and write any pending changes"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._is_expired(entry):
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                self._changed()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key: str, value: Dict):
+        """Store a value, evicting the least recently used entries if needed"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = {"value": value, "created_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._changed()
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._changed()
+
+    def flush(self):
+        """Write the entries to disk if they changed since the last write"""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = [{"key": k, **v} for k, v in self._entries.items()]
+                self._dirty = False
+            self._save(snapshot)
+            self.flushes += 1
+
+    def _changed(self):
+        """Called with _lock held after entries changed"""
+        if self.flush_interval > 0:
+            self._dirty = True
+        else:
+            self._save([{"key": k, **v} for k, v in self._entries.items()])
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "dirty": self._dirty,
+                "flushes": self.flushes,
+            }
+
+    def _is_expired(self, entry: Dict) -> bool:
+        return self.ttl > 0 and time.time() - entry["created_at"] > self.ttl
+
+    def _load(self):
+        """Load persisted entries, dropping the ones that already expired"""
+        if not self.enabled or not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                content = f.read()
+            entries = json.loads(content) if content else []
+            for item in entries:
+                if not self._is_expired(item):
+                    self._entries[item["key"]] = {
+                        "value": item["value"],
+                        "created_at": item["created_at"],
+                    }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        except Exception as e:
+            print(f"Error loading analysis cache: {str(e)}")
+            self._entries.clear()
+
+    def _save(self, entries: List[Dict]):
+        """Write entries to disk in LRU order"""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error writing analysis cache: {str(e)}")
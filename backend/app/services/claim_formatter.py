@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Union
+from pydantic import BaseModel
+from app.database.models import Claim
+from app.services.patent_store import decode_claims
+from app.services.token_estimator import estimate_tokens
+
+
+class FormattedClaim(BaseModel):
+    """A claim rendered for a prompt"""
+    num: str
+    text: str
+    tokens: int
+
+
+class FormattedClaims(BaseModel):
+    """All claims of a patent rendered for a prompt"""
+    claims: List[FormattedClaim]
+    text: str
+    tokens: int
+
+
+class ClaimFormatter:
+    """
+    Memoized claim normalization.
+    Each patent's claims are decoded, cleaned and rendered once, keyed by
+    publication number and a hash of the claim content, so prompt assembly
+    only has to join ready-made strings.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], FormattedClaims]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def format(
+        self,
+        publication_number: str,
+        claims_data: Union[str, List[Dict], List[Claim]]
+    ) -> FormattedClaims:
+        """
+        Return the formatted claims of a patent, rendering them on first use.
+        Raises ValueError if the claims cannot be decoded.
+        """
+        key = (publication_number, _content_hash(claims_data))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        formatted = render_claims(decode_claims(claims_data))
+        with self._lock:
+            self._entries[key] = formatted
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return formatted
+
+    def stats(self) -> Dict:
+        """Memo hit/miss counters and size"""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def render_claims(claims: List[Claim]) -> FormattedClaims:
+    """Render decoded claims as "Claim N: text" blocks with per-claim token counts"""
+    formatted = []
+    for claim in claims:
+        text = f"Claim {claim.num}: {claim.text}"
+        formatted.append(FormattedClaim.model_construct(
+            num=claim.num,
+            text=text,
+            tokens=estimate_tokens(text)
+        ))
+    return FormattedClaims.model_construct(
+        claims=formatted,
+        text="\n\n".join(c.text for c in formatted),
+        tokens=sum(c.tokens for c in formatted)
+    )
+
+
+def _content_hash(claims_data: Union[str, List[Dict], List[Claim], None]) -> int:
+    """
+    Cheap in-process content hash.
+    str hashes are cached on the string object, so repeated calls with the
+    same claims string or the same decoded claims cost almost nothing.
+    """
+    if claims_data is None or isinstance(claims_data, str):
+        return hash(claims_data)
+    return hash(tuple(
+        (c.num, c.text) if isinstance(c, Claim) else (str(c.get("num")), c.get("text"))
+        for c in claims_data
+    ))
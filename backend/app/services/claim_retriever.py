@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.services.claim_formatter import FormattedClaim, FormattedClaims
+
+_WORDS = re.compile(r"[a-z0-9]+")
+_DEPENDENT = re.compile(r"\b(?:of|in|to|by) claims? \d+", re.IGNORECASE)
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or that the
+    their this to was were which with wherein whereby comprising comprises
+    comprise claim claims said least one more plurality configured further
+    including includes based each such first second
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms used for BM25 scoring"""
+    return [
+        word for word in _WORDS.findall(text.lower())
+        if len(word) > 2 and word not in STOPWORDS
+    ]
+
+
+def is_independent(claim: FormattedClaim) -> bool:
+    """Independent claims do not refer back to another claim"""
+    return _DEPENDENT.search(claim.text) is None
+
+
+class ClaimIndex:
+    """BM25 statistics over the claims of one patent"""
+
+    def __init__(self, content_hash: str, term_freqs: List[Dict[str, int]]):
+        self.content_hash = content_hash
+        self.term_freqs = term_freqs
+        self.lengths = [sum(tf.values()) for tf in term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.doc_freqs = Counter(term for tf in term_freqs for term in tf)
+
+    @classmethod
+    def build(cls, claims: FormattedClaims) -> "ClaimIndex":
+        return cls(
+            content_hash(claims),
+            [dict(Counter(tokenize(claim.text))) for claim in claims.claims]
+        )
+
+    def scores(self, query: str, k1: float = 1.2, b: float = 0.75) -> List[float]:
+        """BM25 score of every claim for the query"""
+        count = len(self.term_freqs)
+        scores = [0.0] * count
+        for term in set(tokenize(query)):
+            df = self.doc_freqs.get(term)
+            if not df:
+                continue
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for i, tf in enumerate(self.term_freqs):
+                freq = tf.get(term)
+                if freq:
+                    norm = k1 * (1 - b + b * self.lengths[i] / (self.avg_length or 1))
+                    scores[i] += idf * freq * (k1 + 1) / (freq + norm)
+        return scores
+
+    def to_dict(self) -> Dict:
+        return {"hash": self.content_hash, "term_freqs": self.term_freqs}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ClaimIndex":
+        return cls(data["hash"], data["term_freqs"])
+
+
+def content_hash(claims: FormattedClaims) -> str:
+    """Stable hash of the rendered claims, used to invalidate persisted indexes"""
+    return hashlib.sha1(claims.text.encode("utf-8")).hexdigest()
+
+
+class ClaimRetriever:
+    """
+    Local retrieval stage run before prompt building.
+    Scores each claim of a patent against the product description with BM25 and
+    keeps the top_n claims plus every independent claim, since infringement is
+    decided on independent claims. Per-patent indexes are persisted as JSON files
+    in index_dir and kept in a small in-memory LRU.
+    """
+
+    def __init__(
+        self,
+        index_dir: Optional[Path] = None,
+        top_n: int = 8,
+        max_loaded: int = 256
+    ):
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.top_n = top_n
+        self.max_loaded = max_loaded
+        self._indexes: "OrderedDict[str, ClaimIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ClaimRetriever":
+        """Create a retriever configured from environment variables"""
+        default_dir = Path(__file__).parent.parent / "data" / "claim_index"
+        return cls(
+            index_dir=Path(os.getenv("CLAIM_INDEX_DIR", str(default_dir))),
+            top_n=int(os.getenv("CLAIM_TOP_N", "8")),
+        )
+
+    def rank(self, publication_number: str, claims: FormattedClaims, query: str) -> List[FormattedClaim]:
+        """All claims ordered by BM25 score, ties in original order"""
+        scores = self.index_for(publication_number, claims).scores(query)
+        order = sorted(range(len(scores)), key=lambda i: -scores[i])
+        return [claims.claims[i] for i in order]
+
+    def select(self, publication_number: str, claims: FormattedClaims, query: str) -> List[FormattedClaim]:
+        """
+        Claims to show the LLM, most important first: independent claims,
+        then the top_n dependent claims by BM25 score.
+        A top_n of 0 or less disables the filter and ranks every claim.
+        """
+        ranked = self.rank(publication_number, claims, query)
+        if self.top_n <= 0:
+            return ranked
+        independent = [claim for claim in ranked if is_independent(claim)]
+        dependent = [claim for claim in ranked if not is_independent(claim)]
+        return independent + dependent[:self.top_n]
+
+    def index_for(self, publication_number: str, claims: FormattedClaims) -> ClaimIndex:
+        """Load or build the BM25 index for a patent's claims"""
+        digest = content_hash(claims)
+        with self._lock:
+            index = self._indexes.get(publication_number)
+            if index is not None and index.content_hash == digest:
+                self._indexes.move_to_end(publication_number)
+                return index
+
+        index = self._load(publication_number, digest)
+        if index is None:
+            index = ClaimIndex.build(claims)
+            self._save(publication_number, index)
+
+        with self._lock:
+            self._indexes[publication_number] = index
+            while len(self._indexes) > self.max_loaded:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _path(self, publication_number: str) -> Optional[Path]:
+        if not self.index_dir:
+            return None
+        safe_name = re.sub(r"[^A-Za-z0-9_-]", "_", publication_number)
+        return self.index_dir / f"{safe_name}.json"
+
+    def _load(self, publication_number: str, digest: str) -> Optional[ClaimIndex]:
+        path = self._path(publication_number)
+        if not path or not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("hash") == digest:
+                return ClaimIndex.from_dict(data)
+        except Exception as e:
+            print(f"Error loading claim index {path}: {str(e)}")
+        return None
+
+    def _save(self, publication_number: str, index: ClaimIndex):
+        path = self._path(publication_number)
+        if not path:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(index.to_dict(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing claim index {path}: {str(e)}")
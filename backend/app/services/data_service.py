@@ -2,61 +2,77 @@ from typing import List, Dict, Optional
 import json
 from pathlib import Path
 import os
+from app.database.models import Claim
+from app.services.patent_store import PatentStore
+from app.services.patent_corpus import PatentCorpus
 
 class DataService:
     def __init__(self, data_dir: Path = None):
         self.data_dir = data_dir or Path(__file__).parent.parent / "data"
         self._load_data()
-        
+
     def _load_data(self):
-        """Load all data files"""
+        """
+        Load all data files.
+        If PATENT_CORPUS_PATH points to a converted corpus file, patents are
+        memory-mapped from it and heavy fields are only read when accessed.
+        """
+        self.corpus = None
         try:
-            with open(self.data_dir / "patents.json") as f:
-                self.patents = json.load(f)
+            corpus_path = os.getenv("PATENT_CORPUS_PATH")
+            if corpus_path:
+                self.corpus = PatentCorpus(Path(corpus_path))
+                self.patents = self.corpus.patents()
+            else:
+                with open(self.data_dir / "patents.json") as f:
+                    self.patents = json.load(f)
             with open(self.data_dir / "company_products.json") as f:
                 self.companies = json.load(f)
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             self.patents = []
             self.companies = []
-            
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """Index patents by publication number and companies by lowercase name"""
+        self.store = PatentStore(self.patents, lazy_claims=self.corpus is not None)
+        self._companies_by_name = {
+            company["name"].lower(): company
+            for company in reversed(self._companies_list())
+        }
+
+    def _companies_list(self) -> List[Dict]:
+        """Companies as a list, whether the file wraps them in {"companies": [...]} or not"""
+        if isinstance(self.companies, dict):
+            return self.companies.get("companies", [])
+        return self.companies
+
     def get_patents(self) -> List[Dict]:
         """Get all patents"""
         return self.patents
-            
+
     def get_companies(self) -> List[Dict]:
         """Get all companies"""
         return self.companies
-        
+
+    def get_products(self) -> List[Dict]:
+        """Get every product of every company as {"company_name", "product"}"""
+        return [
+            {"company_name": company["name"], "product": product}
+            for company in self._companies_list()
+            for product in company.get("products", [])
+            if isinstance(product, dict)
+        ]
+
     def get_patent(self, patent_id: str) -> Optional[Dict]:
         """Get patent by ID"""
-        try:
-            return next(
-                (p for p in self.patents if p["publication_number"] == patent_id),
-                None
-            )
-        except Exception as e:
-            print(f"Error finding patent: {str(e)}")
-            return None
-            
+        return self.store.get(patent_id)
+
+    def get_claims(self, patent_id: str) -> Optional[List[Claim]]:
+        """Get the decoded claims of a patent, or None if the patent is unknown"""
+        return self.store.get_claims(patent_id)
+
     def get_company(self, company_name: str) -> Optional[Dict]:
         """Get company and its products"""
-        try:
-            # Check if data is in correct format
-            if not isinstance(self.companies, dict) or 'companies' not in self.companies:
-                print("Warning: Invalid companies data format")
-                return None
-            
-            # Get the companies array
-            companies_list = self.companies['companies']
-            
-            company = next(
-                (c for c in companies_list if c["name"].lower() == company_name.lower()),
-                None
-            )
-            
-            return company
-            
-        except Exception as e:
-            print(f"Error finding company: {str(e)}")
-            return None
\ No newline at end of file
+        return self._companies_by_name.get(company_name.lower())
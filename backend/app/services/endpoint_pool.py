@@ -0,0 +1,247 @@
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from app.services.llm_client import LLMClient
+
+
+class Endpoint:
+    """Routing state and latency statistics of one LLM host"""
+
+    def __init__(self, host: str, window: int = 100):
+        self.host = host.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.last_error: Optional[str] = None
+        self.latencies: deque = deque(maxlen=window)
+        # Exponentially weighted generation speed, None until measured
+        self.tokens_per_second: Optional[float] = None
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def record_success(self, seconds: float, body: Dict):
+        self.latencies.append(seconds)
+        eval_count = body.get("eval_count")
+        eval_seconds = (body.get("eval_duration") or 0) / 1e9 or seconds
+        if eval_count and eval_seconds > 0:
+            rate = eval_count / eval_seconds
+            self.tokens_per_second = rate if self.tokens_per_second is None else (
+                0.8 * self.tokens_per_second + 0.2 * rate
+            )
+
+    def record_failure(self, error: Exception, eject_seconds: float):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        self.ejected_until = time.monotonic() + eject_seconds
+
+    def stats(self) -> Dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        return {
+            "host": self.host,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "latency_mean": round(sum(ordered) / len(ordered), 3) if ordered else None,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "tokens_per_second": round(self.tokens_per_second, 1) if self.tokens_per_second else None,
+            "last_error": self.last_error,
+        }
+
+
+def _retryable(error: Exception) -> bool:
+    """Transport errors and 5xx responses are worth retrying on another host"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class EndpointPool:
+    """
+    Routes generations across several LLM hosts behind one client.
+    Each request goes to the available host with the fewest outstanding
+    requests ("least_outstanding") or the best measured generation speed per
+    queued request ("tokens_per_second"). A host that fails is ejected for
+    eject_seconds and the request is retried once on another host; a
+    background loop polls the backend's health endpoint (/api/tags for
+    Ollama) and marks hosts healthy or unhealthy.
+    Exposes the same generate / generate_stream / aclose interface as LLMClient.
+    """
+
+    def __init__(
+        self,
+        client: LLMClient,
+        hosts: List[str],
+        strategy: str = "least_outstanding",
+        eject_seconds: float = 30.0,
+        health_interval: float = 15.0
+    ):
+        if strategy not in ("least_outstanding", "tokens_per_second"):
+            raise ValueError(f"Unknown routing strategy {strategy!r}")
+        self.client = client
+        self.endpoints = [Endpoint(host) for host in (hosts or [client.host])]
+        self.strategy = strategy
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def host(self) -> str:
+        return self.endpoints[0].host
+
+    @property
+    def supports_keep_alive(self) -> bool:
+        return self.client.supports_keep_alive
+
+    @property
+    def supports_context(self) -> bool:
+        return self.client.supports_context
+
+    def pick(self, exclude: Optional[Endpoint] = None) -> Optional[Endpoint]:
+        """
+        Choose the endpoint for the next request.
+        Falls back to unavailable endpoints when every host is ejected or
+        unhealthy, so a transient outage of all hosts does not block traffic.
+        """
+        candidates = [e for e in self.endpoints if e is not exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        available = [e for e in candidates if e.available(now)] or candidates
+
+        if self.strategy == "tokens_per_second":
+            measured = [e.tokens_per_second for e in available if e.tokens_per_second]
+            # Unmeasured hosts are assumed as fast as the fastest one so they get tried
+            default = max(measured) if measured else 1.0
+            return max(
+                available,
+                key=lambda e: ((e.tokens_per_second or default) / (e.outstanding + 1), -e.requests)
+            )
+        return min(available, key=lambda e: (e.outstanding, e.requests))
+
+    async def generate(self, payload: Dict, host: Optional[str] = None) -> Dict:
+        """
+        Run a generation on the best endpoint, retrying once on another host
+        if it fails with a transport error or a 5xx response.
+        """
+        endpoint = self._endpoint(host) or self.pick()
+        try:
+            return await self._generate_on(endpoint, payload)
+        except httpx.HTTPError as e:
+            retry = self.pick(exclude=endpoint) if _retryable(e) and host is None else None
+            if retry is None:
+                raise
+            retry.retries += 1
+            return await self._generate_on(retry, payload)
+
+    async def _generate_on(self, endpoint: Endpoint, payload: Dict) -> Dict:
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        start = time.perf_counter()
+        try:
+            body = await self.client.generate(payload, host=endpoint.host)
+        except httpx.HTTPError as e:
+            if _retryable(e):
+                endpoint.record_failure(e, self.eject_seconds)
+            raise
+        finally:
+            endpoint.outstanding -= 1
+        endpoint.record_success(time.perf_counter() - start, body)
+        return body
+
+    async def generate_stream(self, payload: Dict, host: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Stream a generation from the best endpoint.
+        A failure before the first chunk is retried once on another host;
+        once tokens have been yielded the error is raised to the caller.
+        """
+        endpoint = self._endpoint(host) or self.pick()
+        for attempt in range(2):
+            current = endpoint
+            started = False
+            current.outstanding += 1
+            current.requests += 1
+            start = time.perf_counter()
+            try:
+                async for chunk in self.client.generate_stream(payload, host=current.host):
+                    started = True
+                    if chunk.get("done"):
+                        current.record_success(time.perf_counter() - start, chunk)
+                    yield chunk
+                return
+            except httpx.HTTPError as e:
+                if _retryable(e):
+                    current.record_failure(e, self.eject_seconds)
+                retry = None
+                if attempt == 0 and not started and _retryable(e) and host is None:
+                    retry = self.pick(exclude=current)
+                if retry is None:
+                    raise
+                retry.retries += 1
+                endpoint = retry
+            finally:
+                current.outstanding -= 1
+
+    def _endpoint(self, host: Optional[str]) -> Optional[Endpoint]:
+        if host is None:
+            return None
+        host = host.rstrip("/")
+        return next((e for e in self.endpoints if e.host == host), None) or Endpoint(host)
+
+    async def check_health(self):
+        """Probe every endpoint's health path and update its state"""
+        async def probe(endpoint: Endpoint):
+            try:
+                await self.client.check_health(endpoint.host)
+            except httpx.HTTPError as e:
+                if endpoint.healthy:
+                    print(f"LLM endpoint {endpoint.host} unhealthy: {str(e)}")
+                endpoint.healthy = False
+                endpoint.last_error = str(e) or type(e).__name__
+                return
+            if not endpoint.healthy:
+                print(f"LLM endpoint {endpoint.host} healthy again")
+            endpoint.healthy = True
+            endpoint.ejected_until = 0.0
+
+        await asyncio.gather(*(probe(endpoint) for endpoint in self.endpoints))
+
+    async def _health_loop(self):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def start(self):
+        """Start background health checks"""
+        if self.health_interval > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    def stats(self) -> List[Dict]:
+        """Per-endpoint routing and latency statistics"""
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+    async def aclose(self):
+        """Stop health checks and close pooled connections"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await self.client.aclose()
@@ -0,0 +1,268 @@
+"""
+Deterministic fake LLM server for CPU-only load tests and benchmarks.
+
+Serves Ollama's /api/generate and /api/tags and OpenAI's /v1/chat/completions.
+Responses are valid JSON for the requested schema, derived from a hash of the
+prompt, so the same prompt always gets the same answer. Latency is simulated
+as a fixed overhead, prompt processing at prompt_tokens_per_second and
+generation at tokens_per_second. Like Ollama, the model is "loaded" on first
+use (load_seconds) and unloaded once keep_alive expires, and responses report
+load_duration, prompt_eval_duration and eval_duration.
+
+Use it in-process with LLM_BACKEND=fake, or run it as a server:
+
+    cd backend
+    python -m app.services.fake_llm --port 11435 --tokens-per-second 40
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.token_estimator import estimate_tokens
+
+_PRODUCT_NAMES = re.compile(r"^\s*Name: (.+?)\s*$", re.MULTILINE)
+_CHUNKS = re.compile(r"\s*\S{1,4}")
+_LIKELIHOODS = [(75, "High"), (40, "Moderate"), (0, "Low")]
+_DURATION = re.compile(r"^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def keep_alive_seconds(value, default: float = 300.0) -> float:
+    """Parse an Ollama keep_alive ("30m", "1h", 600, -1 for forever) into seconds"""
+    if value is None:
+        return default
+    match = _DURATION.match(str(value).strip())
+    if not match:
+        return default
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def _item_fields(schema: Dict) -> Optional[set]:
+    """Property names of the items of a {"products": [...]} schema, resolving $ref"""
+    items = schema["properties"]["products"].get("items", {})
+    ref = items.get("$ref", "")
+    if ref.startswith("#/$defs/"):
+        items = schema.get("$defs", {}).get(ref[len("#/$defs/"):], {})
+    properties = items.get("properties")
+    return set(properties) if properties else None
+
+
+class FakeLLM:
+    """Configuration and response generation of the fake server"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_second: float = 0.0,
+        prompt_tokens_per_second: float = 0.0,
+        load_seconds: float = 0.0,
+        model: str = "fake"
+    ):
+        # A rate of 0 means that phase takes no time
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.load_seconds = load_seconds
+        self.model = model
+        self.loaded_until = 0.0
+        self.loads = 0
+        self.requests = 0
+        # Set to False to make every endpoint answer 503
+        self.available = True
+
+    @classmethod
+    def from_env(cls) -> "FakeLLM":
+        """Create a fake configured from environment variables"""
+        return cls(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.0")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0.0")),
+            prompt_tokens_per_second=float(os.getenv("FAKE_LLM_PROMPT_TOKENS_PER_SECOND", "0.0")),
+            load_seconds=float(os.getenv("FAKE_LLM_LOAD_SECONDS", "0.0")),
+        )
+
+    def respond(self, prompt: str, schema: Optional[Dict]) -> str:
+        """Deterministic JSON answer to a prompt"""
+        names = _PRODUCT_NAMES.findall(prompt) or ["Product"]
+        analyses = [self._analysis(prompt, name) for name in names]
+        if schema and "products" in schema.get("properties", {}):
+            fields = _item_fields(schema)
+            return json.dumps({"products": [
+                {k: v for k, v in analysis.items() if fields is None or k in fields}
+                for analysis in analyses
+            ]})
+        return json.dumps(analyses[0])
+
+    def _analysis(self, prompt: str, product_name: str) -> Dict:
+        digest = hashlib.sha256(f"{product_name}\x00{prompt}".encode("utf-8")).digest()
+        score = digest[0] % 101
+        likelihood = next(label for floor, label in _LIKELIHOODS if score >= floor)
+        return {
+            "product_name": product_name,
+            "infringement_score": score,
+            "infringement_likelihood": likelihood,
+            "relevant_claims": [str(1 + digest[1] % 5)],
+            "explanation": f"Deterministic fake analysis of {product_name}.",
+            "specific_features": [f"feature-{digest[2]:02x}", f"feature-{digest[3]:02x}"],
+        }
+
+    def _prompt_seconds(self, prompt_tokens: int) -> float:
+        return prompt_tokens / self.prompt_tokens_per_second if self.prompt_tokens_per_second else 0.0
+
+    def _token_seconds(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    async def _load(self, keep_alive) -> float:
+        """Simulate loading the model if it is not resident; returns the load time"""
+        now = time.monotonic()
+        load = 0.0
+        if now >= self.loaded_until:
+            self.loads += 1
+            load = self.load_seconds
+            await asyncio.sleep(load)
+        self.loaded_until = time.monotonic() + keep_alive_seconds(keep_alive)
+        return load
+
+    def _timings(self, load: float, prompt_tokens: int, eval_count: int, started: float) -> Dict:
+        return {
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": eval_count,
+            "load_duration": int(load * 1e9),
+            "prompt_eval_duration": int(self._prompt_seconds(prompt_tokens) * 1e9),
+            "eval_duration": int(self._token_seconds() * eval_count * 1e9),
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+        }
+
+    async def generate(
+        self,
+        prompt: str,
+        schema: Optional[Dict],
+        keep_alive=None,
+        context: Optional[List[int]] = None,
+        num_predict: Optional[int] = None
+    ) -> Dict:
+        """
+        Ollama-shaped non-streaming response, after the simulated delay.
+        Tokens passed back as context count as cached: only the new prompt is
+        evaluated, and the returned context covers the whole conversation.
+        """
+        started = time.perf_counter()
+        self.requests += 1
+        load = await self._load(keep_alive)
+        if not prompt:
+            # An empty prompt only loads the model, as in Ollama
+            return {"model": self.model, "response": "", "done": True, **self._timings(load, 0, 0, started)}
+        prompt_tokens = estimate_tokens(prompt)
+        chunks = _CHUNKS.findall(self.respond(prompt, schema))
+        if num_predict is not None and num_predict >= 0:
+            chunks = chunks[:num_predict]
+        await asyncio.sleep(self.latency + self._prompt_seconds(prompt_tokens) + self._token_seconds() * len(chunks))
+        history = len(context or [])
+        return {
+            "model": self.model,
+            "response": "".join(chunks),
+            "done": True,
+            "context": list(range(history + prompt_tokens + len(chunks))),
+            **self._timings(load, prompt_tokens, len(chunks), started),
+        }
+
+    async def stream(self, prompt: str, schema: Optional[Dict], keep_alive=None) -> AsyncIterator[Dict]:
+        """Yield Ollama-shaped chunks at the configured token rate, timings on the last one"""
+        started = time.perf_counter()
+        self.requests += 1
+        load = await self._load(keep_alive)
+        prompt_tokens = estimate_tokens(prompt)
+        await asyncio.sleep(self.latency + self._prompt_seconds(prompt_tokens))
+        count = 0
+        for chunk in _CHUNKS.findall(self.respond(prompt, schema)):
+            await asyncio.sleep(self._token_seconds())
+            count += 1
+            yield {"model": self.model, "response": chunk, "done": False}
+        yield {"model": self.model, "response": "", "done": True, **self._timings(load, prompt_tokens, count, started)}
+
+    def app(self) -> FastAPI:
+        """ASGI app serving the Ollama and OpenAI-compatible endpoints"""
+        app = FastAPI(title="Fake LLM")
+
+        @app.middleware("http")
+        async def outage(request: Request, call_next):
+            if not self.available:
+                return JSONResponse(status_code=503, content={"error": "unavailable"})
+            return await call_next(request)
+
+        @app.get("/api/tags")
+        async def tags():
+            return {"models": [{"name": self.model}]}
+
+        @app.get("/v1/models")
+        async def models():
+            return {"data": [{"id": self.model}]}
+
+        @app.post("/api/generate")
+        async def generate(request: Request):
+            payload = await request.json()
+            schema = payload.get("format") if isinstance(payload.get("format"), dict) else None
+            keep_alive = payload.get("keep_alive")
+            if not payload.get("stream", True):
+                return await self.generate(
+                    payload.get("prompt", ""),
+                    schema,
+                    keep_alive,
+                    payload.get("context"),
+                    (payload.get("options") or {}).get("num_predict")
+                )
+
+            async def lines():
+                async for chunk in self.stream(payload.get("prompt", ""), schema, keep_alive):
+                    yield json.dumps(chunk) + "\n"
+
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            payload = await request.json()
+            prompt = "\n".join(m.get("content", "") for m in payload.get("messages", []))
+            response_format = payload.get("response_format") or {}
+            schema = (response_format.get("json_schema") or {}).get("schema")
+            if not payload.get("stream"):
+                body = await self.generate(prompt, schema, num_predict=payload.get("max_tokens"))
+                return {
+                    "model": self.model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": body["response"]}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": body["prompt_eval_count"], "completion_tokens": body["eval_count"]},
+                }
+
+            async def events():
+                async for chunk in self.stream(prompt, schema):
+                    if chunk["response"]:
+                        yield "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": chunk["response"]}}]}) + "\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the deterministic fake LLM server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=float(os.getenv("FAKE_LLM_LATENCY", "0.0")))
+    parser.add_argument("--tokens-per-second", type=float, default=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0.0")))
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=float(os.getenv("FAKE_LLM_PROMPT_TOKENS_PER_SECOND", "0.0")))
+    parser.add_argument("--load-seconds", type=float, default=float(os.getenv("FAKE_LLM_LOAD_SECONDS", "0.0")))
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    fake = FakeLLM(args.latency, args.tokens_per_second, args.prompt_tokens_per_second, args.load_seconds)
+    uvicorn.run(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.claim_retriever import tokenize
+from app.services.patent_store import decode_claims
+
+# Searchable patent fields and how much a match in each counts
+FIELD_BOOSTS = {"title": 3.0, "abstract": 2.0, "claims": 1.5, "description": 1.0}
+
+_PHRASES = re.compile(r'"([^"]*)"')
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Free terms and "quoted phrases" of a query, tokenized like the documents"""
+    phrases = [terms for terms in (tokenize(text) for text in _PHRASES.findall(query)) if terms]
+    return tokenize(_PHRASES.sub(" ", query)), phrases
+
+
+def patent_fields(patent: Dict) -> Dict[str, str]:
+    """
+    Text of each searchable field of a patent.
+    Claims are decoded from the raw record rather than through the data
+    service, so indexing the corpus does not keep every decoded claim list.
+    """
+    try:
+        claims = decode_claims(patent.get("claims"))
+    except ValueError:
+        claims = []
+    return {
+        "title": patent.get("title") or "",
+        "abstract": patent.get("abstract") or "",
+        "claims": "\n".join(claim.text for claim in claims),
+        "description": patent.get("description") or "",
+    }
+
+
+def patent_documents(data_service) -> Iterable[Tuple[str, Dict[str, str]]]:
+    """(publication number, fields) of every patent in the corpus"""
+    for patent in data_service.get_patents():
+        yield patent["publication_number"], patent_fields(patent)
+
+
+def _ragged(starts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Flat indices of the ranges [start, start + length) and the range each came from"""
+    owners = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, owners
+
+
+class Segment:
+    """
+    Immutable positional postings of a batch of documents.
+    Per field: the sorted vocabulary, and for each term a run of postings
+    (doc id ascending, term frequency) whose positions are stored back to back.
+    """
+
+    ARRAYS = ("terms", "offsets", "docs", "tfs", "positions")
+
+    def __init__(self, fields: Dict[str, Dict[str, np.ndarray]]):
+        self.fields = fields
+        for arrays in fields.values():
+            arrays["pos_offsets"] = np.concatenate([[0], np.cumsum(arrays["tfs"], dtype=np.int64)])
+
+    @classmethod
+    def build(cls, documents: List[Tuple[int, Dict[str, List[str]]]], field_names: Iterable[str]) -> "Segment":
+        """Index tokenized documents, given in ascending doc id order"""
+        doc_ids = np.array([doc for doc, _ in documents], dtype=np.int32)
+        fields = {}
+        for field in field_names:
+            vocabulary: Dict[str, int] = {}
+            ids: List[int] = []
+            lengths = []
+            for _, tokens in documents:
+                words = tokens.get(field, ())
+                lengths.append(len(words))
+                ids.extend([vocabulary.setdefault(word, len(vocabulary)) for word in words])
+            lengths = np.array(lengths, dtype=np.int64)
+
+            # One entry per token, sorted into (term, doc, position) order
+            terms = np.array(list(vocabulary), dtype=str) if vocabulary else np.zeros(0, dtype="<U1")
+            alphabetical = np.argsort(terms)
+            ranks = np.empty(len(terms), dtype=np.int64)
+            ranks[alphabetical] = np.arange(len(terms))
+            term = ranks[np.array(ids, dtype=np.int64)]
+            docs = np.repeat(doc_ids, lengths)
+            positions = np.arange(len(term)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            order = np.lexsort((positions, docs, term))
+            term, docs, positions = term[order], docs[order], positions[order]
+
+            # A posting starts wherever the term or the doc changes
+            boundaries = np.ones(len(term), dtype=bool)
+            boundaries[1:] = (term[1:] != term[:-1]) | (docs[1:] != docs[:-1])
+            starts = np.flatnonzero(boundaries)
+            fields[field] = {
+                "terms": terms[alphabetical],
+                "offsets": np.concatenate([[0], np.cumsum(np.bincount(term[starts], minlength=len(terms)))]),
+                "docs": docs[starts],
+                "tfs": np.diff(np.append(starts, len(term))).astype(np.int32),
+                "positions": positions.astype(np.int32),
+            }
+        return cls(fields)
+
+    @classmethod
+    def load(cls, path: Path) -> "Segment":
+        with np.load(path) as data:
+            fields: Dict[str, Dict[str, np.ndarray]] = {}
+            for name in data.files:
+                field, array = name.rsplit(".", 1)
+                fields.setdefault(field, {})[array] = data[name]
+        return cls(fields)
+
+    def save(self, path: Path):
+        np.savez(path, **{
+            f"{field}.{name}": arrays[name]
+            for field, arrays in self.fields.items() for name in self.ARRAYS
+        })
+
+    def _row(self, field: str, term: str) -> Optional[int]:
+        arrays = self.fields.get(field)
+        if arrays is None or not len(arrays["terms"]):
+            return None
+        row = int(np.searchsorted(arrays["terms"], term))
+        if row < len(arrays["terms"]) and arrays["terms"][row] == term:
+            return row
+        return None
+
+    def postings(self, field: str, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids and term frequencies of a term"""
+        row = self._row(field, term)
+        if row is None:
+            return _EMPTY, _EMPTY
+        arrays = self.fields[field]
+        start, end = arrays["offsets"][row], arrays["offsets"][row + 1]
+        return arrays["docs"][start:end], arrays["tfs"][start:end]
+
+    def phrase(self, field: str, terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids containing the terms at consecutive positions, and how often"""
+        if len(terms) == 1:
+            return self.postings(field, terms[0])
+        rows = [self._row(field, term) for term in terms]
+        if any(row is None for row in rows):
+            return _EMPTY, _EMPTY
+        arrays = self.fields[field]
+        offsets = arrays["offsets"]
+
+        common = None
+        for row in rows:
+            docs = arrays["docs"][offsets[row]:offsets[row + 1]]
+            common = docs if common is None else np.intersect1d(common, docs, assume_unique=True)
+            if not len(common):
+                return _EMPTY, _EMPTY
+
+        # Phrase starts shared by every term, keyed by (candidate, position - term index)
+        starts = None
+        for i, row in enumerate(rows):
+            docs = arrays["docs"][offsets[row]:offsets[row + 1]]
+            postings = offsets[row] + np.searchsorted(docs, common)
+            first = arrays["pos_offsets"][postings]
+            flat, owners = _ragged(first, arrays["pos_offsets"][postings + 1] - first)
+            shifted = arrays["positions"][flat].astype(np.int64) - i
+            keys = (owners.astype(np.int64) << 32) | np.where(shifted >= 0, shifted, 0)
+            keys = keys[shifted >= 0]
+            starts = keys if starts is None else np.intersect1d(starts, keys, assume_unique=True)
+            if not len(starts):
+                return _EMPTY, _EMPTY
+        freqs = np.bincount(starts >> 32, minlength=len(common))
+        found = freqs > 0
+        return common[found], freqs[found].astype(np.int32)
+
+    @classmethod
+    def merge(cls, segments: List["Segment"], live: np.ndarray, field_names: Iterable[str]) -> "Segment":
+        """One segment holding the postings of live documents from all segments, in order"""
+        fields = {}
+        for field in field_names:
+            parts = [segment.fields[field] for segment in segments if field in segment.fields]
+            vocabulary = np.unique(np.concatenate([part["terms"] for part in parts] or [np.zeros(0, dtype="<U1")]))
+            term_ids, docs, tfs, pos_starts = [], [], [], []
+            positions_base = 0
+            for part in parts:
+                rows = np.searchsorted(vocabulary, part["terms"])
+                term_ids.append(np.repeat(rows, np.diff(part["offsets"])))
+                docs.append(part["docs"])
+                tfs.append(part["tfs"])
+                pos_starts.append(part["pos_offsets"][:-1] + positions_base)
+                positions_base += len(part["positions"])
+            term_ids = np.concatenate(term_ids or [_EMPTY]).astype(np.int64)
+            docs = np.concatenate(docs or [_EMPTY])
+            tfs = np.concatenate(tfs or [_EMPTY])
+            pos_starts = np.concatenate(pos_starts or [np.zeros(0, dtype=np.int64)])
+            all_positions = np.concatenate([part["positions"] for part in parts] or [_EMPTY])
+
+            keep = np.flatnonzero(live[docs])
+            # Segments hold increasing doc ids, so a stable sort keeps docs ascending per term
+            keep = keep[np.argsort(term_ids[keep], kind="stable")]
+            counts = np.bincount(term_ids[keep], minlength=len(vocabulary))
+            flat, _ = _ragged(pos_starts[keep], tfs[keep].astype(np.int64))
+            used = counts > 0
+            fields[field] = {
+                "terms": vocabulary[used],
+                "offsets": np.concatenate([[0], np.cumsum(counts[used], dtype=np.int64)]),
+                "docs": docs[keep],
+                "tfs": tfs[keep],
+                "positions": all_positions[flat],
+            }
+        return cls(fields)
+
+
+class FullTextIndex:
+    """
+    Persisted BM25 inverted index over patent fields with phrase queries.
+    Documents are added in segments: sync() hashes every patent's fields and
+    indexes only new or changed patents into a new segment, marking their
+    previous versions (and patents no longer in the corpus) as deleted.
+    Segments are merged once there are more than max_segments. Each field is
+    scored with BM25 on its own and the scores are summed with FIELD_BOOSTS.
+    "Quoted phrases" must occur in at least one searched field; document
+    frequencies include deleted documents until the next merge.
+    """
+
+    def __init__(
+        self,
+        index_dir: Optional[Path] = None,
+        boosts: Optional[Dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_segments: int = 8
+    ):
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.boosts = dict(boosts or FIELD_BOOSTS)
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> "FullTextIndex":
+        """Create an index configured from environment variables"""
+        default_dir = Path(__file__).parent.parent / "data" / "fulltext_index"
+        return cls(
+            index_dir=Path(os.getenv("FULLTEXT_INDEX_DIR", str(default_dir))),
+            max_segments=int(os.getenv("FULLTEXT_MAX_SEGMENTS", "8")),
+        )
+
+    def _reset(self):
+        self.keys: List[str] = []
+        self.hashes: List[str] = []
+        self.live = np.zeros(0, dtype=bool)
+        self.lengths = {field: np.zeros(0, dtype=np.int32) for field in self.boosts}
+        self.segments: List[Segment] = []
+        self.segment_files: List[str] = []
+        self._next_segment = 0
+        self._by_key: Dict[str, int] = {}
+        self._update_stats()
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def _update_stats(self):
+        count = int(self.live.sum())
+        self._avg_lengths = {
+            field: float(lengths[self.live].mean()) if count else 0.0
+            for field, lengths in self.lengths.items()
+        }
+        # BM25 length normalisation of every document, so queries only gather it
+        self._norms = {
+            field: (self.k1 * (1 - self.b + self.b * lengths / (self._avg_lengths[field] or 1.0))).astype(np.float32)
+            for field, lengths in self.lengths.items()
+        }
+
+    def sync(self, documents: Iterable[Tuple[str, Dict[str, str]]], delete_missing: bool = True) -> Dict:
+        """
+        Bring the index up to date with (publication number, fields) documents.
+        Only new and changed documents are tokenized and indexed. With
+        delete_missing, indexed documents that are not in `documents` are deleted.
+        Returns the number of added, updated and deleted documents.
+        """
+        with self._lock:
+            seen = set()
+            changed: List[Tuple[str, str, Dict[str, List[str]]]] = []
+            for key, fields in documents:
+                seen.add(key)
+                digest = _fields_hash(fields)
+                doc = self._by_key.get(key)
+                if doc is not None and self.hashes[doc] == digest:
+                    continue
+                changed.append((key, digest, {field: tokenize(fields.get(field) or "") for field in self.boosts}))
+            missing = [key for key in self._by_key if key not in seen] if delete_missing else []
+
+            updated = sum(1 for key, _, _ in changed if key in self._by_key)
+            if not changed and not missing:
+                return {"added": 0, "updated": 0, "deleted": 0}
+
+            live = list(self.live)
+            for key in missing + [key for key, _, _ in changed if key in self._by_key]:
+                live[self._by_key.pop(key)] = False
+
+            batch = []
+            lengths = {field: list(values) for field, values in self.lengths.items()}
+            for key, digest, tokens in changed:
+                doc = len(self.keys)
+                self.keys.append(key)
+                self.hashes.append(digest)
+                live.append(True)
+                for field in self.boosts:
+                    lengths[field].append(len(tokens[field]))
+                self._by_key[key] = doc
+                batch.append((doc, tokens))
+            self.live = np.array(live, dtype=bool)
+            self.lengths = {field: np.array(values, dtype=np.int32) for field, values in lengths.items()}
+
+            if batch:
+                self.segments.append(Segment.build(batch, self.boosts))
+                self.segment_files.append(self._new_segment_file(self.segments[-1]))
+            if len(self.segments) > self.max_segments:
+                self._merge()
+            self._update_stats()
+            self._save()
+            return {"added": len(changed) - updated, "updated": updated, "deleted": len(missing)}
+
+    def _merge(self):
+        merged = Segment.merge(self.segments, self.live, self.boosts)
+        old_files = self.segment_files
+        self.segments = [merged]
+        self.segment_files = [self._new_segment_file(merged)]
+        for name in old_files:
+            if self.index_dir and name:
+                (self.index_dir / name).unlink(missing_ok=True)
+
+    def search(self, query: str, limit: int = 10, fields: Optional[List[str]] = None) -> Tuple[int, List[Tuple[str, float]]]:
+        """
+        Rank live documents for a query of free terms and "quoted phrases".
+        Returns the number of matching documents and the top `limit`
+        (publication number, score) pairs, best first.
+        """
+        terms, phrases = parse_query(query)
+        with self._lock:
+            segments, live, norms, keys = self.segments, self.live, self._norms, self.keys
+        fields = [field for field in (fields or self.boosts) if field in self.boosts]
+        count = max(int(live.sum()), 1)
+        scores = np.zeros(len(keys), dtype=np.float32)
+
+        def add(field: str, hits: List[Tuple[np.ndarray, np.ndarray]]):
+            df = sum(len(docs) for docs, _ in hits)
+            if not df:
+                return
+            idf = np.log1p((count - df + 0.5) / (df + 0.5))
+            for docs, tfs in hits:
+                if not len(docs):
+                    continue
+                tfs = tfs.astype(np.float32)
+                scores[docs] += np.float32(self.boosts[field] * idf * (self.k1 + 1)) * tfs / (tfs + norms[field][docs])
+
+        for term in set(terms):
+            for field in fields:
+                add(field, [segment.postings(field, term) for segment in segments])
+
+        required = None
+        for phrase in phrases:
+            matched = np.zeros(len(keys), dtype=bool)
+            for field in fields:
+                hits = [segment.phrase(field, phrase) for segment in segments]
+                add(field, hits)
+                for docs, _ in hits:
+                    matched[docs] = True
+            required = matched if required is None else required & matched
+
+        found = live & (scores > 0)
+        if required is not None:
+            found &= required
+        candidates = np.flatnonzero(found)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        order = sorted(candidates.tolist(), key=lambda doc: (-scores[doc], doc))
+        return int(found.sum()), [(keys[doc], float(scores[doc])) for doc in order]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "documents": len(self._by_key),
+                "deleted": int(len(self.keys) - self.live.sum()),
+                "segments": len(self.segments),
+                "average_lengths": {field: round(value, 1) for field, value in self._avg_lengths.items()},
+            }
+
+    def _new_segment_file(self, segment: Segment) -> str:
+        self._next_segment += 1
+        name = f"segment-{self._next_segment:06d}.npz"
+        if self.index_dir:
+            try:
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+                segment.save(self.index_dir / name)
+            except Exception as e:
+                print(f"Error writing full-text segment {name}: {str(e)}")
+        return name
+
+    def _save(self):
+        """Write document state and the manifest; segments are written when created"""
+        if not self.index_dir:
+            return
+        try:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            docs_path = self.index_dir / "docs.npz"
+            with open(docs_path.with_suffix(".tmp"), "wb") as f:
+                np.savez(
+                    f,
+                    keys=np.array(self.keys, dtype=str) if self.keys else np.zeros(0, dtype="<U1"),
+                    hashes=np.array(self.hashes, dtype=str) if self.hashes else np.zeros(0, dtype="<U1"),
+                    live=self.live,
+                    **{f"{field}.lengths": values for field, values in self.lengths.items()}
+                )
+            os.replace(docs_path.with_suffix(".tmp"), docs_path)
+
+            manifest_path = self.index_dir / "manifest.json"
+            with open(manifest_path.with_suffix(".tmp"), "w") as f:
+                json.dump({
+                    "fields": list(self.boosts),
+                    "segments": self.segment_files,
+                    "next_segment": self._next_segment,
+                    "documents": len(self.keys),
+                }, f)
+            os.replace(manifest_path.with_suffix(".tmp"), manifest_path)
+        except Exception as e:
+            print(f"Error writing full-text index {self.index_dir}: {str(e)}")
+
+    def _load(self):
+        if not self.index_dir or not (self.index_dir / "manifest.json").exists():
+            return
+        try:
+            with open(self.index_dir / "manifest.json") as f:
+                manifest = json.load(f)
+            if manifest["fields"] != list(self.boosts):
+                print("Full-text index fields changed, rebuilding")
+                return
+            with np.load(self.index_dir / "docs.npz") as docs:
+                keys = docs["keys"].tolist()
+                if len(keys) != manifest["documents"]:
+                    raise ValueError("document table does not match the manifest")
+                self.keys = keys
+                self.hashes = docs["hashes"].tolist()
+                self.live = docs["live"]
+                self.lengths = {field: docs[f"{field}.lengths"] for field in self.boosts}
+            self.segments = [Segment.load(self.index_dir / name) for name in manifest["segments"]]
+            self.segment_files = list(manifest["segments"])
+            self._next_segment = manifest["next_segment"]
+            self._by_key = {key: doc for doc, key in enumerate(self.keys) if self.live[doc]}
+            self._update_stats()
+        except Exception as e:
+            print(f"Error loading full-text index {self.index_dir}: {str(e)}")
+            self._reset()
+
+
+def _fields_hash(fields: Dict[str, str]) -> str:
+    digest = hashlib.sha1()
+    for field in sorted(fields):
+        digest.update(field.encode("utf-8") + b"\x00" + (fields[field] or "").encode("utf-8") + b"\x00")
+    return digest.hexdigest()
@@ -1,105 +1,186 @@
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple
+import numpy as np
 from rapidfuzz import fuzz, process
 import json
 from pathlib import Path
 from app.services.data_service import DataService
+from app.services.ngram_index import NGramIndex
+from app.services.autocomplete import Autocomplete
 
 class FuzzyMatcher:
     def __init__(self, data_service: DataService):
         self.data_service = data_service
-        self.patents = self.data_service.get_patents()
+        self.patents = list(self.data_service.get_patents())
         self.companies = self.data_service.get_companies()
+        # Publication numbers by patent position, narrowing find_patent before scoring
+        self.patent_index = NGramIndex()
+        # Normalized choices, position-aligned with the records they came from
+        self.patent_titles: List[str] = []
+        for patent in self.patents:
+            self._index_patent(patent)
+        # Check if companies is a dictionary and has a "companies" key
+        if isinstance(self.companies, dict) and "companies" in self.companies:
+            self.company_records = self.companies["companies"]
+        else:
+            self.company_records = self.companies
+        self.company_names = [company["name"].lower() for company in self.company_records]
+        # Typeahead: prefix lookups first, fuzzy title / name scoring only when nothing starts with the query
+        self.patent_autocomplete = Autocomplete(self._fuzzy_title_suggestions)
+        self.patent_autocomplete.build(
+            (i, self._patent_names(patent), [patent.get("title") or ""]) for i, patent in enumerate(self.patents)
+        )
+        self.company_autocomplete = Autocomplete(self._fuzzy_company_suggestions)
+        self.company_autocomplete.build(
+            (i, [company["name"]], [company["name"]]) for i, company in enumerate(self.company_records)
+        )
+
+    def _index_patent(self, patent: Dict):
+        self.patent_index.add(patent["publication_number"])
+        self.patent_titles.append((patent.get("title") or "").lower())
+
+    def _patent_names(self, patent: Dict) -> List[str]:
+        return [patent.get("title") or "", patent["publication_number"]]
+
+    def add_patent(self, patent: Dict):
+        """Make a newly loaded patent searchable without rebuilding the index"""
+        self.patents.append(patent)
+        self._index_patent(patent)
+        self.patent_autocomplete.add(len(self.patents) - 1, self._patent_names(patent), [patent.get("title") or ""])
+
+    def suggest_patents(self, query: str, limit: int = 5, threshold: int = 60) -> List[Dict]:
+        """Complete a partial title or publication number"""
+        return [
+            {"patent": self.patents[index], "confidence": score, "is_exact": score == 100}
+            for index, score in self.patent_autocomplete.suggest(query, limit, threshold)
+        ]
+
+    def suggest_companies(self, query: str, limit: int = 5, threshold: int = 60) -> List[Dict]:
+        """Complete a partial company name"""
+        return [
+            {"company": self.company_records[index], "confidence": score, "is_exact": score == 100}
+            for index, score in self.company_autocomplete.suggest(query, limit, threshold)
+        ]
+
+    def _fuzzy_title_suggestions(self, query: str, threshold: int, limit: int) -> List[Tuple[int, float]]:
+        matches = process.extract(
+            query.lower(), self.patent_titles, scorer=fuzz.token_ratio, limit=limit, score_cutoff=threshold
+        )
+        return [(index, score) for _, score, index in matches]
+
+    def _fuzzy_company_suggestions(self, query: str, threshold: int, limit: int) -> List[Tuple[int, float]]:
+        matches = process.extract(
+            query.lower(), self.company_names, scorer=fuzz.WRatio, limit=limit, score_cutoff=threshold
+        )
+        return [(index, score) for _, score, index in matches]
 
     def find_patent(self, query: str, threshold: int = 80) -> List[Dict]:
         """Find patents matching the query"""
         # Normalize query
         query = query.upper().replace(" ", "")
-        
-        matches = []
-        for patent in self.patents:
-            patent_id = patent["publication_number"]
-            
-            # Exact match
-            if query == patent_id:
-                matches.append((patent, 100))
-                continue
-                
-            # Partial match
-            if query in patent_id:
-                matches.append((patent, 90))
-                continue
-                
-            # Fuzzy match
-            ratio = fuzz.ratio(query, patent_id)
-            if ratio >= threshold:
-                matches.append((patent, ratio))
-        
-        # Sort and return results
+        patent_ids = self.patent_index.strings
+
+        # Fuzzy match, scoring only the ids the index cannot rule out
+        scores = self.patent_index.ratio_matches(query, threshold)
+
+        # Exact and partial matches take precedence over the fuzzy score
+        for position in self.patent_index.substring_matches(query):
+            scores[position] = 100 if patent_ids[position] == query else 90
+
+        # Sort and return results, ties in patent order
         return [
             {
-                "patent": patent,
+                "patent": self.patents[position],
                 "confidence": score,
                 "is_exact": score == 100
             }
-            for patent, score in sorted(matches, key=lambda x: x[1], reverse=True)
+            for position, score in sorted(scores.items(), key=lambda x: (-x[1], x[0]))
         ]
 
     def find_company(self, query: str, threshold: int = 80) -> List[Dict]:
         """Find companies matching the query"""
-        # Check if companies is a dictionary and has a "companies" key
-        if isinstance(self.companies, dict) and "companies" in self.companies:
-            companies = self.companies["companies"]
-        else:
-            companies = self.companies
-        
-        company_names = [company["name"] for company in companies]
-        
         # Make comparison case insensitive
         matches = process.extract(
-            query.lower(),  # Convert query to lowercase
-            [name.lower() for name in company_names],  # Convert company names to lowercase
+            query.lower(),
+            self.company_names,
             scorer=fuzz.WRatio,
-            limit=5
+            limit=5,
+            score_cutoff=threshold
         )
-        
-        results = []
-        for match in matches:
-            name, score = match[0], match[1]
-            if score >= threshold:
-                # Find company using original name (preserving case)
-                company = next(c for c in companies if c["name"].lower() == name)
-                results.append({
-                    "company": company,
-                    "confidence": score,
-                    "is_exact": score == 100
-                })
-                
-        return results
+        return [
+            {
+                "company": self.company_records[index],
+                "confidence": score,
+                "is_exact": score == 100
+            }
+            for _, score, index in matches
+        ]
 
     def find_patent_by_title(self, query: str, threshold: int = 80) -> List[Dict]:
         """
         Find patents by matching title using token_ratio for balanced matching
         that handles both partial and complete matches
         """
-        patent_titles = [(p["title"].lower(), p) for p in self.patents]
-        
-        # Use process.extract with token_ratio
         matches = process.extract(
             query.lower(),
-            [title for title, _ in patent_titles],
+            self.patent_titles,
             scorer=fuzz.token_ratio,  # Better balance between partial and complete matching
-            limit=10
+            limit=10,
+            score_cutoff=threshold
+        )
+        return [
+            {
+                "patent": self.patents[index],
+                "confidence": score,
+                "is_exact": score == 100
+            }
+            for _, score, index in matches
+        ]
+
+    def find_companies(self, queries: List[str], threshold: int = 80, limit: int = 5) -> List[List[Dict]]:
+        """Resolve many company queries with one multi-threaded scoring call"""
+        return [
+            [
+                {"company": self.company_records[index], "confidence": score, "is_exact": score == 100}
+                for index, score in row
+            ]
+            for row in self._batch_extract(queries, self.company_names, fuzz.WRatio, threshold, limit)
+        ]
+
+    def find_patents_by_title(self, queries: List[str], threshold: int = 80, limit: int = 10) -> List[List[Dict]]:
+        """Resolve many title queries with one multi-threaded scoring call"""
+        return [
+            [
+                {"patent": self.patents[index], "confidence": score, "is_exact": score == 100}
+                for index, score in row
+            ]
+            for row in self._batch_extract(queries, self.patent_titles, fuzz.token_ratio, threshold, limit)
+        ]
+
+    def _batch_extract(
+        self,
+        queries: List[str],
+        choices: List[str],
+        scorer: Callable,
+        threshold: int,
+        limit: int
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        process.extract for every query at once: (choice index, score) pairs
+        of the top `limit` choices scoring at least threshold, best first and
+        ties in choice order, the same as process.extract returns them
+        """
+        if not queries or not choices:
+            return [[] for _ in queries]
+        scores = process.cdist(
+            [query.lower() for query in queries],
+            choices,
+            scorer=scorer,
+            score_cutoff=threshold,
+            dtype=np.float64,
+            workers=-1
         )
-        
         results = []
-        for match in matches:
-            title, score = match[0], match[1]
-            if score >= threshold:
-                patent = next(p for t, p in patent_titles if t == title)
-                results.append({
-                    "patent": patent,
-                    "confidence": score,
-                    "is_exact": score == 100
-                })
-        
-        return sorted(results, key=lambda x: x["confidence"], reverse=True)
\ No newline at end of file
+        for row in scores:
+            top = np.argsort(-row, kind="stable")[:limit]
+            results.append([(int(i), float(row[i])) for i in top if row[i] >= threshold])
+        return results
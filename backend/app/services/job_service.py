@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Handler signature: (payload, progress_callback) -> result dict with "status_code"
+JobHandler = Callable[[Dict, Callable[[float], None]], Awaitable[Dict]]
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+    pass
+
+
+class JobQueue:
+    """
+    Persistent background job queue drained by a bounded pool of asyncio workers.
+    Identical in-flight submissions (same dedupe key) are coalesced onto one job,
+    and unfinished jobs are re-queued when the queue is started again after a restart.
+    """
+
+    def __init__(
+        self,
+        handler: JobHandler,
+        path: Optional[Path] = None,
+        workers: int = 2,
+        max_queue_size: int = 100,
+        history_limit: int = 1000
+    ):
+        self.handler = handler
+        self.path = Path(path) if path else None
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.history_limit = history_limit
+        self.jobs: Dict[str, Dict] = {}
+        self._inflight: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wait_times = deque(maxlen=100)
+        self.coalesced = 0
+        self._load()
+
+    @classmethod
+    def from_env(cls, handler: JobHandler) -> "JobQueue":
+        """Create a job queue configured from environment variables"""
+        default_path = Path(__file__).parent.parent / "data" / "jobs.json"
+        return cls(
+            handler,
+            path=Path(os.getenv("ANALYSIS_JOBS_PATH", str(default_path))),
+            workers=int(os.getenv("ANALYSIS_JOB_WORKERS", "2")),
+            max_queue_size=int(os.getenv("ANALYSIS_JOB_QUEUE_SIZE", "100")),
+        )
+
+    async def start(self):
+        """Start the worker pool and re-queue jobs left unfinished by a previous run"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for job in sorted(self.jobs.values(), key=lambda j: j["created_at"]):
+            if job["status"] in (QUEUED, RUNNING):
+                job["status"] = QUEUED
+                job["progress"] = 0.0
+                job["started_at"] = None
+                self._inflight[job["dedupe_key"]] = job["id"]
+                self._queue.put_nowait(job["id"])
+        self._save()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs stay persisted for the next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._save()
+
+    def submit(self, payload: Dict, dedupe_key: str) -> Dict:
+        """
+        Enqueue a job and return its record.
+        If an identical job is already queued or running, that job is returned instead.
+        """
+        existing_id = self._inflight.get(dedupe_key)
+        if existing_id is not None:
+            self.coalesced += 1
+            return {**self.jobs[existing_id], "coalesced": True}
+
+        if self.queue_depth() >= self.max_queue_size:
+            raise QueueFullError(f"Job queue is full ({self.max_queue_size} jobs)")
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": QUEUED,
+            "progress": 0.0,
+            "payload": payload,
+            "dedupe_key": dedupe_key,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "status_code": None,
+        }
+        self.jobs[job["id"]] = job
+        self._inflight[dedupe_key] = job["id"]
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait(job["id"])
+        self._save()
+        return {**job, "coalesced": False}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a job record by ID"""
+        return self.jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict:
+        """Queue depth, worker utilisation and wait time statistics"""
+        now = time.time()
+        counts = {QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+        oldest_queued = None
+        for job in self.jobs.values():
+            counts[job["status"]] += 1
+            if job["status"] == QUEUED:
+                oldest_queued = min(oldest_queued or job["created_at"], job["created_at"])
+        waits = list(self._wait_times)
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_queue_size": self.max_queue_size,
+            "workers": self.workers,
+            "queued": counts[QUEUED],
+            "running": counts[RUNNING],
+            "completed": counts[COMPLETED],
+            "failed": counts[FAILED],
+            "coalesced": self.coalesced,
+            "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+            "max_wait_seconds": max(waits) if waits else 0.0,
+            "oldest_queued_seconds": now - oldest_queued if oldest_queued else 0.0,
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is not None and job["status"] == QUEUED:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict):
+        job["status"] = RUNNING
+        job["started_at"] = time.time()
+        self._wait_times.append(job["started_at"] - job["created_at"])
+        self._save()
+
+        def progress(value: float):
+            job["progress"] = max(0.0, min(1.0, value))
+
+        try:
+            result = await self.handler(job["payload"], progress)
+            job["status_code"] = result.get("status_code", 200)
+            if "error" in result:
+                job["status"] = FAILED
+                job["error"] = result["error"]
+            else:
+                job["status"] = COMPLETED
+                job["result"] = result.get("data")
+        except asyncio.CancelledError:
+            # Worker is shutting down; leave the job to be re-queued on restart
+            job["status"] = QUEUED
+            raise
+        except Exception as e:
+            job["status"] = FAILED
+            job["status_code"] = 500
+            job["error"] = f"Unexpected error: {str(e)}"
+
+        job["progress"] = 1.0
+        job["finished_at"] = time.time()
+        self._inflight.pop(job["dedupe_key"], None)
+        self._prune()
+        self._save()
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the history limit"""
+        finished = [
+            j for j in self.jobs.values() if j["status"] in (COMPLETED, FAILED)
+        ]
+        excess = len(finished) - self.history_limit
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j["finished_at"])[:excess]:
+                del self.jobs[job["id"]]
+
+    def _load(self):
+        """Load persisted jobs"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                content = f.read()
+            for job in (json.loads(content) if content else []):
+                self.jobs[job["id"]] = job
+        except Exception as e:
+            print(f"Error loading jobs: {str(e)}")
+
+    def _save(self):
+        """Write all jobs to disk"""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self.jobs.values()), f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error writing jobs: {str(e)}")
@@ -0,0 +1,277 @@
+import os
+import json
+import asyncio
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+
+
+class LLMClient(ABC):
+    """
+    Base class for asyncio-native LLM backends.
+    Callers always speak Ollama's /api/generate shape: payloads carry model,
+    prompt, format (a JSON schema), stream and options, and responses are
+    dicts with "response", "done" and the usage counters. Subclasses translate
+    to and from their wire protocol.
+    A single httpx.AsyncClient is shared by all requests so connections are
+    kept alive and pooled, and a semaphore per host caps in-flight generations.
+    """
+
+    # GET path that answers 2xx when a host is up
+    health_path = "/"
+    # Whether payload["keep_alive"] controls model residency
+    supports_keep_alive = False
+    # Whether responses return, and payloads accept, Ollama's "context"
+    supports_context = False
+
+    def __init__(
+        self,
+        host: str,
+        timeout: float = 300.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_concurrency_per_host: int = 4,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_env(
+        cls,
+        host: str,
+        timeout: float,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> "LLMClient":
+        """Create a client with pool limits configured from environment variables"""
+        return cls(
+            host=host,
+            timeout=timeout,
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "20")),
+            max_concurrency_per_host=int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4")),
+            transport=transport,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Lazily create the shared AsyncClient inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=self.limits,
+                headers={"Content-Type": "application/json"},
+                transport=self.transport,
+            )
+        return self._client
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        return self._semaphores[host]
+
+    async def check_health(self, host: Optional[str] = None):
+        """Raise httpx.HTTPError unless the host's health path answers 2xx"""
+        host = (host or self.host).rstrip("/")
+        response = await self.client.get(f"{host}{self.health_path}", timeout=10.0)
+        response.raise_for_status()
+
+    @abstractmethod
+    async def generate(self, payload: Dict, host: Optional[str] = None) -> Dict:
+        """Run a generate payload and return the Ollama-shaped response body"""
+
+    @abstractmethod
+    def generate_stream(self, payload: Dict, host: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Run a streaming generate payload and yield Ollama-shaped chunks"""
+
+    async def start(self):
+        """Start background work; a single client has none"""
+
+    def stats(self) -> List[Dict]:
+        """Per-endpoint statistics; a single client only knows its host"""
+        return [{"host": self.host}]
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class OllamaClient(LLMClient):
+    """Client for Ollama's native /api/generate endpoint"""
+
+    health_path = "/api/tags"
+    supports_keep_alive = True
+    supports_context = True
+
+    async def generate(self, payload: Dict, host: Optional[str] = None) -> Dict:
+        """
+        POST a payload to /api/generate and return the decoded JSON body.
+        Raises httpx.HTTPError on transport or HTTP status errors.
+        """
+        host = (host or self.host).rstrip("/")
+        async with self._semaphore(host):
+            response = await self.client.post(f"{host}/api/generate", json=payload)
+            response.raise_for_status()
+            return response.json()
+
+    async def generate_stream(self, payload: Dict, host: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        POST a streaming payload to /api/generate and yield each NDJSON chunk as it arrives.
+        The host slot is held until the stream is exhausted or closed.
+        """
+        host = (host or self.host).rstrip("/")
+        async with self._semaphore(host):
+            async with self.client.stream("POST", f"{host}/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+
+class OpenAICompatibleClient(LLMClient):
+    """
+    Client for OpenAI-compatible /v1/chat/completions servers (vLLM, llama.cpp
+    server, LM Studio, hosted APIs). The Ollama-shaped payload is sent as a
+    single user message; its JSON schema becomes response_format and
+    options.num_predict becomes max_tokens.
+    """
+
+    health_path = "/v1/models"
+
+    def __init__(self, host: str, api_key: Optional[str] = None, **kwargs):
+        super().__init__(host, **kwargs)
+        self.api_key = api_key
+
+    @classmethod
+    def from_env(
+        cls,
+        host: str,
+        timeout: float,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> "OpenAICompatibleClient":
+        client = super().from_env(host, timeout, transport)
+        client.api_key = os.getenv("OPENAI_API_KEY")
+        return client
+
+    def _request(self, payload: Dict, stream: bool) -> Dict:
+        request = {
+            "model": payload.get("model"),
+            "messages": [{"role": "user", "content": payload.get("prompt", "")}],
+            "stream": stream,
+        }
+        options = payload.get("options") or {}
+        if "num_predict" in options:
+            request["max_tokens"] = options["num_predict"]
+        if "temperature" in options:
+            request["temperature"] = options["temperature"]
+        if isinstance(payload.get("format"), dict):
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": payload["format"]},
+            }
+        elif payload.get("format") == "json":
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _headers(self) -> Dict:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    async def generate(self, payload: Dict, host: Optional[str] = None) -> Dict:
+        """
+        POST a chat completion and return it as an Ollama-shaped body.
+        Raises httpx.HTTPError on transport or HTTP status errors.
+        """
+        host = (host or self.host).rstrip("/")
+        async with self._semaphore(host):
+            response = await self.client.post(
+                f"{host}/v1/chat/completions",
+                json=self._request(payload, stream=False),
+                headers=self._headers(),
+            )
+            response.raise_for_status()
+            body = response.json()
+        usage = body.get("usage") or {}
+        return {
+            "model": body.get("model", payload.get("model")),
+            "response": body["choices"][0]["message"].get("content") or "",
+            "done": True,
+            "prompt_eval_count": usage.get("prompt_tokens", 0),
+            "eval_count": usage.get("completion_tokens", 0),
+        }
+
+    async def generate_stream(self, payload: Dict, host: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Stream a chat completion (server-sent events) as Ollama-shaped chunks.
+        The host slot is held until the stream is exhausted or closed.
+        """
+        host = (host or self.host).rstrip("/")
+        async with self._semaphore(host):
+            async with self.client.stream(
+                "POST",
+                f"{host}/v1/chat/completions",
+                json=self._request(payload, stream=True),
+                headers=self._headers(),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or [{}]
+                    token = (choices[0].get("delta") or {}).get("content") or ""
+                    if token:
+                        yield {"response": token, "done": False}
+        yield {"response": "", "done": True}
+
+
+LLM_BACKENDS = {
+    "ollama": OllamaClient,
+    "openai": OpenAICompatibleClient,
+}
+
+
+def create_llm_client(host: str, timeout: float):
+    """
+    Create the LLM client selected by LLM_BACKEND: "ollama" (default),
+    "openai" for OpenAI-compatible servers, or "fake" for the in-process
+    deterministic stub from app.services.fake_llm.
+    The client is wrapped in an EndpointPool routing across OLLAMA_HOSTS
+    (comma-separated), or across `host` alone when that is not set.
+    """
+    from app.services.endpoint_pool import EndpointPool
+
+    backend = os.getenv("LLM_BACKEND", "ollama").lower()
+    hosts = [h.strip() for h in os.getenv("OLLAMA_HOSTS", "").split(",") if h.strip()] or [host]
+    if backend == "fake":
+        from app.services.fake_llm import FakeLLM
+        hosts = ["http://fake-llm"]
+        client = OllamaClient.from_env(
+            hosts[0],
+            timeout,
+            transport=httpx.ASGITransport(app=FakeLLM.from_env().app()),
+        )
+    elif backend in LLM_BACKENDS:
+        client = LLM_BACKENDS[backend].from_env(hosts[0], timeout)
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND {backend!r}, expected one of {sorted(LLM_BACKENDS) + ['fake']}")
+    return EndpointPool(
+        client,
+        hosts,
+        strategy=os.getenv("LLM_ROUTING", "least_outstanding"),
+        eject_seconds=float(os.getenv("LLM_EJECT_SECONDS", "30.0")),
+        health_interval=float(os.getenv("LLM_HEALTH_INTERVAL", "15.0")),
+    )
@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Dict, Optional
+
+# Duration fields Ollama reports on a finished generation, in nanoseconds
+DURATION_FIELDS = ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration")
+
+
+class LLMMetrics:
+    """
+    Aggregates the timing breakdown Ollama returns with each generation:
+    model load time, prompt evaluation time and generation time, plus the
+    token counts needed to turn them into rates. Generations whose
+    load_duration exceeds cold_load_seconds are counted as cold starts.
+    """
+
+    def __init__(self, cold_load_seconds: float = 1.0):
+        self.cold_load_seconds = cold_load_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.generations = 0
+            self.cold_loads = 0
+            self.prompt_tokens = 0
+            self.generated_tokens = 0
+            self.totals = {field: 0.0 for field in DURATION_FIELDS}
+            self.maxima = {field: 0.0 for field in DURATION_FIELDS}
+            self.last_generation_at: Optional[float] = None
+
+    def record(self, body: Dict):
+        """Record a finished generation (a non-streaming body or the final stream chunk)"""
+        with self._lock:
+            self.generations += 1
+            self.last_generation_at = time.time()
+            self.prompt_tokens += body.get("prompt_eval_count") or 0
+            self.generated_tokens += body.get("eval_count") or 0
+            for field in DURATION_FIELDS:
+                seconds = (body.get(field) or 0) / 1e9
+                self.totals[field] += seconds
+                self.maxima[field] = max(self.maxima[field], seconds)
+            if (body.get("load_duration") or 0) / 1e9 > self.cold_load_seconds:
+                self.cold_loads += 1
+
+    def stats(self) -> Dict:
+        """Totals, means and maxima per phase, in seconds, and token rates"""
+        with self._lock:
+            count = self.generations or 1
+            phases = {
+                field.replace("_duration", ""): {
+                    "total_seconds": round(self.totals[field], 3),
+                    "mean_seconds": round(self.totals[field] / count, 3),
+                    "max_seconds": round(self.maxima[field], 3),
+                }
+                for field in DURATION_FIELDS
+            }
+            prompt_seconds = self.totals["prompt_eval_duration"]
+            eval_seconds = self.totals["eval_duration"]
+            return {
+                "generations": self.generations,
+                "cold_loads": self.cold_loads,
+                "phases": phases,
+                "prompt_tokens": self.prompt_tokens,
+                "generated_tokens": self.generated_tokens,
+                "prompt_tokens_per_second": round(self.prompt_tokens / prompt_seconds, 1) if prompt_seconds else None,
+                "generated_tokens_per_second": round(self.generated_tokens / eval_seconds, 1) if eval_seconds else None,
+                "last_generation_at": self.last_generation_at,
+            }
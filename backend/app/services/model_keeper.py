@@ -0,0 +1,125 @@
+import os
+import time
+import asyncio
+from typing import Dict, List, Optional, Union
+import httpx
+from app.services.llm_client import LLMClient
+from app.services.endpoint_pool import EndpointPool
+from app.services.llm_metrics import LLMMetrics
+
+
+class ModelKeeper:
+    """
+    Keeps MODEL_NAME resident on every Ollama host.
+    warm() sends an empty-prompt generate with keep_alive, which makes Ollama
+    load the model without generating anything. start() warms all hosts in
+    the background at startup and then re-warms every refresh_interval
+    seconds for as long as traffic is expected: a generation happened within
+    the last active_window seconds. Once traffic stops, the model is left to
+    expire after keep_alive so the GPU memory is released.
+    Backends without keep_alive support (OpenAI-compatible servers) are skipped.
+    """
+
+    def __init__(
+        self,
+        client: Union[LLMClient, EndpointPool],
+        model: str,
+        keep_alive: str = "30m",
+        refresh_interval: float = 240.0,
+        active_window: float = 1800.0,
+        metrics: Optional[LLMMetrics] = None
+    ):
+        self.client = client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.active_window = active_window
+        self.metrics = metrics
+        self.warmups = 0
+        self.failures = 0
+        self.last_warm_at: Optional[float] = None
+        self.last_load_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, client: Union[LLMClient, EndpointPool], model: str, metrics: Optional[LLMMetrics] = None) -> "ModelKeeper":
+        """Create a keeper configured from environment variables"""
+        return cls(
+            client,
+            model,
+            keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+            refresh_interval=float(os.getenv("OLLAMA_KEEPALIVE_REFRESH", "240.0")),
+            active_window=float(os.getenv("OLLAMA_ACTIVE_WINDOW", "1800.0")),
+            metrics=metrics,
+        )
+
+    @property
+    def supported(self) -> bool:
+        return self.client.supports_keep_alive
+
+    def _hosts(self) -> List[Optional[str]]:
+        endpoints = getattr(self.client, "endpoints", None)
+        return [endpoint.host for endpoint in endpoints] if endpoints else [None]
+
+    async def warm(self) -> Dict:
+        """Load the model on every host; returns {host: load seconds or error}"""
+        payload = {"model": self.model, "prompt": "", "stream": False, "keep_alive": self.keep_alive}
+
+        async def load(host: Optional[str]):
+            try:
+                body = await self.client.generate(payload, host=host)
+            except httpx.HTTPError as e:
+                self.failures += 1
+                self.last_error = str(e) or type(e).__name__
+                print(f"Error preloading {self.model} on {host or 'default host'}: {self.last_error}")
+                return host, {"error": self.last_error}
+            self.warmups += 1
+            self.last_load_seconds = (body.get("load_duration") or 0) / 1e9
+            return host, {"load_seconds": round(self.last_load_seconds, 3)}
+
+        results = dict(await asyncio.gather(*(load(host) for host in self._hosts())))
+        self.last_warm_at = time.time()
+        return results
+
+    def traffic_expected(self) -> bool:
+        """Whether a generation ran recently enough to keep the model loaded"""
+        last = self.metrics.last_generation_at if self.metrics else None
+        return last is not None and time.time() - last < self.active_window
+
+    async def _refresh_loop(self):
+        await self.warm()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if self.traffic_expected():
+                await self.warm()
+
+    async def start(self):
+        """Preload the model in the background and keep refreshing it"""
+        if not self.supported or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop background refreshes"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "enabled": self.supported,
+            "running": self._task is not None,
+            "traffic_expected": self.traffic_expected(),
+            "warmups": self.warmups,
+            "failures": self.failures,
+            "last_warm_at": self.last_warm_at,
+            "last_load_seconds": self.last_load_seconds,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,159 @@
+import math
+from array import array
+from typing import Dict, List
+import numpy as np
+from rapidfuzz import fuzz, process
+
+
+class NGramIndex:
+    """
+    Character n-gram inverted index over short strings such as publication
+    numbers, used to narrow FuzzyMatcher.find_patent before rapidfuzz scoring.
+
+    Strings keep the position they were added at, and every posting list is
+    sorted by position because strings are only ever appended.
+    Both lookups are exact. substring_matches() intersects the posting lists
+    of the query's rarest n-grams and verifies the survivors. ratio_matches()
+    only scores strings of a plausible length that share enough n-grams with
+    the query; lengths the count filter cannot bound are scored in full.
+    """
+
+    def __init__(self, n: int = 3):
+        self.n = n
+        self.strings: List[str] = []
+        self._lengths = array("i")
+        self._postings: Dict[str, array] = {}
+        self._by_length: Dict[int, array] = {}
+        # The strings of each length, in position order, for scoring a whole length at once
+        self._strings_by_length: Dict[int, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def add(self, text: str) -> int:
+        """Index a string and return its position"""
+        position = len(self.strings)
+        self.strings.append(text)
+        self._lengths.append(len(text))
+        self._by_length.setdefault(len(text), array("i")).append(position)
+        self._strings_by_length.setdefault(len(text), []).append(text)
+        for gram in self._grams(text):
+            self._postings.setdefault(gram, array("i")).append(position)
+        return position
+
+    def _grams(self, text: str) -> set:
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def _posting(self, gram: str) -> np.ndarray:
+        posting = self._postings.get(gram)
+        return np.frombuffer(posting, dtype=np.int32) if posting else np.empty(0, dtype=np.int32)
+
+    def substring_matches(self, query: str) -> List[int]:
+        """Positions of the strings containing query, in order"""
+        grams = sorted(self._grams(query), key=lambda gram: len(self._postings.get(gram, ())))
+        if not grams:
+            return self._short_substring_matches(query)
+
+        candidates = self._posting(grams[0])
+        # Intersect the rarest lists only; verifying the few survivors is cheaper
+        for gram in grams[1:3]:
+            if len(candidates) <= 32:
+                break
+            candidates = np.intersect1d(candidates, self._posting(gram), assume_unique=True)
+        strings = self.strings
+        return [i for i in candidates.tolist() if query in strings[i]]
+
+    def _short_substring_matches(self, query: str) -> List[int]:
+        """Queries shorter than n: union the lists of every n-gram containing them"""
+        parts = [self._posting(gram) for gram in self._postings if query in gram]
+        parts += [
+            np.frombuffer(positions, dtype=np.int32)
+            for length, positions in self._by_length.items() if length < self.n
+        ]
+        if not parts:
+            return []
+        strings = self.strings
+        return [i for i in np.unique(np.concatenate(parts)).tolist() if query in strings[i]]
+
+    def ratio_matches(self, query: str, threshold: float) -> Dict[int, float]:
+        """
+        fuzz.ratio of every string scoring at least threshold against query,
+        by position. fuzz.ratio is 200 * LCS / (len(a) + len(b)), so a string
+        of length L needs an LCS of at least threshold * (q + L) / 200. Each
+        query character outside the LCS breaks at most n of the query's
+        n-grams and each gap of inserted characters at most n - 1; lengths
+        where that still guarantees shared n-grams are narrowed with the
+        count filter, the others are scored whole in one rapidfuzz call.
+        """
+        q = len(query)
+        if threshold > 100:
+            return {}
+        eps = 1e-9
+        if threshold <= 0:
+            shortest, longest = 0, max(self._by_length, default=0)
+        else:
+            shortest = math.ceil(q * threshold / (200 - threshold) - eps)
+            longest = math.floor(q * (200 - threshold) / threshold + eps)
+
+        grams = self._grams(query)
+        matches: Dict[int, float] = {}
+        required: Dict[int, int] = {}
+        for length in self._by_length:
+            if not shortest <= length <= longest:
+                continue
+            common = math.ceil(threshold * (q + length) / 200 - eps)
+            if common > min(q, length):
+                continue
+            need = len(grams) - self.n * (q - common) - (self.n - 1) * (length - common)
+            if need > 0 and threshold > 0:
+                required[length] = need
+            else:
+                self._score_length(query, threshold, length, matches)
+
+        if required:
+            candidates = self._count_filter(grams, required)
+            lengths = np.frombuffer(self._lengths, dtype=np.int32)[candidates]
+            for length in required:
+                positions = candidates[lengths == length]
+                if 2 * len(positions) > len(self._by_length[length]):
+                    # Most of the length survived; its cached strings are cheaper than a new list
+                    self._score_length(query, threshold, length, matches)
+                elif len(positions):
+                    strings = self.strings
+                    self._score(query, threshold, positions, [strings[i] for i in positions.tolist()], matches)
+        return matches
+
+    def _score_length(self, query: str, threshold: float, length: int, matches: Dict[int, float]):
+        positions = np.frombuffer(self._by_length[length], dtype=np.int32)
+        self._score(query, threshold, positions, self._strings_by_length[length], matches)
+
+    def _score(
+        self,
+        query: str,
+        threshold: float,
+        positions: np.ndarray,
+        strings: List[str],
+        matches: Dict[int, float]
+    ):
+        scores = process.cdist([query], strings, scorer=fuzz.ratio, score_cutoff=max(threshold, 0), dtype=np.float64)[0]
+        hits = np.flatnonzero(scores >= threshold)
+        matches.update(zip(positions[hits].tolist(), scores[hits].tolist()))
+
+    def _count_filter(self, grams: set, required: Dict[int, int]) -> np.ndarray:
+        """
+        Strings sharing at least required[length] of the query's n-grams.
+        The most common n-grams are skipped and counted as always shared, so
+        only the rare posting lists are read; every candidate still shares at
+        least one of the n-grams that are read.
+        """
+        ordered = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        skipped = min(required.values()) - 1
+        kept = ordered[:len(ordered) - skipped]
+        postings = [self._posting(gram) for gram in kept]
+        positions, counts = np.unique(np.concatenate(postings), return_counts=True)
+
+        needed = np.full(max(self._by_length) + 1, np.iinfo(np.int32).max, dtype=np.int64)
+        for length, need in required.items():
+            needed[length] = need - skipped
+        lengths = np.frombuffer(self._lengths, dtype=np.int32)[positions]
+        return positions[counts >= needed[lengths]]
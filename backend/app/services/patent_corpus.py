@@ -0,0 +1,197 @@
+"""
+Memory-mapped on-disk patent corpus.
+
+File layout (little-endian):
+
+    b"PATCORP1"                 magic
+    uint32                      header length in bytes
+    header (UTF-8 JSON)         {"version", "count", "header_fields", "fields", "records"}
+    padding to 8 bytes
+    offset table                count x len(fields) entries of (uint64 offset, uint32 length)
+    blob area                   JSON-encoded field values, addressed by the offset table
+
+The header holds the small fields every request needs (publication number,
+title, assignee) and is loaded eagerly. Heavy fields such as description,
+claims and citations stay on disk and are read from the mmap only when
+accessed, so opening a million-patent corpus costs only the header.
+
+Convert the JSON data files with:
+
+    cd backend
+    python -m app.services.patent_corpus app/data/patents.json app/data/patents.corpus
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"PATCORP1"
+VERSION = 1
+HEADER_FIELDS = ("publication_number", "title", "assignee")
+ENTRY = struct.Struct("<QI")
+MISSING = 0xFFFFFFFF
+
+
+class LazyPatent(Mapping):
+    """
+    Read-only patent record backed by a PatentCorpus.
+    Header fields are served from memory, every other field is read from the mmap on access.
+    """
+    __slots__ = ("_corpus", "_index")
+
+    def __init__(self, corpus: "PatentCorpus", index: int):
+        self._corpus = corpus
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        return self._corpus.get_field(self._index, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._corpus.field_names(self._index))
+
+    def __len__(self) -> int:
+        return len(self._corpus.field_names(self._index))
+
+    def __repr__(self) -> str:
+        return f"LazyPatent({self['publication_number']!r})"
+
+
+class PatentCorpus:
+    """Random access to a corpus file written by write_corpus()"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a patent corpus file")
+        (header_length,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+        if header["version"] != VERSION:
+            raise ValueError(f"Unsupported corpus version {header['version']}")
+
+        self.count = header["count"]
+        self.header_fields = header["header_fields"]
+        self.fields = header["fields"]
+        self._field_index = {name: i for i, name in enumerate(self.fields)}
+        # Header columns, one list per eagerly loaded field
+        self._columns = {
+            name: [record[i] for record in header["records"]]
+            for i, name in enumerate(self.header_fields)
+        }
+        self._table_start = _align(header_start + header_length)
+        self._blob_start = self._table_start + self.count * len(self.fields) * ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def patents(self) -> List[LazyPatent]:
+        """Lazy records for every patent, in file order"""
+        return [LazyPatent(self, i) for i in range(self.count)]
+
+    def get_field(self, index: int, name: str) -> Any:
+        """Read one field of one patent, raising KeyError if it is absent"""
+        column = self._columns.get(name)
+        if column is not None:
+            return column[index]
+        field = self._field_index.get(name)
+        if field is None:
+            raise KeyError(name)
+        offset, length = self._entry(index, field)
+        if length == MISSING:
+            raise KeyError(name)
+        start = self._blob_start + offset
+        return json.loads(self._mmap[start:start + length])
+
+    def field_names(self, index: int) -> List[str]:
+        """Names of the fields present on a patent"""
+        return list(self.header_fields) + [
+            name for i, name in enumerate(self.fields)
+            if self._entry(index, i)[1] != MISSING
+        ]
+
+    def _entry(self, index: int, field: int):
+        position = self._table_start + (index * len(self.fields) + field) * ENTRY.size
+        return ENTRY.unpack_from(self._mmap, position)
+
+    def close(self):
+        """Unmap and close the file"""
+        self._mmap.close()
+        self._file.close()
+
+
+def write_corpus(patents: Iterable[Dict], path: Path):
+    """Write patents to a corpus file at path"""
+    patents = list(patents)
+    fields = sorted({
+        key for patent in patents for key in patent if key not in HEADER_FIELDS
+    })
+    records = []
+    table = bytearray()
+    path = Path(path)
+
+    with tempfile.TemporaryFile(dir=path.parent) as blobs:
+        offset = 0
+        for patent in patents:
+            records.append([patent.get(name) for name in HEADER_FIELDS])
+            for name in fields:
+                if name not in patent:
+                    table += ENTRY.pack(0, MISSING)
+                    continue
+                data = json.dumps(patent[name], ensure_ascii=False).encode("utf-8")
+                blobs.write(data)
+                table += ENTRY.pack(offset, len(data))
+                offset += len(data)
+
+        header = json.dumps({
+            "version": VERSION,
+            "count": len(patents),
+            "header_fields": list(HEADER_FIELDS),
+            "fields": fields,
+            "records": records,
+        }, ensure_ascii=False).encode("utf-8")
+        header_end = len(MAGIC) + 4 + len(header)
+
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<I", len(header)))
+            out.write(header)
+            out.write(b"\0" * (_align(header_end) - header_end))
+            out.write(table)
+            blobs.seek(0)
+            while True:
+                chunk = blobs.read(1 << 20)
+                if not chunk:
+                    break
+                out.write(chunk)
+        os.replace(tmp_path, path)
+
+
+def _align(position: int, alignment: int = 8) -> int:
+    return (position + alignment - 1) // alignment * alignment
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Convert patents.json into a memory-mapped corpus file")
+    parser.add_argument("source", type=Path, help="patents.json to convert")
+    parser.add_argument("target", type=Path, help="corpus file to write")
+    args = parser.parse_args(argv)
+
+    with open(args.source) as f:
+        patents = json.load(f)
+    write_corpus(patents, args.target)
+    corpus = PatentCorpus(args.target)
+    print(f"Wrote {len(corpus)} patents to {args.target} ({args.target.stat().st_size} bytes)")
+    corpus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import re
+import json
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Union
+from app.database.models import Claim
+
+# Mojibake sequences left in claim text by a latin1/utf-8 round trip
+UNICODE_REPLACEMENTS = {
+    'â\u0080\u009c': '"',  # left double quotation
+    'â\u0080\u009d': '"',  # right double quotation
+    'â\u0080\u0098': "'",  # left single quotation
+    'â\u0080\u0099': "'",  # right single quotation
+    'â\u0080\u009e': '"',  # double low-9 quotation
+    'â\u0080\u009f': '"',  # double high-reversed-9 quotation
+    'â\u0080\u0094': '-',  # em dash
+    'â': '-',              # fallback for any remaining â
+}
+# Longest sequences first so the single-pass substitution matches the
+# result of applying the replacements one after another
+_MOJIBAKE_PATTERN = re.compile("|".join(
+    re.escape(old) for old in sorted(UNICODE_REPLACEMENTS, key=len, reverse=True)
+))
+
+
+def clean_claim_text(text: str) -> str:
+    """Replace mojibake quotation marks and dashes in one pass"""
+    if "â" not in text:
+        return text
+    return _MOJIBAKE_PATTERN.sub(lambda m: UNICODE_REPLACEMENTS[m.group(0)], text)
+
+
+def decode_claims(claims_data: Union[str, List[Dict], None]) -> List[Claim]:
+    """
+    Decode a raw claims field (JSON string or list of dicts) into Claim objects.
+    Raises ValueError if the data cannot be decoded into a list of claims.
+    """
+    if claims_data is None:
+        return []
+
+    if isinstance(claims_data, str):
+        # Remove outer quotes if present
+        claims_text = claims_data.strip('"')
+        try:
+            claims_data = json.loads(claims_text)
+        except json.JSONDecodeError:
+            # If JSON decode fails, try to clean up the string
+            claims_text = claims_text.encode('latin1').decode('unicode_escape')
+            claims_data = json.loads(claims_text)
+
+        if isinstance(claims_data, list):
+            for claim in claims_data:
+                if isinstance(claim, dict) and 'text' in claim:
+                    claim['text'] = clean_claim_text(claim['text'])
+
+    if not isinstance(claims_data, list):
+        raise ValueError("Claims data must be a list")
+
+    claims = []
+    for claim in claims_data:
+        if isinstance(claim, Claim):
+            claims.append(claim)
+        else:
+            # Skip validation, the fields are plain strings once coerced
+            claims.append(Claim.model_construct(
+                num=str(claim.get("num", "?")),
+                text=claim.get("text", "")
+            ))
+    return claims
+
+
+class PatentStore:
+    """
+    Patent corpus indexed by publication number.
+    Claims are decoded once per patent so that prompt building and lookups
+    never touch the raw JSON strings again.
+    """
+
+    def __init__(self, patents: Optional[Iterable[Mapping]] = None, lazy_claims: bool = False):
+        self.lazy_claims = lazy_claims
+        self._patents: List[Mapping] = []
+        self._by_id: Dict[str, int] = {}
+        self._claims: Dict[str, List[Claim]] = {}
+        for patent in patents or []:
+            self.add(patent)
+
+    def add(self, patent: Mapping):
+        """
+        Add or replace a patent.
+        With lazy_claims the claims are decoded on first access instead, so that
+        memory-mapped records do not have to read their claims at load time.
+        """
+        publication_number = patent["publication_number"]
+        index = self._by_id.get(publication_number)
+        if index is None:
+            self._by_id[publication_number] = len(self._patents)
+            self._patents.append(patent)
+        else:
+            self._patents[index] = patent
+
+        self._claims.pop(publication_number, None)
+        if not self.lazy_claims:
+            self._claims[publication_number] = self._decode(patent)
+
+    def _decode(self, patent: Mapping) -> List[Claim]:
+        try:
+            return decode_claims(patent.get("claims"))
+        except Exception as e:
+            print(f"Error decoding claims for {patent['publication_number']}: {str(e)}")
+            return []
+
+    def get(self, publication_number: str) -> Optional[Mapping]:
+        """Get a patent by publication number"""
+        index = self._by_id.get(publication_number)
+        return self._patents[index] if index is not None else None
+
+    def get_claims(self, publication_number: str) -> Optional[List[Claim]]:
+        """Get the decoded claims of a patent, or None if the patent is unknown"""
+        claims = self._claims.get(publication_number)
+        if claims is None and publication_number in self._by_id:
+            claims = self._decode(self.get(publication_number))
+            self._claims[publication_number] = claims
+        return claims
+
+    def all(self) -> List[Mapping]:
+        """All patents in insertion order"""
+        return self._patents
+
+    def __len__(self) -> int:
+        return len(self._patents)
+
+    def __contains__(self, publication_number: str) -> bool:
+        return publication_number in self._by_id
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class PrefixSession:
+    """An evaluated patent prefix: Ollama's returned context and where it was evaluated"""
+
+    def __init__(self, context: List[int], host: Optional[str], prefix_tokens: int, eval_seconds: float):
+        self.context = context
+        self.host = host
+        self.prefix_tokens = prefix_tokens
+        self.eval_seconds = eval_seconds
+        self.created_at = time.time()
+        self.uses = 0
+
+
+class PrefixSessionCache:
+    """
+    LRU of warm patent prefixes.
+    Concurrent requests for a prefix that is still being evaluated wait for
+    that evaluation instead of starting their own, so fanning out over a
+    company's products evaluates the patent once.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, PrefixSession]" = OrderedDict()
+        self._pending: Dict[Tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefix_tokens_reused = 0
+        self.prefix_seconds_saved = 0.0
+
+    async def get_or_create(
+        self,
+        key: Tuple,
+        create: Callable[[], Awaitable[PrefixSession]]
+    ) -> PrefixSession:
+        """
+        Return the warm session for key, evaluating the prefix once if needed.
+        If the caller evaluating it is cancelled (its client went away), the
+        callers waiting for it retry and one of them evaluates it instead.
+        """
+        while True:
+            session = self._entries.get(key)
+            if session is not None:
+                self._entries.move_to_end(key)
+                self._reuse(session)
+                return session
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            try:
+                session = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            self._reuse(session)
+            return session
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            session = await create()
+        except asyncio.CancelledError:
+            # Only this caller went away; waiters retry rather than fail with it
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+        future.set_result(session)
+        session.uses += 1
+
+        self._entries[key] = session
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return session
+
+    def _reuse(self, session: PrefixSession):
+        self.hits += 1
+        session.uses += 1
+        self.prefix_tokens_reused += session.prefix_tokens
+        self.prefix_seconds_saved += session.eval_seconds
+
+    def invalidate(self, key: Tuple):
+        """Drop a session, e.g. after its host failed"""
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "prefix_tokens_reused": self.prefix_tokens_reused,
+            "prefix_seconds_saved": round(self.prefix_seconds_saved, 3),
+        }
@@ -0,0 +1,137 @@
+import re
+from typing import Dict, List, Optional, Sequence
+from app.services.claim_formatter import FormattedClaim, FormattedClaims
+from app.services.claim_retriever import is_independent
+from app.services.token_estimator import TokenEstimator, get_token_estimator
+
+_WORDS = re.compile(r"[a-z0-9]+")
+_OMITTED_NOTE = (
+    "(Showing the {shown} of {total} claims most relevant to the product description)\n\n"
+)
+
+
+def _terms(text: str) -> set:
+    return {word for word in _WORDS.findall(text.lower()) if len(word) > 2}
+
+
+def rank_claims_by_overlap(claims: Sequence[FormattedClaim], query: str) -> List[FormattedClaim]:
+    """
+    Order claims by how many query terms they share, normalised by claim length.
+    Ties keep the original claim order.
+    """
+    query_terms = _terms(query)
+
+    def score(claim: FormattedClaim) -> float:
+        claim_terms = _terms(claim.text)
+        if not claim_terms:
+            return 0.0
+        return len(claim_terms & query_terms) / len(claim_terms) ** 0.5
+
+    return sorted(claims, key=score, reverse=True)
+
+
+class PromptTooLargeError(ValueError):
+    """The fixed parts of a prompt leave no room for a single independent claim"""
+
+
+class PromptBudgeter:
+    """
+    Fits patent claims into a model's context window.
+    The fixed parts of a prompt (instructions, patent summary, product
+    descriptions, response format) are always kept; the remaining token budget,
+    after reserving room for the model's output, is filled with the claims most
+    relevant to the products. Selected claims are emitted in their original order.
+    A prompt that cannot show at least one independent claim is refused, since
+    the model could not judge infringement from it.
+    """
+
+    def __init__(
+        self,
+        context_limit: int,
+        output_reserve: int = 1024,
+        estimator: Optional[TokenEstimator] = None
+    ):
+        self.context_limit = context_limit
+        self.output_reserve = output_reserve
+        self.estimator = estimator or get_token_estimator()
+        self.prompts = 0
+        self.truncated = 0
+        self.claims_dropped = 0
+        self.rejected = 0
+
+    def claims_budget(self, *fixed_parts: str) -> int:
+        """Tokens left for claims once the fixed prompt parts and output are accounted for"""
+        used = sum(self.estimator.count(part) for part in fixed_parts)
+        return self.context_limit - self.output_reserve - used
+
+    def select_claims(
+        self,
+        claims: FormattedClaims,
+        query: str,
+        budget: int,
+        ranked: Optional[Sequence[FormattedClaim]] = None
+    ) -> List[FormattedClaim]:
+        """
+        Pick claims in relevance order until the budget is used up.
+        `ranked` overrides the default lexical-overlap ranking; claims missing
+        from it are left out even if they would fit.
+        """
+        separator = self.estimator.count("\n\n")
+        if ranked is None:
+            if claims.tokens + separator * len(claims.claims) <= budget:
+                return list(claims.claims)
+            ranked = rank_claims_by_overlap(claims.claims, query)
+
+        selected = set()
+        used = 0
+        for claim in ranked:
+            cost = claim.tokens + separator
+            if used + cost <= budget:
+                selected.add(id(claim))
+                used += cost
+        return [claim for claim in claims.claims if id(claim) in selected]
+
+    def fit(
+        self,
+        prefix: str,
+        claims: FormattedClaims,
+        suffix: str,
+        query: str,
+        ranked: Optional[Sequence[FormattedClaim]] = None
+    ) -> str:
+        """
+        Assemble prefix + budgeted claims + suffix.
+        Raises PromptTooLargeError if no independent claim fits.
+        """
+        budget = self.claims_budget(prefix, suffix)
+        if claims.tokens > budget or (ranked is not None and len(ranked) < len(claims.claims)):
+            budget -= self.estimator.count(_OMITTED_NOTE.format(shown=999, total=999))
+        selected = self.select_claims(claims, query, budget, ranked)
+        # Patents whose claims all read as dependent need at least one claim of any kind
+        required = [claim for claim in claims.claims if is_independent(claim)] or claims.claims
+        required_ids = {id(claim) for claim in required}
+        if required and not any(id(claim) in required_ids for claim in selected):
+            self.rejected += 1
+            raise PromptTooLargeError(
+                f"Prompt leaves {max(budget, 0)} tokens for claims, the shortest independent claim "
+                f"needs {min(claim.tokens for claim in required)}; analyze fewer products per prompt "
+                f"or use a model with a larger context"
+            )
+        claims_text = "\n\n".join(claim.text for claim in selected)
+        self.prompts += 1
+        if len(selected) < len(claims.claims):
+            self.truncated += 1
+            self.claims_dropped += len(claims.claims) - len(selected)
+            claims_text = _OMITTED_NOTE.format(
+                shown=len(selected),
+                total=len(claims.claims)
+            ) + claims_text
+        return prefix + claims_text + suffix
+
+    def stats(self) -> Dict:
+        return {
+            "prompts": self.prompts,
+            "truncated": self.truncated,
+            "claims_dropped": self.claims_dropped,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,161 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class IncrementalObjectParser:
+    """
+    Incrementally scans streamed JSON text and returns every object that is a
+    direct element of an array as soon as its closing brace arrives.
+    For {"products": [{...}, {...}]} or [{...}, {...}] this yields one product at a time.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._object_start = -1
+        self._object_depth = -1
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Append a chunk of text and return the objects completed by it"""
+        self.buffer += chunk
+        completed = []
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if (
+                    char == "{"
+                    and self._object_start < 0
+                    and self._stack
+                    and self._stack[-1] == "["
+                ):
+                    self._object_start = self._pos
+                    self._object_depth = len(self._stack)
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and len(self._stack) == self._object_depth:
+                    text = self.buffer[self._object_start:self._pos + 1]
+                    self._object_start = -1
+                    self._object_depth = -1
+                    try:
+                        completed.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        pass
+            self._pos += 1
+        return completed
+
+
+_DECODER = json.JSONDecoder()
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix the defects LLMs commonly add around otherwise valid JSON: prose or
+    markdown code fences before the value, and trailing commas before a
+    closing bracket. Text after the value is left for the decoder to ignore.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text.strip()
+    out: List[str] = []
+    in_string = False
+    escape = False
+    last = -1
+    for char in text[min(starts):]:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "}]" and last >= 0 and out[last] == ",":
+            out[last] = ""
+        if in_string or not char.isspace():
+            last = len(out)
+        out.append(char)
+    return "".join(out)
+
+
+def parse_tolerant(text: str) -> Tuple[Any, str]:
+    """
+    Parse LLM output, falling back to repair and then salvage.
+    Returns (value, outcome) where outcome is "clean" (valid as is),
+    "repaired" (valid after repair_json), "salvaged" (value is the list of
+    complete array elements of truncated output) or "failed" (value is None).
+    """
+    try:
+        return json.loads(text), "clean"
+    except (json.JSONDecodeError, TypeError):
+        pass
+    repaired = repair_json(text or "")
+    try:
+        return _DECODER.raw_decode(repaired)[0], "repaired"
+    except json.JSONDecodeError:
+        pass
+    objects = IncrementalObjectParser().feed(repaired)
+    if objects:
+        return objects, "salvaged"
+    return None, "failed"
+
+
+class ParseMetrics:
+    """
+    Counts how generations were parsed: clean, repaired, salvaged or failed,
+    products dropped from salvaged output, constrained retries and the
+    generated tokens of responses that had to be thrown away.
+    """
+
+    OUTCOMES = ("clean", "repaired", "salvaged", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.outcomes = {outcome: 0 for outcome in self.OUTCOMES}
+        self.dropped_items = 0
+        self.retries = 0
+        self.retry_successes = 0
+        self.wasted_tokens = 0
+
+    def record(self, outcome: str, dropped_items: int = 0):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.dropped_items += dropped_items
+
+    def record_retry(self, succeeded: bool):
+        with self._lock:
+            self.retries += 1
+            self.retry_successes += int(succeeded)
+
+    def record_wasted(self, tokens: Optional[int]):
+        with self._lock:
+            self.wasted_tokens += tokens or 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            malformed = self.outcomes["repaired"] + self.outcomes["salvaged"] + self.outcomes["failed"]
+            rescued = self.outcomes["repaired"] + self.outcomes["salvaged"]
+            return {
+                **self.outcomes,
+                "dropped_items": self.dropped_items,
+                # Share of malformed responses that were used without another generation
+                "salvage_rate": round(rescued / malformed, 3) if malformed else None,
+                "retries": self.retries,
+                "retry_successes": self.retry_successes,
+                "wasted_tokens": self.wasted_tokens,
+            }
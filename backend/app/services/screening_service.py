@@ -0,0 +1,86 @@
+import math
+from collections import Counter
+from typing import Dict, List
+import numpy as np
+from app.services.data_service import DataService
+from app.services.claim_retriever import tokenize
+from app.services.patent_store import decode_claims
+
+
+class ProductScreener:
+    """
+    Cheap patent-to-product screening over the whole catalog.
+    Every product of every company is embedded once as an L2-normalised TF-IDF
+    row vector; screening a patent is a single matrix-vector product, so only
+    the top-k candidates need a full LLM analysis.
+    """
+
+    def __init__(self, data_service: DataService):
+        self.data_service = data_service
+        self.catalog: List[Dict] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self._build()
+
+    def _build(self):
+        """Build the product TF-IDF matrix"""
+        self.catalog = self.data_service.get_products()
+        documents = [
+            Counter(tokenize(f"{entry['product'].get('name', '')} {entry['product'].get('description', '')}"))
+            for entry in self.catalog
+        ]
+        doc_freqs = Counter(term for doc in documents for term in doc)
+        self.vocabulary = {term: i for i, term in enumerate(sorted(doc_freqs))}
+
+        count = len(documents)
+        self.idf = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term, i in self.vocabulary.items():
+            self.idf[i] = math.log((1 + count) / (1 + doc_freqs[term])) + 1
+
+        self.matrix = np.zeros((count, len(self.vocabulary)), dtype=np.float32)
+        for row, doc in enumerate(documents):
+            for term, freq in doc.items():
+                self.matrix[row, self.vocabulary[term]] = 1 + math.log(freq)
+        self.matrix *= self.idf
+        self.matrix /= np.maximum(np.linalg.norm(self.matrix, axis=1, keepdims=True), 1e-12)
+
+    def patent_text(self, patent: Dict) -> str:
+        """Title, abstract and claims of a patent as one document"""
+        claims = self.data_service.get_claims(patent.get("publication_number", ""))
+        if claims is None:
+            try:
+                claims = decode_claims(patent.get("claims"))
+            except ValueError:
+                claims = []
+        return " ".join(
+            [patent.get("title") or "", patent.get("abstract") or ""]
+            + [claim.text for claim in claims]
+        )
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """L2-normalised TF-IDF vector of text over the product vocabulary"""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term, freq in Counter(tokenize(text)).items():
+            i = self.vocabulary.get(term)
+            if i is not None:
+                vector[i] = (1 + math.log(freq)) * self.idf[i]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def screen(self, patent: Dict, top_k: int = 5) -> List[Dict]:
+        """
+        Rank catalog products by cosine similarity to the patent.
+        Returns the top_k entries as {"company_name", "product", "similarity"},
+        ties in catalog order.
+        """
+        if not self.catalog or top_k <= 0:
+            return []
+        scores = self.matrix @ self.vectorize(self.patent_text(patent))
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [
+            {**self.catalog[i], "similarity": round(float(scores[i]), 4)}
+            for i in top
+        ]
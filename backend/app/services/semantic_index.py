@@ -0,0 +1,404 @@
+import os
+import json
+import math
+import zlib
+import hashlib
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.services.claim_retriever import tokenize
+from app.services.fulltext_index import patent_fields
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional dependency
+    SentenceTransformer = None
+
+
+@lru_cache(maxsize=1 << 20)
+def _bucket(feature: str, dim: int) -> int:
+    """1-based bucket of a feature, negated for features counted with a -1 sign"""
+    # crc32 rather than hash() so vectors are stable across processes
+    h = zlib.crc32(feature.encode("utf-8"))
+    return (h % dim + 1) if h & 0x80000000 else -(h % dim + 1)
+
+
+class HashingEmbedder:
+    """
+    Dependency-free text embedding: words and the character 4-grams of each
+    word are hashed into `dim` signed buckets, weighted by 1 + log(count) and
+    L2-normalised. Character n-grams let inflections ("mower", "mowing") and
+    compounds share dimensions, so related wording scores above zero even
+    without exact word overlap. Below ~512 dimensions hash collisions between
+    long documents start to outweigh real overlap with short queries.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        """Weight of every word and character 4-gram in text"""
+        words = Counter(tokenize(text))
+        grams: Counter = Counter()
+        for word, count in words.items():
+            padded = f"<{word}>"
+            for i in range(len(padded) - 3):
+                grams["#" + padded[i:i + 4]] += count
+        features = {word: 1 + math.log(count) for word, count in words.items()}
+        features.update((gram, 0.25 * (1 + math.log(count))) for gram, count in grams.items())
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """L2-normalised float32 vectors, one row per text"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            buckets = np.array([_bucket(feature, self.dim) for feature in features], dtype=np.int64)
+            weights = np.fromiter(features.values(), dtype=np.float64, count=len(features))
+            # Negative buckets carry a -1 sign so collisions tend to cancel out
+            vectors[row] = np.bincount(np.abs(buckets) - 1, weights=np.sign(buckets) * weights, minlength=self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+class SentenceTransformerEmbedder:
+    """Embeds with a sentence-transformers model (e.g. all-MiniLM-L6-v2) on the CPU"""
+
+    def __init__(self, model_name: str):
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers-{model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=32, normalize_embeddings=True).astype(np.float32)
+
+
+def embedder_from_env():
+    """
+    The sentence-transformers model named by EMBEDDING_MODEL when the optional
+    package is installed, otherwise a HashingEmbedder of EMBEDDING_DIM dimensions
+    """
+    model_name = os.getenv("EMBEDDING_MODEL")
+    if model_name:
+        if SentenceTransformer is None:
+            print(f"EMBEDDING_MODEL={model_name} needs `pip install sentence-transformers`, using hashed embeddings")
+        else:
+            try:
+                return SentenceTransformerEmbedder(model_name)
+            except Exception as e:
+                print(f"Error loading embedding model {model_name}: {str(e)}")
+    return HashingEmbedder(int(os.getenv("EMBEDDING_DIM", "512")))
+
+
+def patent_texts(data_service) -> Iterable[Tuple[str, str]]:
+    """(publication number, title, abstract and claims) of every patent in the corpus"""
+    for patent in data_service.get_patents():
+        fields = patent_fields(patent)
+        yield patent["publication_number"], "\n".join([fields["title"], fields["abstract"], fields["claims"]])
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compact storage of unit vectors: float16, or int8 with one float32 scale
+    per row (the row's largest magnitude maps to 127)
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    peaks = np.abs(vectors).max(axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+    scales = np.where(peaks > 0, peaks / 127, 1).astype(np.float32)
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+
+def dequantize(vectors: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """float32 vectors back from their quantized rows and scales"""
+    return vectors.astype(np.float32) * scales[:, None]
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the most similar centroid of every (float) vector"""
+    lists = np.zeros(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        lists[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(sample: np.ndarray, count: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: `count` unit centroids of a sample of unit vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), size=count, replace=False)].copy()
+    for _ in range(iterations):
+        lists = assign_lists(sample, centroids)
+        order = np.argsort(lists, kind="stable")
+        used = np.unique(lists)
+        starts = np.searchsorted(lists[order], used)
+        # Clusters left empty keep their previous centroid
+        centroids[used] = np.add.reduceat(sample[order], starts, axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1)
+    return centroids
+
+
+class SemanticIndex:
+    """
+    Embedding index for "patents similar to this text" queries.
+    Vectors are stored quantized (int8 by default, or float16) in one matrix.
+    Small indexes are searched by brute force: the matrix is scored against
+    the query in chunks, keeping a running top-k. From ann_min_size vectors on
+    an inverted-file index is added: k-means splits the rows into ~sqrt(n)
+    lists and a query only scores the rows of the nprobe lists whose centroids
+    are closest to it. sync() hashes each patent's text and re-embeds only new
+    or changed patents, which are assigned to the existing lists; the
+    centroids are retrained once the index has grown fourfold. The embedder's
+    name is stored with the vectors, so switching models re-embeds everything.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        index_dir: Optional[Path] = None,
+        dtype: str = "int8",
+        chunk_size: int = 65536,
+        ann_min_size: int = 50000,
+        nprobe: int = 32
+    ):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.embedder = embedder or HashingEmbedder()
+        self.index_dir = Path(index_dir) if index_dir else None
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        # 0 disables the approximate index
+        self.ann_min_size = ann_min_size
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> "SemanticIndex":
+        """Create an index configured from environment variables"""
+        default_dir = Path(__file__).parent.parent / "data" / "semantic_index"
+        return cls(
+            embedder=embedder_from_env(),
+            index_dir=Path(os.getenv("SEMANTIC_INDEX_DIR", str(default_dir))),
+            dtype=os.getenv("EMBEDDING_DTYPE", "int8"),
+            ann_min_size=int(os.getenv("SEMANTIC_ANN_MIN_SIZE", "50000")),
+            nprobe=int(os.getenv("SEMANTIC_NPROBE", "32")),
+        )
+
+    def _reset(self):
+        self.keys: List[str] = []
+        self.hashes: List[str] = []
+        self.vectors = np.zeros((0, self.embedder.dim), dtype=self.dtype)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self._rows: Dict[str, int] = {}
+        self._reset_lists()
+
+    def _reset_lists(self):
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: Optional[np.ndarray] = None
+        self.trained_on = 0
+        self._list_rows = np.zeros(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def sync(self, documents: Iterable[Tuple[str, str]], delete_missing: bool = True, batch_size: int = 256) -> Dict:
+        """
+        Bring the index up to date with (publication number, text) documents.
+        Only new and changed texts are embedded. With delete_missing, indexed
+        documents that are not in `documents` are removed.
+        Returns the number of added, updated and deleted documents.
+        """
+        with self._lock:
+            seen = set()
+            changed: List[Tuple[str, str, str]] = []
+            for key, text in documents:
+                seen.add(key)
+                digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                row = self._rows.get(key)
+                if row is None or self.hashes[row] != digest:
+                    changed.append((key, digest, text))
+            missing = [key for key in self._rows if key not in seen] if delete_missing else []
+            if not changed and not missing:
+                return {"added": 0, "updated": 0, "deleted": 0}
+
+            vectors, scales = self.vectors.copy(), self.scales.copy()
+            keys, hashes = list(self.keys), list(self.hashes)
+            # Rows whose list assignment must be (re)computed
+            stale = np.zeros(len(keys), dtype=bool)
+            added = []
+            for start in range(0, len(changed), batch_size):
+                batch = changed[start:start + batch_size]
+                quantized, batch_scales = quantize(self.embedder.embed([text for _, _, text in batch]), self.dtype)
+                for (key, digest, _), vector, scale in zip(batch, quantized, batch_scales):
+                    row = self._rows.get(key)
+                    if row is None:
+                        added.append((key, digest, vector, scale))
+                    else:
+                        vectors[row], scales[row], hashes[row] = vector, scale, digest
+                        stale[row] = True
+            if added:
+                vectors = np.concatenate([vectors, np.stack([vector for _, _, vector, _ in added])])
+                scales = np.concatenate([scales, np.array([scale for _, _, _, scale in added], dtype=np.float32)])
+                keys += [key for key, _, _, _ in added]
+                hashes += [digest for _, digest, _, _ in added]
+                stale = np.concatenate([stale, np.ones(len(added), dtype=bool)])
+            lists = self.lists
+            if lists is not None:
+                lists = np.concatenate([lists, np.zeros(len(added), dtype=np.int32)])
+            if missing:
+                keep = np.ones(len(keys), dtype=bool)
+                keep[[self._rows[key] for key in missing]] = False
+                vectors, scales, stale = vectors[keep], scales[keep], stale[keep]
+                lists = lists[keep] if lists is not None else None
+                keys = [key for key, kept in zip(keys, keep) if kept]
+                hashes = [digest for digest, kept in zip(hashes, keep) if kept]
+
+            self.vectors, self.scales, self.keys, self.hashes = vectors, scales, keys, hashes
+            self._rows = {key: row for row, key in enumerate(keys)}
+            self._update_lists(lists, stale)
+            self._save()
+            return {"added": len(added), "updated": len(changed) - len(added), "deleted": len(missing)}
+
+    def _update_lists(self, lists: Optional[np.ndarray], stale: np.ndarray):
+        """Train, extend or drop the inverted-file lists for the current vectors"""
+        count = len(self.keys)
+        if not self.ann_min_size or count < self.ann_min_size:
+            self._reset_lists()
+            return
+        if self.centroids is None or lists is None or count >= 4 * self.trained_on:
+            rng = np.random.default_rng(0)
+            nlist = max(1, int(math.sqrt(count)))
+            sample = rng.choice(count, size=min(count, 64 * nlist), replace=False)
+            self.centroids = train_centroids(dequantize(self.vectors[sample], self.scales[sample]), nlist)
+            self.trained_on = count
+            stale = np.ones(count, dtype=bool)
+            lists = np.zeros(count, dtype=np.int32)
+        rows = np.flatnonzero(stale)
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            lists[chunk] = assign_lists(dequantize(self.vectors[chunk], self.scales[chunk]), self.centroids)
+        self.lists = lists
+        self._list_rows = np.argsort(lists, kind="stable")
+        self._list_offsets = np.searchsorted(lists[self._list_rows], np.arange(len(self.centroids) + 1))
+
+    def train_lists(self):
+        """Retrain the inverted-file centroids and reassign every row"""
+        with self._lock:
+            self.centroids = None
+            self._update_lists(None, np.ones(len(self.keys), dtype=bool))
+            self._save()
+
+    def search(self, text: str, limit: int = 10, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        (publication number, cosine similarity) of the `limit` patents closest
+        to text, best first. Uses the inverted-file lists when there are any,
+        unless exact is set.
+        """
+        with self._lock:
+            vectors, scales, keys = self.vectors, self.scales, self.keys
+            centroids, list_rows, offsets = self.centroids, self._list_rows, self._list_offsets
+        if not len(keys) or limit < 1:
+            return []
+        query = self.embedder.embed([text])[0]
+
+        if centroids is not None and not exact:
+            closeness = centroids @ query
+            probed = np.argsort(-closeness)[:self.nprobe]
+            rows = np.sort(np.concatenate([list_rows[offsets[i]:offsets[i + 1]] for i in probed]))
+            scores = (vectors[rows].astype(np.float32) @ query) * scales[rows]
+            best_rows, best_scores = self._top(rows, scores, limit)
+        else:
+            best_rows = np.zeros(0, dtype=np.int64)
+            best_scores = np.zeros(0, dtype=np.float32)
+            for start in range(0, len(keys), self.chunk_size):
+                chunk = vectors[start:start + self.chunk_size]
+                scores = (chunk.astype(np.float32) @ query) * scales[start:start + len(chunk)]
+                rows, chunk_scores = self._top(np.arange(start, start + len(chunk)), scores, limit)
+                best_rows, best_scores = self._top(
+                    np.concatenate([best_rows, rows]), np.concatenate([best_scores, chunk_scores]), limit
+                )
+        return [(keys[row], float(score)) for row, score in zip(best_rows.tolist(), best_scores.tolist())]
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The `limit` best (row, score) pairs, by descending score then row"""
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "documents": len(self.keys),
+                "embedder": self.embedder.name,
+                "dim": self.embedder.dim,
+                "dtype": self.dtype,
+                "matrix_bytes": int(self.vectors.nbytes + self.scales.nbytes),
+                "lists": 0 if self.centroids is None else len(self.centroids),
+            }
+
+    def _save(self):
+        """Write the matrix, scales, lists and document table, each atomically"""
+        if not self.index_dir:
+            return
+        try:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            arrays = [("vectors.npy", self.vectors), ("scales.npy", self.scales)]
+            if self.centroids is not None:
+                arrays += [("centroids.npy", self.centroids), ("lists.npy", self.lists)]
+            for name, array in arrays:
+                path = self.index_dir / name
+                with open(path.with_suffix(".tmp"), "wb") as f:
+                    np.save(f, array)
+                os.replace(path.with_suffix(".tmp"), path)
+            path = self.index_dir / "documents.json"
+            with open(path.with_suffix(".tmp"), "w") as f:
+                json.dump({
+                    "embedder": self.embedder.name,
+                    "dtype": self.dtype,
+                    "trained_on": self.trained_on,
+                    "keys": self.keys,
+                    "hashes": self.hashes,
+                }, f)
+            os.replace(path.with_suffix(".tmp"), path)
+        except Exception as e:
+            print(f"Error writing semantic index {self.index_dir}: {str(e)}")
+
+    def _load(self):
+        if not self.index_dir or not (self.index_dir / "documents.json").exists():
+            return
+        try:
+            with open(self.index_dir / "documents.json") as f:
+                documents = json.load(f)
+            if documents["embedder"] != self.embedder.name or documents["dtype"] != self.dtype:
+                print(f"Semantic index built with {documents['embedder']} ({documents['dtype']}), re-embedding")
+                return
+            vectors = np.load(self.index_dir / "vectors.npy")
+            scales = np.load(self.index_dir / "scales.npy")
+            if not len(vectors) == len(scales) == len(documents["keys"]):
+                raise ValueError("vectors do not match the document table")
+            self.vectors, self.scales = vectors, scales
+            self.keys, self.hashes = documents["keys"], documents["hashes"]
+            self._rows = {key: row for row, key in enumerate(self.keys)}
+
+            lists = None
+            if documents.get("trained_on") and (self.index_dir / "lists.npy").exists():
+                self.centroids = np.load(self.index_dir / "centroids.npy")
+                self.trained_on = documents["trained_on"]
+                lists = np.load(self.index_dir / "lists.npy")
+                if len(lists) != len(self.keys):
+                    raise ValueError("list assignments do not match the document table")
+            self._update_lists(lists, np.zeros(len(self.keys), dtype=bool))
+        except Exception as e:
+            print(f"Error loading semantic index {self.index_dir}: {str(e)}")
+            self._reset()
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    """One in-flight call shared by every caller with the same key"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key starts
+    the call, later callers attach to it while it runs and all of them get
+    the same result. The call runs in its own task, so a caller that gives up
+    does not cancel it for the others; it is cancelled only when every caller
+    has gone. Once finished the key is released and the next call runs anew.
+    seconds_saved adds up the duration of the shared call for every caller
+    that attached to it, i.e. the generation time the duplicates did not use.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.seconds_saved = 0.0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run call() for key, or wait for the identical call already in flight"""
+        self.calls += 1
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if joined:
+            self.coalesced += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+        if joined:
+            self.seconds_saved += flight.elapsed
+        return result
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        flight.elapsed = time.perf_counter() - flight.started
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "seconds_saved": round(self.seconds_saved, 3),
+            "gpu_minutes_saved": round(self.seconds_saved / 60, 2),
+        }
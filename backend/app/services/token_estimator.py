@@ -0,0 +1,67 @@
+import os
+import re
+from typing import Optional
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # optional dependency
+    Tokenizer = None
+
+# Words, single digits (Llama/Mistral tokenizers split numbers digit by digit),
+# and individual punctuation marks
+_PIECES = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_")
+
+
+class TokenEstimator:
+    """
+    Counts prompt tokens.
+    Uses a HuggingFace tokenizer.json when TOKENIZER_PATH is set and the optional
+    `tokenizers` package is installed; otherwise falls back to a heuristic
+    calibrated against the Mistral/Llama SentencePiece vocabularies: one token per
+    short word, one more per ~4 extra characters, one per digit and punctuation mark.
+    """
+
+    def __init__(self, tokenizer_path: Optional[str] = None, scale: float = 1.1):
+        # Heuristic counts are scaled up slightly so the budget errs on the safe side
+        self.scale = scale
+        self.tokenizer = None
+        if tokenizer_path and Tokenizer is not None:
+            try:
+                self.tokenizer = Tokenizer.from_file(tokenizer_path)
+            except Exception as e:
+                print(f"Error loading tokenizer {tokenizer_path}: {str(e)}")
+
+    @classmethod
+    def from_env(cls) -> "TokenEstimator":
+        """Create an estimator configured from environment variables"""
+        return cls(
+            tokenizer_path=os.getenv("TOKENIZER_PATH"),
+            scale=float(os.getenv("TOKEN_ESTIMATE_SCALE", "1.1")),
+        )
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text"""
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        tokens = 0
+        for piece in _PIECES.findall(text):
+            tokens += 1 + max(0, len(piece) - 6) // 4
+        return int(tokens * self.scale) + 1
+
+
+_default_estimator: Optional[TokenEstimator] = None
+
+
+def get_token_estimator() -> TokenEstimator:
+    """Process-wide estimator configured from the environment"""
+    global _default_estimator
+    if _default_estimator is None:
+        _default_estimator = TokenEstimator.from_env()
+    return _default_estimator
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of text using the process-wide estimator"""
+    return get_token_estimator().count(text)
@@ -0,0 +1,161 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.database.models import BatchRequest
+from app.dependencies import get_analyzer_service, get_data_service, get_job_queue
+from app.routers import analysis
+from app.routers.analysis import run_batch
+from app.services.analyzer_service import AnalyzerService
+from app.services.cache_service import AnalysisCache
+from app.services.claim_retriever import ClaimRetriever
+from app.services.job_service import JobQueue
+
+PAIRS = [
+    {"patent_id": "US1", "company_name": "Walmart Inc."},
+    {"patent_id": "US1", "company_name": "walmart inc."},
+    {"patent_id": "US2", "company_name": "Walmart Inc."},
+    {"patent_id": "MISSING", "company_name": "Walmart Inc."}
+]
+
+async def fake_company_analysis(request, patent, company, progress=None):
+    """Stand-in for analyze_company that tracks concurrency"""
+    fake_company_analysis.running += 1
+    fake_company_analysis.peak = max(fake_company_analysis.peak, fake_company_analysis.running)
+    fake_company_analysis.calls.append(request)
+    await asyncio.sleep(0.01)
+    fake_company_analysis.running -= 1
+    return {"status_code": 200, "data": {"patent_id": patent["publication_number"]}}
+
+def fake_data_service():
+    """Data service knowing every patent but MISSING and every company"""
+    data_service = Mock()
+    data_service.get_patent.side_effect = lambda patent_id: (
+        None if patent_id == "MISSING" else {"publication_number": patent_id}
+    )
+    data_service.get_company.side_effect = lambda name: {"name": name, "products": []}
+    return data_service
+
+@pytest.fixture(autouse=True)
+def reset_fake():
+    """Reset the fake analysis counters"""
+    fake_company_analysis.running = 0
+    fake_company_analysis.peak = 0
+    fake_company_analysis.calls = []
+
+async def collect(request, analyzer_service=None):
+    with patch("app.routers.analysis.analyze_company", fake_company_analysis), \
+            patch("app.routers.analysis.get_data_service", fake_data_service), \
+            patch("app.routers.analysis.get_analyzer_service", lambda: analyzer_service or Mock()):
+        return [event async for event in run_batch(request)]
+
+@pytest.mark.asyncio
+async def test_batch_deduplicates_pairs():
+    """Test repeated pairs are analyzed once but reported for every occurrence"""
+    events = await collect(BatchRequest(pairs=PAIRS))
+
+    assert events[0] == {"event": "start", "pairs": 4, "unique_pairs": 3, "patents": 3, "concurrency": 4}
+    assert len(fake_company_analysis.calls) == 2
+    pair_events = [e for e in events if e["event"] == "pair"]
+    assert sorted(e["index"] for e in pair_events) == [0, 1, 2, 3]
+    assert next(e for e in pair_events if e["index"] == 1)["data"] == {"patent_id": "US1"}
+
+@pytest.mark.asyncio
+async def test_batch_summary_reports_throughput_and_failures():
+    """Test the summary counts failures and reports pairs per minute"""
+    events = await collect(BatchRequest(pairs=PAIRS))
+
+    summary = events[-1]
+    assert summary["event"] == "summary"
+    assert summary["completed"] == 3
+    assert summary["failed"] == 1
+    assert summary["pairs_per_minute"] > 0
+    missing = next(e for e in events if e.get("index") == 3)
+    assert missing["status_code"] == 404
+
+@pytest.mark.asyncio
+async def test_batch_respects_concurrency():
+    """Test no more than `concurrency` pairs are analyzed at once"""
+    pairs = [{"patent_id": f"US{i}", "company_name": "Walmart Inc."} for i in range(6)]
+    await collect(BatchRequest(pairs=pairs, concurrency=2))
+
+    assert fake_company_analysis.peak == 2
+    assert len(fake_company_analysis.calls) == 6
+
+@pytest.mark.asyncio
+async def test_batch_groups_pairs_by_patent():
+    """Test each patent is prepared once and its pairs are analyzed back to back"""
+    pairs = [
+        {"patent_id": patent_id, "company_name": company}
+        for company in ("Walmart Inc.", "Target Corporation", "Costco")
+        for patent_id in ("US1", "US2")
+    ]
+    analyzer_service = Mock()
+    await collect(BatchRequest(pairs=pairs, concurrency=1), analyzer_service)
+
+    assert [call.args[0]["publication_number"] for call in analyzer_service.prepare_patent.call_args_list] == ["US1", "US2"]
+    assert [request.patent_id for request in fake_company_analysis.calls] == ["US1"] * 3 + ["US2"] * 3
+
+def test_company_fanout_reports_failed_products(tmp_path):
+    """Test the /company response lists products whose fan-out analysis failed"""
+    data_service = Mock()
+    data_service.get_patent.return_value = {"publication_number": "US1"}
+    data_service.get_company.return_value = {
+        "name": "Walmart Inc.",
+        "products": [{"name": "Shopping App"}, {"name": "Broken App"}]
+    }
+    analyzer_service = AnalyzerService(
+        cache=AnalysisCache(tmp_path / "cache.json"),
+        claim_retriever=ClaimRetriever(tmp_path / "claim_index")
+    )
+    analyzer_service.analyze_single_product_async = AsyncMock(side_effect=lambda patent, product, use_cache: (
+        {"status_code": 502, "error": "LLM backend unavailable"} if product["name"] == "Broken App"
+        else {"status_code": 200, "data": {
+            "product_name": product["name"],
+            "infringement_score": 80,
+            "infringement_likelihood": "High",
+            "relevant_claims": ["1"],
+            "explanation": "Test",
+            "specific_features": []
+        }}
+    ))
+
+    app = FastAPI()
+    app.include_router(analysis.router)
+    app.dependency_overrides[get_data_service] = lambda: data_service
+    app.dependency_overrides[get_analyzer_service] = lambda: analyzer_service
+    with patch("app.routers.analysis.get_data_service", lambda: data_service), \
+            patch("app.routers.analysis.get_analyzer_service", lambda: analyzer_service):
+        response = TestClient(app).post("/api/analysis/company", json={
+            "patent_id": "US1",
+            "company_name": "Walmart Inc.",
+            "strategy": "fanout"
+        })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["partial"] is True
+    assert body["timed_out_products"] == []
+    assert body["failed_products"] == [{"product_name": "Broken App", "error": "LLM backend unavailable"}]
+    assert "failed_products" in app.openapi()["components"]["schemas"]["InfringementAnalysis"]["properties"]
+
+def test_jobs_use_the_injected_queue(tmp_path):
+    """Test the job routes persist to the queue they are given, coalescing identical submissions"""
+    job_queue = JobQueue(AsyncMock(), tmp_path / "jobs.json")
+    app = FastAPI()
+    app.include_router(analysis.router)
+    app.dependency_overrides[get_job_queue] = lambda: job_queue
+    client = TestClient(app)
+    payload = {"patent_id": "US1", "company_name": "Walmart Inc."}
+
+    with patch("app.routers.analysis.get_analyzer_service", lambda: Mock(model="phi")):
+        first = client.post("/api/analysis/jobs", json=payload).json()
+        second = client.post("/api/analysis/jobs", json=payload).json()
+
+    assert first["status"] == "queued"
+    assert second == {**first, "coalesced": True}
+    assert client.get(f"/api/analysis/jobs/{first['job_id']}").json()["request"]["patent_id"] == "US1"
+    assert client.get("/api/analysis/jobs/missing").status_code == 404
+    assert client.get("/api/analysis/jobs/stats").json()["coalesced"] == 1
+    assert (tmp_path / "jobs.json").exists()
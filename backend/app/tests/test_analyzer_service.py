@@ -1,6 +1,10 @@
 import pytest
 from app.services.analyzer_service import AnalyzerService
-from unittest.mock import patch, Mock
+from app.services.cache_service import AnalysisCache
+from app.services.claim_retriever import ClaimRetriever
+from unittest.mock import patch, Mock, AsyncMock
+import asyncio
+import httpx
 import json
 
 # Mock data for testing
@@ -20,24 +24,68 @@ MOCK_PRODUCTS = [
 ]
 
 @pytest.fixture
-def analyzer_service():
+def analyzer_service(tmp_path):
     """Fixture to create an AnalyzerService instance"""
-    return AnalyzerService()
+    return AnalyzerService(
+        cache=AnalysisCache(tmp_path / "cache.json"),
+        claim_retriever=ClaimRetriever(tmp_path / "claim_index")
+    )
 
-def test_analyze_multiple_products(analyzer_service):
-    """Test analyze_multiple_products method"""
-    mock_response = Mock()
-    mock_response.json.return_value = {
+SINGLE_BODY = {
+    "response": json.dumps({
+        "product_name": "Product 1",
+        "infringement_score": 85,
+        "infringement_likelihood": "High",
+        "relevant_claims": ["1"],
+        "explanation": "Test",
+        "specific_features": ["feature1"]
+    })
+}
+
+@pytest.mark.asyncio
+async def test_analyze_single_product_async(analyzer_service):
+    """Test analyze_single_product_async parses the generation of the configured client"""
+    analyzer_service.client.generate = AsyncMock(return_value=SINGLE_BODY)
+
+    result = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+
+    assert result["status_code"] == 200
+    assert result["data"]["infringement_score"] == 85
+    assert result["data"]["infringement_likelihood"] == "High"
+
+@pytest.mark.asyncio
+async def test_analyze_single_product_async_error(analyzer_service):
+    """Test an unexpected client error is reported as a 500"""
+    analyzer_service.client.generate = AsyncMock(side_effect=Exception("Test error"))
+
+    result = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+
+    assert result["status_code"] == 500
+    assert "error" in result
+
+@pytest.mark.asyncio
+async def test_analyze_single_product_async_uses_cache(analyzer_service):
+    """Test repeated analyses are served from the cache unless bypassed"""
+    analyzer_service.client.generate = AsyncMock(return_value=SINGLE_BODY)
+
+    first = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+    second = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+    assert analyzer_service.client.generate.call_count == 1
+    assert first == second
+
+    await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0], use_cache=False)
+    assert analyzer_service.client.generate.call_count == 2
+
+    stats = analyzer_service.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_analyze_multiple_products_async(analyzer_service):
+    """Test analyze_multiple_products_async sorts results through the async client"""
+    body = {
         "response": json.dumps({
             "products": [
-                {
-                    "product_name": "Product 1",
-                    "infringement_score": 85,
-                    "infringement_likelihood": "High",
-                    "relevant_claims": ["1"],
-                    "explanation": "Test",
-                    "specific_features": ["feature1"]
-                },
                 {
                     "product_name": "Product 2",
                     "infringement_score": 45,
@@ -45,46 +93,296 @@ def test_analyze_multiple_products(analyzer_service):
                     "relevant_claims": ["2"],
                     "explanation": "Test",
                     "specific_features": ["feature2"]
+                },
+                {
+                    "product_name": "Product 1",
+                    "infringement_score": 85,
+                    "infringement_likelihood": "High",
+                    "relevant_claims": ["1"],
+                    "explanation": "Test",
+                    "specific_features": ["feature1"]
                 }
             ]
         })
     }
-    mock_response.raise_for_status = Mock()
-
-    with patch('requests.post', return_value=mock_response):
-        result = analyzer_service.analyze_multiple_products(MOCK_PATENT, MOCK_PRODUCTS)
-        
-        assert result["status_code"] == 200
-        assert len(result["data"]) == 2
-        assert result["data"][0]["infringement_score"] == 85
-        assert result["data"][1]["infringement_score"] == 45
-
-def test_analyze_single_product(analyzer_service):
-    """Test analyze_single_product method"""
-    mock_response = Mock()
-    mock_response.json.return_value = {
-        "response": json.dumps({
-            "product_name": "Product 1",
-            "infringement_score": 85,
-            "infringement_likelihood": "High",
+    analyzer_service.client.generate = AsyncMock(return_value=body)
+
+    result = await analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS)
+
+    assert result["status_code"] == 200
+    assert [p["product_name"] for p in result["data"]] == ["Product 1", "Product 2"]
+
+@pytest.mark.asyncio
+async def test_analyze_single_product_async_http_error(analyzer_service):
+    """Test analyze_single_product_async maps transport errors to 503"""
+    analyzer_service.client.generate = AsyncMock(side_effect=httpx.ConnectError("refused"))
+
+    result = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+
+    assert result["status_code"] == 503
+    assert "error" in result
+
+@pytest.mark.asyncio
+async def test_stream_multiple_products(analyzer_service):
+    """Test streaming emits tokens, each completed product and a final sorted result"""
+    text = json.dumps({
+        "products": [
+            {
+                "product_name": "Product 2",
+                "infringement_score": 45,
+                "infringement_likelihood": "Moderate",
+                "relevant_claims": ["2"],
+                "explanation": "Test",
+                "specific_features": ["feature2"]
+            },
+            {
+                "product_name": "Product 1",
+                "infringement_score": 85,
+                "infringement_likelihood": "High",
+                "relevant_claims": ["1"],
+                "explanation": "Test",
+                "specific_features": ["feature1"]
+            }
+        ]
+    })
+
+    async def generate_stream(payload):
+        assert payload["stream"] is True
+        for i in range(0, len(text), 7):
+            yield {"response": text[i:i + 7], "done": False}
+        yield {"response": "", "done": True}
+
+    analyzer_service.client.generate_stream = generate_stream
+
+    events = [
+        event async for event in
+        analyzer_service.stream_multiple_products(MOCK_PATENT, MOCK_PRODUCTS)
+    ]
+    kinds = [event["event"] for event in events]
+
+    assert "token" in kinds
+    products = [event["data"]["product_name"] for event in events if event["event"] == "product"]
+    assert products == ["Product 2", "Product 1"]
+    assert events[-1]["event"] == "result"
+    assert events[-1]["data"]["data"][0]["product_name"] == "Product 1"
+
+def make_single_result(name, score):
+    """Build a successful analyze_single_product_async result"""
+    return {
+        "status_code": 200,
+        "data": {
+            "product_name": name,
+            "infringement_score": score,
+            "infringement_likelihood": "High" if score >= 75 else "Low",
             "relevant_claims": ["1"],
             "explanation": "Test",
-            "specific_features": ["feature1"]
-        })
+            "specific_features": []
+        }
+    }
+
+@pytest.mark.asyncio
+async def test_fanout_merges_top_k(analyzer_service):
+    """Test fan-out analyzes every product and keeps the highest scores"""
+    products = [{"name": f"Product {i}", "description": "Test"} for i in range(5)]
+
+    async def analyze(patent, product, use_cache=True):
+        return make_single_result(product["name"], int(product["name"][-1]) * 10)
+
+    analyzer_service.analyze_single_product_async = analyze
+    result = await analyzer_service.analyze_products_fanout_async(MOCK_PATENT, products, top_k=2)
+
+    assert result["status_code"] == 200
+    assert [p["product_name"] for p in result["data"]] == ["Product 4", "Product 3"]
+    assert result["partial"] is False
+
+@pytest.mark.asyncio
+async def test_fanout_respects_concurrency_cap(analyzer_service):
+    """Test no more than the configured number of products run at once"""
+    active = 0
+    peak = 0
+
+    async def analyze(patent, product, use_cache=True):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return make_single_result(product["name"], 50)
+
+    analyzer_service.analyze_single_product_async = analyze
+    products = [{"name": f"Product {i}", "description": "Test"} for i in range(6)]
+    await analyzer_service.analyze_products_fanout_async(MOCK_PATENT, products, concurrency=2)
+
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_fanout_returns_partial_results_on_deadline(analyzer_service):
+    """Test products exceeding the deadline are dropped and reported"""
+    async def analyze(patent, product, use_cache=True):
+        if product["name"] == "Product 2":
+            await asyncio.sleep(10)
+        return make_single_result(product["name"], 80)
+
+    analyzer_service.analyze_single_product_async = analyze
+    result = await analyzer_service.analyze_products_fanout_async(
+        MOCK_PATENT, MOCK_PRODUCTS, deadline=0.05
+    )
+
+    assert result["status_code"] == 200
+    assert result["partial"] is True
+    assert result["timed_out"] == ["Product 2"]
+    assert [p["product_name"] for p in result["data"]] == ["Product 1"]
+
+@pytest.mark.asyncio
+async def test_score_products_orders_all_products(analyzer_service):
+    """Test the score-only pass caps output tokens and ranks every product"""
+    products = [{"name": f"Product {i}", "description": "Test"} for i in range(3)]
+    body = {"response": json.dumps({"products": [
+        {"product_name": "Product 2", "infringement_score": 90},
+        {"product_name": "product 0", "infringement_score": 30}
+    ]})}
+    analyzer_service.client.generate = AsyncMock(return_value=body)
+
+    result = await analyzer_service.score_products_async(MOCK_PATENT, products)
+
+    payload = analyzer_service.client.generate.call_args[0][0]
+    assert payload["options"]["num_predict"] == 3 * analyzer_service.score_tokens_per_product + 16
+    assert set(payload["format"]["$defs"]["ProductScore"]["properties"]) == {"product_name", "infringement_score"}
+    assert result["data"] == [
+        {"product_name": "Product 2", "infringement_score": 90},
+        {"product_name": "Product 0", "infringement_score": 30},
+        {"product_name": "Product 1", "infringement_score": None}
+    ]
+
+@pytest.mark.asyncio
+async def test_two_phase_fully_analyzes_only_top_k(analyzer_service):
+    """Test phase two runs the full analysis for the top_k scored products only"""
+    products = [{"name": f"Product {i}", "description": "Test"} for i in range(10)]
+    scores = [{"product_name": f"Product {i}", "infringement_score": i * 10} for i in reversed(range(10))]
+    analyzer_service.score_products_async = AsyncMock(return_value={"status_code": 200, "data": scores})
+    analyzed = []
+
+    async def analyze(patent, product, use_cache=True):
+        analyzed.append(product["name"])
+        return make_single_result(product["name"], 70)
+
+    analyzer_service.analyze_single_product_async = analyze
+    result = await analyzer_service.analyze_products_two_phase_async(MOCK_PATENT, products, top_k=2)
+
+    assert sorted(analyzed) == ["Product 8", "Product 9"]
+    assert result["status_code"] == 200
+    assert len(result["data"]) == 2
+    assert result["screening"] == scores
+
+@pytest.mark.asyncio
+async def test_two_phase_score_error(analyzer_service):
+    """Test a failed scoring pass is returned as the error"""
+    analyzer_service.score_products_async = AsyncMock(return_value={"status_code": 503, "error": "down"})
+    result = await analyzer_service.analyze_products_two_phase_async(MOCK_PATENT, MOCK_PRODUCTS)
+    assert result == {"status_code": 503, "error": "down"}
+
+def make_product(name, score):
+    return {
+        "product_name": name,
+        "infringement_score": score,
+        "infringement_likelihood": "High",
+        "relevant_claims": ["1"],
+        "explanation": "Test",
+        "specific_features": ["feature1"]
     }
-    mock_response.raise_for_status = Mock()
-
-    with patch('requests.post', return_value=mock_response):
-        result = analyzer_service.analyze_single_product(MOCK_PATENT, MOCK_PRODUCTS[0])
-        
-        assert result["status_code"] == 200
-        assert result["data"]["infringement_score"] == 85
-        assert result["data"]["infringement_likelihood"] == "High"
-
-def test_analyze_single_product_error(analyzer_service):
-    """Test analyze_single_product method with error"""
-    with patch('requests.post', side_effect=Exception("Test error")):
-        result = analyzer_service.analyze_single_product(MOCK_PATENT, MOCK_PRODUCTS[0])
-        
-        assert result["status_code"] == 500
-        assert "error" in result 
\ No newline at end of file
+
+@pytest.mark.asyncio
+async def test_truncated_response_is_salvaged_without_retry(analyzer_service):
+    """Test complete products are kept from a truncated generation instead of regenerating"""
+    text = json.dumps({"products": [make_product("Product 1", 85), make_product("Product 2", 45)]})
+    analyzer_service.client.generate = AsyncMock(return_value={"response": text[:-30], "eval_count": 200})
+
+    result = await analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS)
+
+    assert result["status_code"] == 200
+    assert [p["product_name"] for p in result["data"]] == ["Product 1"]
+    assert analyzer_service.client.generate.call_count == 1
+    assert analyzer_service.parse_metrics.stats()["salvaged"] == 1
+
+@pytest.mark.asyncio
+async def test_unparseable_response_retried_once_constrained(analyzer_service):
+    """Test output that cannot be salvaged is regenerated once with greedy decoding"""
+    good = json.dumps(make_product("Product 1", 85))
+    analyzer_service.client.generate = AsyncMock(side_effect=[
+        {"response": '{"product_name": "Product 1", "explanation": "cut', "eval_count": 300},
+        {"response": good, "eval_count": 80}
+    ])
+
+    result = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+
+    assert result["status_code"] == 200
+    retry_payload = analyzer_service.client.generate.call_args_list[1][0][0]
+    assert retry_payload["options"]["temperature"] == 0
+    stats = analyzer_service.parse_metrics.stats()
+    assert stats["retries"] == 1 and stats["retry_successes"] == 1
+    assert stats["wasted_tokens"] == 300
+
+@pytest.mark.asyncio
+async def test_unparseable_response_after_retry_is_an_error(analyzer_service):
+    """Test a second unusable generation is reported as a 502"""
+    analyzer_service.client.generate = AsyncMock(return_value={"response": "not json", "eval_count": 10})
+
+    result = await analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS)
+
+    assert result["status_code"] == 502
+    assert analyzer_service.client.generate.call_count == 2
+    assert analyzer_service.parse_metrics.stats()["wasted_tokens"] == 20
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_analyses_share_generation(analyzer_service):
+    """Test identical concurrent requests, in any product order, run one generation"""
+    text = json.dumps({"products": [make_product("Product 1", 85), make_product("Product 2", 45)]})
+
+    async def generate(payload, host=None):
+        await asyncio.sleep(0.05)
+        return {"response": text}
+
+    analyzer_service.client.generate = AsyncMock(side_effect=generate)
+    results = await asyncio.gather(
+        analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS, use_cache=False),
+        analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS[::-1], use_cache=False)
+    )
+
+    assert analyzer_service.client.generate.call_count == 1
+    assert results[0] == results[1]
+    assert analyzer_service.single_flight.stats()["coalesced"] == 1
+
+def test_prepared_patent_claims_are_reused(analyzer_service, tmp_path):
+    """Test prompts built after prepare_patent reuse its formatted claims and claim index"""
+    claims = analyzer_service.prepare_patent(MOCK_PATENT)
+
+    assert len(claims.claims) == 2
+    assert (tmp_path / "claim_index" / "US123.json").exists()
+    analyzer_service._create_multiple_products_prompt(MOCK_PATENT, MOCK_PRODUCTS)
+    assert analyzer_service.claim_formatter.stats()["misses"] == 1
+    assert analyzer_service.claim_formatter.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_prompt_without_room_for_claims_is_not_generated(analyzer_service):
+    """Test a context too small for any independent claim is a 413, not a claimless generation"""
+    analyzer_service.prompt_budgeter.output_reserve = analyzer_service.prompt_budgeter.context_limit
+    analyzer_service.client.generate = AsyncMock()
+
+    result = await analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS)
+
+    assert result["status_code"] == 413
+    analyzer_service.client.generate.assert_not_called()
+    assert analyzer_service.cache.get(analyzer_service._cache_key("multiple", MOCK_PATENT, MOCK_PRODUCTS)) is None
+
+@pytest.mark.asyncio
+async def test_changed_claim_settings_miss_the_cache(analyzer_service):
+    """Test results of prompts built with other claim selection settings are not reused"""
+    analyzer_service.client.generate = AsyncMock(return_value=SINGLE_BODY)
+    await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+
+    analyzer_service.claim_retriever.top_n = 2
+    await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+    analyzer_service.prompt_budgeter.output_reserve = 512
+    await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+
+    assert analyzer_service.client.generate.call_count == 3
@@ -0,0 +1,70 @@
+from unittest.mock import Mock
+from app.services.autocomplete import Autocomplete, PrefixIndex, normalize
+
+def make_autocomplete(fallback=None):
+    autocomplete = Autocomplete(fallback or Mock(return_value=[]))
+    autocomplete.build([
+        (0, ["Solar powered robotic lawnmower", "US-11950534-B1"], ["Solar powered robotic lawnmower"]),
+        (1, ["Robotic vacuum", "US-11950524-B2"], ["Robotic vacuum"]),
+        (2, ["Seeding system", "US-11950525-B2"], ["Seeding system"]),
+    ])
+    return autocomplete
+
+def test_normalize():
+    """Test case, punctuation and whitespace are folded"""
+    assert normalize("  US-11950534-B1 ") == "us 11950534 b1"
+    assert normalize("Wi-Fi  Router") == "wi fi router"
+
+def test_prefix_index_walks_matching_keys_in_order():
+    """Test only keys starting with the prefix are returned, shortest first, then alphabetically"""
+    index = PrefixIndex([("robot", 1), ("robotic", 0), ("seed", 2), ("rob", 3)])
+    index.add("roam", 4)
+    index.add("robe", 5)
+    assert [key for key, _ in index.search("ro")] == ["rob", "roam", "robe", "robot", "robotic"]
+    assert [key for key, _ in index.search("ro", max_length=4)] == ["rob", "roam", "robe"]
+    assert list(index.search("x")) == []
+    assert len(index) == 6
+
+def test_prefix_matches_best_first_and_records_once():
+    """Test prefix matches are sorted by confidence, names before tokens on ties"""
+    autocomplete = make_autocomplete()
+    assert autocomplete.suggest("robotic", threshold=0) == [(0, 100.0), (1, 100.0)]
+    assert autocomplete.suggest("robotic vacuum") == [(1, 100.0)]
+    assert autocomplete.suggest("se", threshold=0) == [(2, 28.6)]
+    assert autocomplete.suggest("so", threshold=0) == [(0, 40.0)]
+
+def test_prefix_matches_below_threshold_are_dropped():
+    """Test the threshold applies to prefix matches, not only the fallback"""
+    fallback = Mock(return_value=[])
+    autocomplete = make_autocomplete(fallback)
+    assert autocomplete.suggest("sol", threshold=5) == [(0, 60.0)]
+    assert autocomplete.suggest("sol", threshold=70) == []
+    fallback.assert_called_once_with("sol", 70, 5)
+
+def test_publication_number_prefix_with_or_without_dashes():
+    """Test publication numbers complete from a dashed or compact prefix"""
+    autocomplete = make_autocomplete()
+    assert [record for record, _ in autocomplete.suggest("US-1195052")] == [1, 2]
+    assert [record for record, _ in autocomplete.suggest("us1195053")] == [0]
+
+def test_fallback_only_without_prefix_matches():
+    """Test fuzzy scoring runs only when no key starts with the query"""
+    fallback = Mock(return_value=[(2, 72.0)])
+    autocomplete = make_autocomplete(fallback)
+
+    autocomplete.suggest("seedi")
+    fallback.assert_not_called()
+    assert autocomplete.suggest("seding", limit=3, threshold=60) == [(2, 72.0)]
+    fallback.assert_called_once_with("seding", 60, 3)
+
+def test_repeated_queries_are_cached():
+    """Test hot prefixes are answered from the LRU and adding a record clears it"""
+    fallback = Mock(return_value=[])
+    autocomplete = make_autocomplete(fallback)
+    autocomplete.suggest("zzz")
+    autocomplete.suggest("zzz")
+    assert fallback.call_count == 1
+    assert autocomplete.stats()["hits"] == 1
+
+    autocomplete.add(3, ["Zzz sleep aid"], ["Zzz sleep aid"])
+    assert autocomplete.suggest("zzz") == [(3, 100.0)]
@@ -0,0 +1,38 @@
+import threading
+from app.services.background_build import BackgroundBuild
+
+def test_value_is_built_once_in_background():
+    """Test get() answers None while building and the built value afterwards"""
+    release = threading.Event()
+    builds = []
+
+    def build():
+        builds.append(1)
+        release.wait(5)
+        return "index"
+
+    background = BackgroundBuild("test index", build)
+    assert background.get() is None
+    assert background.get() is None
+    assert background.stats()["building"]
+    release.set()
+    assert background.wait(5) == "index"
+    assert background.get() == "index"
+    assert len(builds) == 1
+    assert background.stats()["ready"]
+
+def test_failed_build_is_retried():
+    """Test a failed build is reported and started again on the next get()"""
+    attempts = []
+
+    def build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("corpus not loaded")
+        return "index"
+
+    background = BackgroundBuild("test index", build)
+    assert background.wait(5) is None
+    assert background.stats()["error"] == "corpus not loaded"
+    assert background.wait(5) == "index"
+    assert background.stats()["error"] is None
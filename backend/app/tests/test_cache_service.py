@@ -0,0 +1,85 @@
+import pytest
+import asyncio
+from app.services.cache_service import AnalysisCache, make_cache_key
+from unittest.mock import patch
+
+MOCK_RESULT = {"status_code": 200, "data": {"product_name": "Product 1"}}
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture to create an AnalysisCache backed by a temporary file"""
+    return AnalysisCache(tmp_path / "cache.json", ttl=60, max_entries=2)
+
+def test_get_and_set(cache):
+    """Test basic hit and miss behaviour"""
+    assert cache.get("a") is None
+    cache.set("a", MOCK_RESULT)
+    assert cache.get("a") == MOCK_RESULT
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_lru_eviction(cache):
+    """Test least recently used entry is evicted first"""
+    cache.set("a", MOCK_RESULT)
+    cache.set("b", MOCK_RESULT)
+    cache.get("a")
+    cache.set("c", MOCK_RESULT)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_expiry(cache):
+    """Test expired entries are treated as misses"""
+    with patch("app.services.cache_service.time.time", return_value=1000.0):
+        cache.set("a", MOCK_RESULT)
+    with patch("app.services.cache_service.time.time", return_value=1061.0):
+        assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_persistence(tmp_path):
+    """Test entries survive a reload from disk once flushed"""
+    cache = AnalysisCache(tmp_path / "cache.json")
+    cache.set("a", MOCK_RESULT)
+    assert not (tmp_path / "cache.json").exists()
+    cache.flush()
+    reloaded = AnalysisCache(tmp_path / "cache.json")
+    assert reloaded.get("a") == MOCK_RESULT
+
+    cache.flush()
+    assert cache.stats()["flushes"] == 1
+
+def test_write_through_without_flush_interval(tmp_path):
+    """Test a flush_interval of 0 writes every change immediately"""
+    AnalysisCache(tmp_path / "cache.json", flush_interval=0).set("a", MOCK_RESULT)
+    assert AnalysisCache(tmp_path / "cache.json").get("a") == MOCK_RESULT
+
+@pytest.mark.asyncio
+async def test_background_flush(tmp_path):
+    """Test changes are written by the background task and on stop"""
+    cache = AnalysisCache(tmp_path / "cache.json", flush_interval=0.01)
+    await cache.start()
+    cache.set("a", MOCK_RESULT)
+    await asyncio.sleep(0.1)
+    assert AnalysisCache(tmp_path / "cache.json").get("a") == MOCK_RESULT
+
+    cache.set("b", MOCK_RESULT)
+    await cache.stop()
+    assert AnalysisCache(tmp_path / "cache.json").get("b") == MOCK_RESULT
+    assert not cache.stats()["dirty"]
+
+def test_cache_key_normalization():
+    """Test product order and whitespace do not change the key"""
+    products = [
+        {"name": "Product 1", "description": "Test  product 1"},
+        {"name": "Product 2", "description": "Test product 2"}
+    ]
+    reordered = [
+        {"name": "Product 2", "description": "Test product 2"},
+        {"name": "Product 1", "description": "Test product 1 "}
+    ]
+    key = make_cache_key("multiple", "mistral", "1", "US123", products)
+    assert key == make_cache_key("multiple", "mistral", "1", "US123", reordered)
+    assert key != make_cache_key("multiple", "phi", "1", "US123", products)
+    assert key != make_cache_key("multiple", "mistral", "2", "US123", products)
+    assert key != make_cache_key("multiple", "mistral", "1", "US123", products, {"claim_top_n": 4})
@@ -0,0 +1,45 @@
+import pytest
+import json
+from app.services.claim_formatter import ClaimFormatter, estimate_tokens
+from app.services.patent_store import decode_claims, clean_claim_text
+
+CLAIMS = json.dumps([
+    {"num": "1", "text": "1. A method comprising a step."},
+    {"num": "2", "text": "2. The method of claim 1."}
+])
+
+@pytest.fixture
+def formatter():
+    """Fixture to create a small ClaimFormatter"""
+    return ClaimFormatter(max_entries=2)
+
+def test_format(formatter):
+    """Test claims are rendered with token counts"""
+    formatted = formatter.format("US123", CLAIMS)
+    assert formatted.text == (
+        "Claim 1: 1. A method comprising a step.\n\n"
+        "Claim 2: 2. The method of claim 1."
+    )
+    assert [c.num for c in formatted.claims] == ["1", "2"]
+    assert formatted.tokens == sum(c.tokens for c in formatted.claims)
+    assert all(c.tokens == estimate_tokens(c.text) for c in formatted.claims)
+
+def test_memoized_per_patent_and_content(formatter):
+    """Test repeated calls reuse the rendering until the content changes"""
+    first = formatter.format("US123", CLAIMS)
+    assert formatter.format("US123", CLAIMS) is first
+    assert formatter.format("US123", decode_claims(CLAIMS)) is not first
+    assert formatter.stats()["hits"] == 1
+    assert formatter.stats()["misses"] == 2
+
+def test_lru_bound(formatter):
+    """Test the memo never grows past max_entries"""
+    for i in range(5):
+        formatter.format(f"US{i}", CLAIMS)
+    assert formatter.stats()["size"] == 2
+
+def test_clean_claim_text():
+    """Test single-pass cleanup matches the sequential replacements"""
+    text = "a â\u0080\u009cquoteâ\u0080\u009d â\u0080\u0094 b â c"
+    assert clean_claim_text(text) == 'a "quote" - b - c'
+    assert clean_claim_text("plain") == "plain"
@@ -0,0 +1,70 @@
+import pytest
+import json
+from app.services.claim_formatter import render_claims
+from app.services.patent_store import decode_claims
+from app.services.claim_retriever import ClaimRetriever, is_independent, tokenize
+from app.services.prompt_budget import PromptBudgeter
+from app.services.token_estimator import TokenEstimator
+
+CLAIMS = render_claims(decode_claims(json.dumps([
+    {"num": "1", "text": "A method comprising generating a shopping list from a digital advertisement."},
+    {"num": "2", "text": "The method of claim 1, wherein the shopping list is shared with another user."},
+    {"num": "3", "text": "The method of claim 1, wherein the advertisement includes a vehicle suspension."},
+    {"num": "4", "text": "The method of claim 2, wherein the user receives a coupon by email."},
+    {"num": "5", "text": "A system comprising a processor and a hydraulic damper controller."}
+])))
+
+@pytest.fixture
+def retriever(tmp_path):
+    """Fixture to create a ClaimRetriever persisting to a temporary directory"""
+    return ClaimRetriever(tmp_path / "claim_index", top_n=1)
+
+def test_tokenize_drops_stopwords_and_short_terms():
+    """Test claim boilerplate does not contribute to scores"""
+    assert tokenize("The method of claim 1, wherein a list is shared") == ["method", "list", "shared"]
+
+def test_is_independent():
+    """Test claims referring back to another claim are dependent"""
+    assert [is_independent(c) for c in CLAIMS.claims] == [True, False, False, False, True]
+
+def test_rank_orders_by_bm25(retriever):
+    """Test claims sharing rare query terms rank first"""
+    ranked = retriever.rank("US1", CLAIMS, "hydraulic damper")
+    assert ranked[0].num == "5"
+
+def test_select_keeps_independent_and_top_dependent(retriever):
+    """Test independent claims are always kept and dependent claims are cut to top_n"""
+    selected = retriever.select("US1", CLAIMS, "shopping list shared with friends")
+    assert [c.num for c in selected] == ["1", "5", "2"]
+
+def test_select_disabled_returns_every_claim(tmp_path):
+    """Test a top_n of 0 keeps every claim"""
+    retriever = ClaimRetriever(tmp_path, top_n=0)
+    assert len(retriever.select("US1", CLAIMS, "coupon")) == len(CLAIMS.claims)
+
+def test_index_is_persisted_and_reused(retriever, tmp_path):
+    """Test the index is written once and loaded by a new retriever"""
+    retriever.rank("US1", CLAIMS, "coupon")
+    path = tmp_path / "claim_index" / "US1.json"
+    assert path.exists()
+
+    reloaded = ClaimRetriever(tmp_path / "claim_index", top_n=1)
+    index = reloaded.index_for("US1", CLAIMS)
+    assert index.term_freqs == retriever.index_for("US1", CLAIMS).term_freqs
+
+def test_index_rebuilt_when_claims_change(retriever):
+    """Test a stale persisted index is not used for changed claims"""
+    retriever.rank("US1", CLAIMS, "coupon")
+    changed = render_claims(decode_claims(json.dumps([{"num": "1", "text": "A bicycle bell."}])))
+    ranked = retriever.rank("US1", changed, "bell")
+    assert [c.num for c in ranked] == ["1"]
+
+def test_budgeter_uses_selected_claims_only(retriever):
+    """Test the prompt only contains the retrieved claims, in original order"""
+    budgeter = PromptBudgeter(context_limit=10000, output_reserve=0, estimator=TokenEstimator())
+    query = "shopping list shared with friends"
+    prompt = budgeter.fit("HEAD\n", CLAIMS, "\nTAIL", query, retriever.select("US1", CLAIMS, query))
+
+    assert "Claim 3:" not in prompt and "Claim 4:" not in prompt
+    assert prompt.index("Claim 1:") < prompt.index("Claim 2:") < prompt.index("Claim 5:")
+    assert "3 of 5 claims" in prompt
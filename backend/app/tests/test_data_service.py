@@ -51,4 +51,9 @@ def test_get_companies(data_service):
     """Test get_companies method"""
     companies = data_service.get_companies()
     assert len(companies) == 2
-    assert companies == MOCK_COMPANIES 
\ No newline at end of file
+    assert companies == MOCK_COMPANIES
+
+def test_get_claims(data_service):
+    """Test get_claims returns decoded claims only for known patents"""
+    assert data_service.get_claims("US123") == []
+    assert data_service.get_claims("NONEXISTENT") is None
@@ -0,0 +1,101 @@
+import pytest
+import asyncio
+import httpx
+from app.services.endpoint_pool import EndpointPool
+from app.services.fake_llm import FakeLLM
+from app.services.llm_client import OllamaClient
+
+class HostRoutingTransport(httpx.AsyncBaseTransport):
+    """Dispatch requests to a separate fake LLM app per host"""
+
+    def __init__(self, fakes):
+        self.transports = {host: httpx.ASGITransport(app=fake.app()) for host, fake in fakes.items()}
+
+    async def handle_async_request(self, request):
+        return await self.transports[request.url.host].handle_async_request(request)
+
+def make_pool(fakes, **kwargs):
+    """Create an EndpointPool over one fake LLM per host"""
+    client = OllamaClient("http://gpu1", transport=HostRoutingTransport(fakes), max_concurrency_per_host=8)
+    return EndpointPool(client, [f"http://{host}" for host in fakes], **kwargs)
+
+PAYLOAD = {"model": "fake", "prompt": "Name: Widget", "stream": False}
+
+@pytest.mark.asyncio
+async def test_least_outstanding_spreads_load():
+    """Test concurrent requests are spread evenly across hosts"""
+    fakes = {"gpu1": FakeLLM(latency=0.02), "gpu2": FakeLLM(latency=0.02)}
+    pool = make_pool(fakes)
+    await asyncio.gather(*[pool.generate(PAYLOAD) for _ in range(6)])
+    assert [fake.requests for fake in fakes.values()] == [3, 3]
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_failed_host_is_ejected_and_request_retried():
+    """Test a failing host is ejected and the request succeeds on another host"""
+    fakes = {"gpu1": FakeLLM(), "gpu2": FakeLLM()}
+    fakes["gpu1"].available = False
+    pool = make_pool(fakes)
+
+    body = await pool.generate(PAYLOAD)
+    assert body["done"] is True
+    gpu1, gpu2 = pool.stats()
+    assert gpu1["failures"] == 1 and gpu1["ejected"] is True
+    assert gpu2["retries"] == 1
+
+    await asyncio.gather(*[pool.generate(PAYLOAD) for _ in range(3)])
+    assert fakes["gpu1"].requests == 0
+    assert fakes["gpu2"].requests == 4
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_error_raised_when_all_hosts_fail():
+    """Test the error surfaces after one retry when every host is down"""
+    fakes = {"gpu1": FakeLLM(), "gpu2": FakeLLM()}
+    for fake in fakes.values():
+        fake.available = False
+    pool = make_pool(fakes)
+    with pytest.raises(httpx.HTTPStatusError):
+        await pool.generate(PAYLOAD)
+    assert sum(e["failures"] for e in pool.stats()) == 2
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_health_check_marks_and_readmits_hosts():
+    """Test /api/tags probes update host health and clear ejection on recovery"""
+    fakes = {"gpu1": FakeLLM(), "gpu2": FakeLLM()}
+    pool = make_pool(fakes)
+    fakes["gpu1"].available = False
+    await pool.check_health()
+    assert [e["healthy"] for e in pool.stats()] == [False, True]
+    assert pool.pick().host == "http://gpu2"
+
+    fakes["gpu1"].available = True
+    await pool.check_health()
+    assert all(e["healthy"] and not e["ejected"] for e in pool.stats())
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_tokens_per_second_prefers_faster_host():
+    """Test the tokens_per_second strategy routes to the host that generates faster"""
+    fakes = {"gpu1": FakeLLM(tokens_per_second=500), "gpu2": FakeLLM(tokens_per_second=5000)}
+    pool = make_pool(fakes, strategy="tokens_per_second")
+    await pool.generate(PAYLOAD)
+    await pool.generate(PAYLOAD)
+    for _ in range(4):
+        await pool.generate(PAYLOAD)
+    assert fakes["gpu2"].requests > fakes["gpu1"].requests
+    assert pool.stats()[1]["tokens_per_second"] > pool.stats()[0]["tokens_per_second"]
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_stream_retried_before_first_chunk():
+    """Test a stream that fails before any token is retried on another host"""
+    fakes = {"gpu1": FakeLLM(), "gpu2": FakeLLM()}
+    fakes["gpu1"].available = False
+    pool = make_pool(fakes)
+    chunks = [c async for c in pool.generate_stream({"prompt": "Name: Widget"})]
+    assert chunks[-1]["done"] is True
+    assert [e["outstanding"] for e in pool.stats()] == [0, 0]
+    assert pool.stats()[1]["retries"] == 1
+    await pool.aclose()
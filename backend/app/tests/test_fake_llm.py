@@ -0,0 +1,101 @@
+import pytest
+import json
+import time
+import httpx
+from app.services.analyzer_service import AnalyzerService, InfringementAnalysis
+from app.services.cache_service import AnalysisCache
+from app.services.claim_retriever import ClaimRetriever
+from app.services.fake_llm import FakeLLM
+from app.services.llm_client import OllamaClient, OpenAICompatibleClient
+
+MOCK_PATENT = {
+    "publication_number": "US123",
+    "title": "Test Patent",
+    "abstract": "Test Abstract",
+    "claims": json.dumps([{"num": 1, "text": "Test claim 1"}])
+}
+
+MOCK_PRODUCTS = [
+    {"name": "Product 1", "description": "Test product 1"},
+    {"name": "Product 2", "description": "Test product 2"},
+    {"name": "Product 3", "description": "Test product 3"}
+]
+
+def fake_client(fake, cls=OllamaClient):
+    """Create a client talking to the fake server in-process"""
+    return cls("http://fake-llm", transport=httpx.ASGITransport(app=fake.app()))
+
+@pytest.fixture
+def analyzer_service(tmp_path):
+    """Fixture to create an AnalyzerService backed by the fake LLM"""
+    return AnalyzerService(
+        cache=AnalysisCache(tmp_path / "cache.json"),
+        claim_retriever=ClaimRetriever(tmp_path / "claim_index"),
+        client=fake_client(FakeLLM())
+    )
+
+def test_responses_are_deterministic_and_valid():
+    """Test the same prompt always gets the same schema-valid answer"""
+    fake = FakeLLM()
+    prompt = "Name: Widget\nDescription: A widget"
+    first = fake.respond(prompt, InfringementAnalysis.model_json_schema())
+    assert first == fake.respond(prompt, None)
+    analysis = InfringementAnalysis.model_validate_json(first)
+    assert analysis.product_name == "Widget"
+
+@pytest.mark.asyncio
+async def test_single_product_analysis_end_to_end(analyzer_service):
+    """Test a single-product analysis runs through the fake server"""
+    result = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+    assert result["status_code"] == 200
+    assert result["data"]["product_name"] == "Product 1"
+    await analyzer_service.client.aclose()
+
+@pytest.mark.asyncio
+async def test_multiple_products_analysis_end_to_end(analyzer_service):
+    """Test the multi-product schema gets one analysis per product in the prompt"""
+    result = await analyzer_service.analyze_multiple_products_async(MOCK_PATENT, MOCK_PRODUCTS)
+    assert result["status_code"] == 200
+    assert len(result["data"]) == 2
+    assert {p["product_name"] for p in result["data"]} <= {p["name"] for p in MOCK_PRODUCTS}
+    await analyzer_service.client.aclose()
+
+@pytest.mark.asyncio
+async def test_streaming_end_to_end(analyzer_service):
+    """Test streamed tokens reassemble into the final result"""
+    events = [e async for e in analyzer_service.stream_single_product(MOCK_PATENT, MOCK_PRODUCTS[0])]
+    tokens = "".join(e["data"] for e in events if e["event"] == "token")
+    assert json.loads(tokens)["product_name"] == "Product 1"
+    assert events[-1]["event"] == "result"
+    await analyzer_service.client.aclose()
+
+@pytest.mark.asyncio
+async def test_openai_endpoint():
+    """Test the OpenAI-compatible endpoint through the OpenAI client"""
+    client = fake_client(FakeLLM(), OpenAICompatibleClient)
+    body = await client.generate({"prompt": "Name: Widget", "format": {"type": "object"}})
+    assert json.loads(body["response"])["product_name"] == "Widget"
+    chunks = [c async for c in client.generate_stream({"prompt": "Name: Widget"})]
+    assert "".join(c["response"] for c in chunks) == body["response"]
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_simulated_latency():
+    """Test fixed latency and token rate delay the response"""
+    fake = FakeLLM(latency=0.05, tokens_per_second=2000)
+    client = fake_client(fake)
+    start = time.perf_counter()
+    body = await client.generate({"prompt": "Name: Widget", "stream": False})
+    elapsed = time.perf_counter() - start
+    assert elapsed >= 0.05 + body["eval_count"] / 2000
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_generations_recorded_in_metrics(analyzer_service):
+    """Test the analyzer records each generation's timing breakdown, streamed or not"""
+    await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+    [e async for e in analyzer_service.stream_single_product(MOCK_PATENT, MOCK_PRODUCTS[1])]
+    stats = analyzer_service.llm_metrics.stats()
+    assert stats["generations"] == 2
+    assert stats["generated_tokens"] > 0
+    await analyzer_service.client.aclose()
@@ -0,0 +1,102 @@
+import json
+import pytest
+from unittest.mock import Mock
+from app.services.fulltext_index import FullTextIndex, parse_query, patent_documents
+
+DOCUMENTS = [
+    ("US1", {
+        "title": "Robotic lawnmower",
+        "abstract": "A robotic lawnmower with a rotating cutting blade.",
+        "claims": "A lawnmower comprising a cutting blade and a battery.",
+        "description": "The mower returns to a charging station."
+    }),
+    ("US2", {
+        "title": "Battery charging station",
+        "abstract": "A station for charging a battery of a robotic vehicle.",
+        "claims": "A charging station comprising a battery contact.",
+        "description": "The lawnmower docks at the station overnight."
+    }),
+    ("US3", {
+        "title": "Kitchen blender",
+        "abstract": "A blender with a cutting blade driven by a motor.",
+        "claims": "A blender comprising a blade.",
+        "description": "Blade guards protect the user."
+    }),
+]
+
+@pytest.fixture
+def index(tmp_path):
+    """Fixture to create a FullTextIndex holding DOCUMENTS, persisted to a temporary directory"""
+    index = FullTextIndex(tmp_path / "fulltext_index", max_segments=2)
+    index.sync(DOCUMENTS)
+    return index
+
+def ids(results):
+    return [key for key, _ in results[1]]
+
+def test_parse_query_splits_phrases():
+    """Test quoted phrases are kept together and tokenized like documents"""
+    assert parse_query('battery "the Cutting blade" station') == (["battery", "station"], [["cutting", "blade"]])
+
+def test_search_ranks_by_bm25_with_field_boosts(index):
+    """Test a title match outranks matches in the description"""
+    assert ids(index.search("lawnmower")) == ["US1", "US2"]
+    assert ids(index.search("charging station"))[0] == "US2"
+
+def test_search_counts_all_matches_and_limits(index):
+    """Test total counts every match while only limit results are returned"""
+    total, results = index.search("blade", limit=1)
+    assert total == 2
+    assert len(results) == 1
+
+def test_phrase_requires_adjacent_terms(index):
+    """Test a phrase only matches its terms in order and next to each other"""
+    assert ids(index.search('"cutting blade"')) == ["US1", "US3"]
+    assert ids(index.search('"blade cutting"')) == []
+    assert ids(index.search('"robotic lawnmower" blade')) == ["US1"]
+
+def test_search_restricted_to_fields(index):
+    """Test only the requested fields are searched"""
+    assert ids(index.search("lawnmower", fields=["description"])) == ["US2"]
+
+def test_index_is_persisted_and_reloaded(index, tmp_path):
+    """Test a new index on the same directory answers identically without reindexing"""
+    reloaded = FullTextIndex(tmp_path / "fulltext_index", max_segments=2)
+    assert reloaded.search('"cutting blade" battery') == index.search('"cutting blade" battery')
+    assert reloaded.sync(DOCUMENTS) == {"added": 0, "updated": 0, "deleted": 0}
+
+def test_sync_only_indexes_changes(index):
+    """Test changed documents are replaced and missing ones deleted"""
+    changed = [
+        ("US1", dict(DOCUMENTS[0][1], title="Robotic snow plough")),
+        DOCUMENTS[1],
+        ("US4", {"title": "Snow blower", "abstract": "", "claims": "", "description": ""}),
+    ]
+    assert index.sync(changed) == {"added": 1, "updated": 1, "deleted": 1}
+    assert ids(index.search("snow")) == ["US4", "US1"]
+    assert ids(index.search("blender")) == []
+    assert len(index) == 3
+
+def test_segments_are_merged(index, tmp_path):
+    """Test segments beyond max_segments are merged without changing results"""
+    before = index.search('"cutting blade" station')
+    index.sync([("US5", {"title": "Garden hose"})], delete_missing=False)
+    index.sync([("US6", {"title": "Garden shears"})], delete_missing=False)
+    assert index.stats()["segments"] == 1
+    assert ids(index.search("garden")) == ["US5", "US6"]
+    assert ids(index.search('"cutting blade" station')) == [key for key, _ in before[1]]
+    assert len(list((tmp_path / "fulltext_index").glob("segment-*.npz"))) == 1
+
+def test_patent_documents_decode_claims_without_the_data_service():
+    """Test indexing reads claims from the raw record, leaving the claims cache alone"""
+    data_service = Mock()
+    data_service.get_patents.return_value = [{
+        "publication_number": "US1",
+        "title": "Robotic lawnmower",
+        "claims": json.dumps([{"num": 1, "text": "A lawnmower comprising a blade."}])
+    }]
+    documents = list(patent_documents(data_service))
+    assert documents[0][0] == "US1"
+    assert documents[0][1]["claims"] == "A lawnmower comprising a blade."
+    assert documents[0][1]["description"] == ""
+    data_service.get_claims.assert_not_called()
@@ -135,4 +135,58 @@ class TestFuzzyMatcher:
         assert len(results) > 1
         # Verify results are sorted by confidence
         confidences = [r["confidence"] for r in results]
-        assert confidences == sorted(confidences, reverse=True) 
\ No newline at end of file
+        assert confidences == sorted(confidences, reverse=True) 
+
+    def test_added_patent_is_searchable(self, matcher):
+        """Test patents added after construction are matched without a rebuild"""
+        matcher.add_patent({"publication_number": "US-12346-A1", "title": "Added Patent"})
+        results = matcher.find_patent("US-12346-A1")
+        assert results[0]["patent"]["title"] == "Added Patent"
+        assert results[0]["is_exact"] == True
+
+    def test_ties_keep_patent_order(self, matcher):
+        """Test patents with the same confidence are listed in data order"""
+        results = matcher.find_patent("-A1")
+        assert [r["patent"]["publication_number"] for r in results] == ["US-12345-A1", "EP-11111-A1"]
+
+    def test_duplicate_titles_map_to_their_own_patents(self, mock_data_service):
+        """Test patents sharing a title are all returned, not the first one twice"""
+        patents = mock_data_service.get_patents.return_value
+        patents.append({"publication_number": "US-22222-B1", "title": "Test Patent 1", "abstract": ""})
+        matcher = FuzzyMatcher(mock_data_service)
+        results = matcher.find_patent_by_title("Test Patent 1")
+        exact = [r["patent"]["publication_number"] for r in results if r["is_exact"]]
+        assert exact == ["US-12345-A1", "US-22222-B1"]
+
+    def test_patent_without_title_is_searchable(self, mock_data_service):
+        """Test records without a title are indexed by publication number"""
+        mock_data_service.get_patents.return_value.append({"publication_number": "US-33333-B1"})
+        matcher = FuzzyMatcher(mock_data_service)
+        assert matcher.find_patent("US-33333-B1")[0]["is_exact"] == True
+        assert all(r["patent"].get("title") for r in matcher.find_patent_by_title("Test Patent"))
+
+    def test_batch_company_search_matches_single(self, matcher):
+        """Test batch company search returns what each single search returns"""
+        queries = ["apple inc", "Microsoft Corp", "nothing like it"]
+        assert matcher.find_companies(queries, threshold=60) == [
+            matcher.find_company(query, threshold=60) for query in queries
+        ]
+
+    def test_batch_title_search_matches_single(self, matcher):
+        """Test batch title search returns what each single search returns"""
+        queries = ["Test", "Different Patent", "xyz"]
+        assert matcher.find_patents_by_title(queries, threshold=50) == [
+            matcher.find_patent_by_title(query, threshold=50) for query in queries
+        ]
+
+    def test_suggest_patents_by_prefix(self, matcher):
+        """Test title and publication number prefixes complete to patents"""
+        assert [m["patent"]["publication_number"] for m in matcher.suggest_patents("test pat")] == [
+            "US-12345-A1", "US-67890-B2"
+        ]
+        assert matcher.suggest_patents("EP-1111")[0]["patent"]["title"] == "Different Patent"
+
+    def test_suggest_falls_back_to_fuzzy(self, matcher):
+        """Test a misspelled company name is still suggested"""
+        results = matcher.suggest_companies("Microsfot", threshold=60)
+        assert results[0]["company"]["name"] == "Microsoft Corporation"
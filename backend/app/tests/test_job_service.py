@@ -0,0 +1,95 @@
+import pytest
+import asyncio
+from app.services.job_service import JobQueue, QueueFullError
+
+PAYLOAD = {"patent_id": "US123", "company_name": "Company A"}
+
+async def wait_for(job_queue, job_id, status):
+    """Poll until the job reaches the given status"""
+    for _ in range(100):
+        if job_queue.get(job_id)["status"] == status:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached {status}")
+
+@pytest.mark.asyncio
+async def test_job_runs_to_completion(tmp_path):
+    """Test a submitted job is picked up by a worker and stores its result"""
+    async def handler(payload, progress):
+        progress(0.5)
+        return {"status_code": 200, "data": {"patent_id": payload["patent_id"]}}
+
+    job_queue = JobQueue(handler, tmp_path / "jobs.json", workers=1)
+    await job_queue.start()
+    job = job_queue.submit(PAYLOAD, "key")
+    await wait_for(job_queue, job["id"], "completed")
+
+    stored = job_queue.get(job["id"])
+    assert stored["result"] == {"patent_id": "US123"}
+    assert stored["progress"] == 1.0
+    assert job_queue.stats()["completed"] == 1
+    await job_queue.stop()
+
+@pytest.mark.asyncio
+async def test_failed_job(tmp_path):
+    """Test handler errors mark the job as failed"""
+    async def handler(payload, progress):
+        return {"status_code": 404, "error": "Patent not found"}
+
+    job_queue = JobQueue(handler, tmp_path / "jobs.json", workers=1)
+    await job_queue.start()
+    job = job_queue.submit(PAYLOAD, "key")
+    await wait_for(job_queue, job["id"], "failed")
+
+    assert job_queue.get(job["id"])["status_code"] == 404
+    await job_queue.stop()
+
+@pytest.mark.asyncio
+async def test_duplicate_jobs_are_coalesced(tmp_path):
+    """Test identical in-flight submissions share one job"""
+    release = asyncio.Event()
+    calls = 0
+
+    async def handler(payload, progress):
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"status_code": 200, "data": {}}
+
+    job_queue = JobQueue(handler, tmp_path / "jobs.json", workers=2)
+    await job_queue.start()
+    first = job_queue.submit(PAYLOAD, "key")
+    second = job_queue.submit(PAYLOAD, "key")
+    assert second["id"] == first["id"]
+    assert second["coalesced"] is True
+
+    release.set()
+    await wait_for(job_queue, first["id"], "completed")
+    assert calls == 1
+    assert job_queue.stats()["coalesced"] == 1
+    await job_queue.stop()
+
+@pytest.mark.asyncio
+async def test_queue_full(tmp_path):
+    """Test submissions beyond the queue size are rejected"""
+    async def handler(payload, progress):
+        return {"status_code": 200, "data": {}}
+
+    job_queue = JobQueue(handler, tmp_path / "jobs.json", max_queue_size=1)
+    job_queue.submit(PAYLOAD, "a")
+    with pytest.raises(QueueFullError):
+        job_queue.submit(PAYLOAD, "b")
+
+@pytest.mark.asyncio
+async def test_unfinished_jobs_survive_restart(tmp_path):
+    """Test queued jobs are persisted and resumed by a new queue"""
+    async def handler(payload, progress):
+        return {"status_code": 200, "data": {"resumed": True}}
+
+    job = JobQueue(handler, tmp_path / "jobs.json").submit(PAYLOAD, "key")
+
+    restarted = JobQueue(handler, tmp_path / "jobs.json", workers=1)
+    await restarted.start()
+    await wait_for(restarted, job["id"], "completed")
+    assert restarted.get(job["id"])["result"] == {"resumed": True}
+    await restarted.stop()
@@ -0,0 +1,121 @@
+import pytest
+import asyncio
+import json
+import httpx
+from app.services.llm_client import LLMClient, OllamaClient, OpenAICompatibleClient, create_llm_client
+
+def make_client(handler, **kwargs):
+    """Create an OllamaClient backed by a mock transport"""
+    return OllamaClient(
+        "http://ollama:11434",
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    )
+
+@pytest.mark.asyncio
+async def test_generate():
+    """Test generate posts to /api/generate and returns the JSON body"""
+    def handler(request):
+        assert request.url.path == "/api/generate"
+        return httpx.Response(200, json={"response": "{}"})
+
+    client = make_client(handler)
+    body = await client.generate({"model": "mistral", "prompt": "hi"})
+    assert body == {"response": "{}"}
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_generate_http_error():
+    """Test HTTP errors are raised to the caller"""
+    client = make_client(lambda request: httpx.Response(500))
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.generate({"model": "mistral", "prompt": "hi"})
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_per_host_concurrency_limit():
+    """Test no more than max_concurrency_per_host requests run at once"""
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={"response": "{}"})
+
+    client = make_client(handler, max_concurrency_per_host=2)
+    await asyncio.gather(*[client.generate({"prompt": str(i)}) for i in range(6)])
+    assert peak == 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_openai_compatible_generate_translates_payload():
+    """Test the OpenAI client sends a chat completion and returns an Ollama-shaped body"""
+    def handler(request):
+        assert request.url.path == "/v1/chat/completions"
+        assert request.headers["Authorization"] == "Bearer secret"
+        body = json.loads(request.content)
+        assert body["messages"] == [{"role": "user", "content": "hi"}]
+        assert body["max_tokens"] == 64
+        assert body["response_format"]["json_schema"]["schema"] == {"type": "object"}
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "{}"}}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 1}
+        })
+
+    client = OpenAICompatibleClient("http://vllm:8000", api_key="secret", transport=httpx.MockTransport(handler))
+    body = await client.generate({
+        "model": "mistral",
+        "prompt": "hi",
+        "format": {"type": "object"},
+        "options": {"num_predict": 64}
+    })
+    assert body["response"] == "{}"
+    assert body["prompt_eval_count"] == 3
+    assert body["eval_count"] == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_openai_compatible_stream_parses_server_sent_events():
+    """Test SSE deltas are yielded as Ollama-shaped chunks"""
+    def handler(request):
+        events = "".join(
+            f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n"
+            for token in ['{"a"', ': 1}']
+        ) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=events)
+
+    client = OpenAICompatibleClient("http://vllm:8000", transport=httpx.MockTransport(handler))
+    chunks = [chunk async for chunk in client.generate_stream({"prompt": "hi"})]
+    assert "".join(c["response"] for c in chunks) == '{"a": 1}'
+    assert chunks[-1]["done"] is True
+    await client.aclose()
+
+def test_create_llm_client_selects_backend(monkeypatch):
+    """Test LLM_BACKEND picks the client implementation behind the endpoint pool"""
+    monkeypatch.setenv("LLM_BACKEND", "openai")
+    assert isinstance(create_llm_client("http://vllm:8000", 10.0).client, OpenAICompatibleClient)
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    assert isinstance(create_llm_client("http://ollama:11434", 10.0).client, OllamaClient)
+    monkeypatch.setenv("LLM_BACKEND", "nope")
+    with pytest.raises(ValueError):
+        create_llm_client("http://ollama:11434", 10.0)
+
+def test_create_llm_client_reads_hosts(monkeypatch):
+    """Test OLLAMA_HOSTS configures one endpoint per host"""
+    monkeypatch.setenv("LLM_BACKEND", "ollama")
+    monkeypatch.setenv("OLLAMA_HOSTS", "http://gpu1:11434, http://gpu2:11434/")
+    pool = create_llm_client("http://ollama:11434", 10.0)
+    assert [e.host for e in pool.endpoints] == ["http://gpu1:11434", "http://gpu2:11434"]
+
+def test_incomplete_backend_cannot_be_created():
+    """Test a backend missing generate_stream fails at construction"""
+    class Incomplete(LLMClient):
+        async def generate(self, payload, host=None):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incomplete("http://ollama:11434")
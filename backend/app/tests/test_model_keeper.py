@@ -0,0 +1,79 @@
+import pytest
+import time
+import httpx
+from app.services.endpoint_pool import EndpointPool
+from app.services.fake_llm import FakeLLM, keep_alive_seconds
+from app.services.llm_client import OllamaClient, OpenAICompatibleClient
+from app.services.llm_metrics import LLMMetrics
+from app.services.model_keeper import ModelKeeper
+
+def make_client(fake, cls=OllamaClient):
+    """Create a client talking to the fake server in-process"""
+    return cls("http://fake-llm", transport=httpx.ASGITransport(app=fake.app()))
+
+def test_keep_alive_seconds():
+    """Test Ollama keep_alive durations are parsed like Ollama does"""
+    assert keep_alive_seconds("30m") == 1800
+    assert keep_alive_seconds("1h") == 3600
+    assert keep_alive_seconds(600) == 600
+    assert keep_alive_seconds(-1) == float("inf")
+    assert keep_alive_seconds(None) == 300
+
+def test_metrics_split_phases():
+    """Test load, prompt eval and generation time are aggregated separately"""
+    metrics = LLMMetrics(cold_load_seconds=1.0)
+    metrics.record({"load_duration": 2e9, "prompt_eval_duration": 1e9, "eval_duration": 4e9,
+                    "prompt_eval_count": 500, "eval_count": 100})
+    metrics.record({"load_duration": 1e7, "prompt_eval_duration": 1e9, "eval_duration": 4e9,
+                    "prompt_eval_count": 500, "eval_count": 100})
+
+    stats = metrics.stats()
+    assert stats["generations"] == 2
+    assert stats["cold_loads"] == 1
+    assert stats["phases"]["load"]["max_seconds"] == 2.0
+    assert stats["phases"]["prompt_eval"]["mean_seconds"] == 1.0
+    assert stats["generated_tokens_per_second"] == 25.0
+
+@pytest.mark.asyncio
+async def test_warm_loads_model_on_every_host():
+    """Test warm() sends an empty-prompt generate with keep_alive to each endpoint"""
+    fake = FakeLLM(load_seconds=0.02)
+    pool = EndpointPool(make_client(fake), ["http://fake-llm", "http://fake-llm-2"])
+    keeper = ModelKeeper(pool, "fake", keep_alive="10m")
+
+    results = await keeper.warm()
+    assert set(results) == {"http://fake-llm", "http://fake-llm-2"}
+    assert fake.requests == 2
+    assert keeper.warmups == 2
+    assert fake.loaded_until > time.monotonic() + 500
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_warm_model_skips_load_penalty():
+    """Test a request after warm-up reports no load time"""
+    fake = FakeLLM(load_seconds=0.05)
+    client = make_client(fake)
+    keeper = ModelKeeper(client, "fake")
+    await keeper.warm()
+    assert keeper.last_load_seconds == pytest.approx(0.05, abs=0.01)
+
+    body = await client.generate({"prompt": "Name: Widget", "stream": False, "keep_alive": "30m"})
+    assert body["load_duration"] == 0
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_refresh_only_while_traffic_expected():
+    """Test residency is only refreshed after recent generations"""
+    metrics = LLMMetrics()
+    keeper = ModelKeeper(make_client(FakeLLM()), "fake", active_window=60, metrics=metrics)
+    assert keeper.traffic_expected() is False
+    metrics.record({"eval_count": 1})
+    assert keeper.traffic_expected() is True
+
+@pytest.mark.asyncio
+async def test_keeper_disabled_for_openai_backend():
+    """Test backends without keep_alive are not preloaded"""
+    keeper = ModelKeeper(make_client(FakeLLM(), OpenAICompatibleClient), "fake")
+    await keeper.start()
+    assert keeper.stats()["enabled"] is False
+    assert keeper.stats()["running"] is False
@@ -0,0 +1,50 @@
+import random
+from rapidfuzz import fuzz
+from app.services.ngram_index import NGramIndex
+
+def random_ids(count, seed=0):
+    rng = random.Random(seed)
+    ids = [
+        f"{rng.choice(['US', 'EP'])}-{rng.randint(10**6, 2 * 10**7)}-{rng.choice(['A1', 'B2'])}"
+        for _ in range(count)
+    ]
+    return ids + ["", "A", "US"]
+
+def test_substring_matches_are_exact():
+    """Test substring lookups agree with a scan, including queries shorter than n"""
+    ids = random_ids(500)
+    index = NGramIndex()
+    for text in ids:
+        index.add(text)
+
+    for query in ["US-1", "-B2", "12", "7", "US", "", "ZZZ", ids[5], ids[7][3:9]]:
+        assert index.substring_matches(query) == [i for i, text in enumerate(ids) if query in text]
+
+def test_ratio_matches_are_exact():
+    """Test the length and n-gram filters never drop a string reaching the threshold"""
+    ids = random_ids(500, seed=1)
+    index = NGramIndex()
+    for text in ids:
+        index.add(text)
+    rng = random.Random(2)
+
+    for _ in range(200):
+        query = list(rng.choice(ids))
+        for _ in range(rng.randint(0, 3)):
+            if query:
+                query[rng.randrange(len(query))] = rng.choice("0123456789")
+        query = "".join(query)[:rng.randint(1, 15)]
+        threshold = rng.choice([0, 50, 70, 80, 90, 100])
+        expected = {
+            i: fuzz.ratio(query, text) for i, text in enumerate(ids)
+            if fuzz.ratio(query, text) >= threshold
+        }
+        assert index.ratio_matches(query, threshold) == expected
+
+def test_add_keeps_positions():
+    """Test strings added later are found at their positions"""
+    index = NGramIndex()
+    index.add("US-11950524-B2")
+    assert index.add("US-11950525-B2") == 1
+    assert index.substring_matches("525") == [1]
+    assert set(index.ratio_matches("US-11950526-B2", 80)) == {0, 1}
@@ -0,0 +1,69 @@
+import pytest
+import json
+from app.services.patent_corpus import PatentCorpus, write_corpus, main
+from app.services.data_service import DataService
+
+MOCK_PATENTS = [
+    {
+        "id": 1,
+        "publication_number": "US123",
+        "title": "Test Patent 1",
+        "assignee": "Company A",
+        "abstract": "First test patent",
+        "claims": json.dumps([{"num": "1", "text": "A method."}]),
+        "attachment_urls": None
+    },
+    {
+        "id": 2,
+        "publication_number": "US456",
+        "title": "Test Patent 2 – unicode",
+        "assignee": "Company B",
+        "abstract": "Second test patent"
+    }
+]
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Fixture to write and open a corpus file"""
+    write_corpus(MOCK_PATENTS, tmp_path / "patents.corpus")
+    corpus = PatentCorpus(tmp_path / "patents.corpus")
+    yield corpus
+    corpus.close()
+
+def test_round_trip(corpus):
+    """Test every record reads back identical to its source"""
+    assert len(corpus) == 2
+    assert [dict(p) for p in corpus.patents()] == MOCK_PATENTS
+
+def test_lazy_field_access(corpus):
+    """Test header fields and heavy fields are both addressable"""
+    patent = corpus.patents()[1]
+    assert patent["title"] == "Test Patent 2 – unicode"
+    assert patent["abstract"] == "Second test patent"
+    assert patent.get("claims") is None
+    with pytest.raises(KeyError):
+        patent["claims"]
+
+def test_rejects_other_files(tmp_path):
+    """Test opening a non-corpus file fails"""
+    path = tmp_path / "patents.json"
+    path.write_text(json.dumps(MOCK_PATENTS))
+    with pytest.raises(ValueError):
+        PatentCorpus(path)
+
+def test_data_service_uses_corpus(tmp_path, monkeypatch):
+    """Test DataService serves patents and lazily decoded claims from the corpus"""
+    main([str(write_json(tmp_path)), str(tmp_path / "patents.corpus")])
+    (tmp_path / "company_products.json").write_text(json.dumps({"companies": []}))
+    monkeypatch.setenv("PATENT_CORPUS_PATH", str(tmp_path / "patents.corpus"))
+
+    service = DataService(tmp_path)
+    assert service.get_patent("US123")["abstract"] == "First test patent"
+    assert [c.text for c in service.get_claims("US123")] == ["A method."]
+    assert service.get_claims("US456") == []
+
+def write_json(tmp_path):
+    """Write the mock patents as a JSON data file"""
+    path = tmp_path / "patents.json"
+    path.write_text(json.dumps(MOCK_PATENTS))
+    return path
@@ -0,0 +1,46 @@
+import pytest
+import json
+from app.services.patent_store import PatentStore, decode_claims
+
+MOCK_PATENTS = [
+    {
+        "publication_number": "US123",
+        "title": "Test Patent 1",
+        "claims": json.dumps([
+            {"num": "00001", "text": "1. A method â\u0080\u009cquotedâ\u0080\u009d."},
+            {"num": 2, "text": "2. The method of claim 1."}
+        ])
+    },
+    {"publication_number": "US456", "title": "Test Patent 2"}
+]
+
+@pytest.fixture
+def store():
+    """Fixture to create a PatentStore with mock patents"""
+    return PatentStore(MOCK_PATENTS)
+
+def test_get(store):
+    """Test O(1) lookup by publication number"""
+    assert store.get("US456")["title"] == "Test Patent 2"
+    assert store.get("NONEXISTENT") is None
+    assert len(store) == 2
+
+def test_claims_decoded_once(store):
+    """Test claims are decoded into Claim objects with cleaned text"""
+    claims = store.get_claims("US123")
+    assert [c.num for c in claims] == ["00001", "2"]
+    assert claims[0].text == '1. A method "quoted".'
+    assert store.get_claims("US456") == []
+    assert store.get_claims("NONEXISTENT") is None
+
+def test_add_replaces_existing(store):
+    """Test adding an existing publication number replaces it in place"""
+    store.add({"publication_number": "US123", "title": "Updated", "claims": "[]"})
+    assert store.get("US123")["title"] == "Updated"
+    assert store.get_claims("US123") == []
+    assert len(store) == 2
+
+def test_decode_invalid_claims():
+    """Test non-list claims data is rejected"""
+    with pytest.raises(ValueError):
+        decode_claims('{"num": 1}')
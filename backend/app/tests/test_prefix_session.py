@@ -0,0 +1,162 @@
+import pytest
+import asyncio
+import json
+import httpx
+from app.services.analyzer_service import AnalyzerService
+from app.services.cache_service import AnalysisCache
+from app.services.claim_retriever import ClaimRetriever
+from app.services.fake_llm import FakeLLM
+from app.services.llm_client import OllamaClient, OpenAICompatibleClient
+from app.services.prefix_session import PrefixSession, PrefixSessionCache
+
+MOCK_PATENT = {
+    "publication_number": "US123",
+    "title": "Test Patent",
+    "abstract": "Test Abstract",
+    "claims": json.dumps([
+        {"num": 1, "text": "A shopping list generated from an advertisement " * 20},
+        {"num": 2, "text": "The shopping list of claim 1 shared with a user " * 20}
+    ])
+}
+
+MOCK_PRODUCTS = [{"name": f"Product {i}", "description": f"Test product {i}"} for i in range(4)]
+
+def make_session(context_length: int = 3) -> PrefixSession:
+    return PrefixSession(list(range(context_length)), None, prefix_tokens=context_length, eval_seconds=0.5)
+
+@pytest.fixture
+def fake():
+    """Fixture to create a fake LLM that charges for prompt tokens"""
+    return FakeLLM(prompt_tokens_per_second=100000)
+
+@pytest.fixture
+def analyzer_service(tmp_path, fake):
+    """Fixture to create an AnalyzerService in prefix session mode"""
+    service = AnalyzerService(
+        cache=AnalysisCache(tmp_path / "cache.json"),
+        claim_retriever=ClaimRetriever(tmp_path / "claim_index"),
+        client=OllamaClient("http://fake-llm", transport=httpx.ASGITransport(app=fake.app()))
+    )
+    service.prefix_sessions_enabled = True
+    return service
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_evaluation():
+    """Test concurrent misses for the same prefix evaluate it once"""
+    cache = PrefixSessionCache()
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return make_session()
+
+    sessions = await asyncio.gather(*[cache.get_or_create(("US1",), create) for _ in range(5)])
+    assert calls == 1
+    assert all(session is sessions[0] for session in sessions)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 4
+    assert cache.stats()["prefix_seconds_saved"] == 2.0
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_invalidate():
+    """Test the least recently used prefix is evicted first"""
+    cache = PrefixSessionCache(max_entries=2)
+
+    async def create():
+        return make_session()
+
+    for key in ("A", "B", "A", "C"):
+        await cache.get_or_create((key,), create)
+    assert cache.stats()["evictions"] == 1
+    assert (("A",) in cache._entries, ("B",) in cache._entries) == (True, False)
+
+    cache.invalidate(("A",))
+    assert ("A",) not in cache._entries
+
+@pytest.mark.asyncio
+async def test_failed_evaluation_raised_to_all_waiters():
+    """Test waiters see the evaluation error and nothing is cached"""
+    cache = PrefixSessionCache()
+
+    async def create():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *[cache.get_or_create(("US1",), create) for _ in range(3)],
+        return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.stats()["size"] == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_evaluation_is_taken_over_by_a_waiter():
+    """Test a waiter evaluates the prefix itself when the evaluating caller is cancelled"""
+    cache = PrefixSessionCache()
+    calls = 0
+
+    async def create():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return make_session()
+
+    creator = asyncio.create_task(cache.get_or_create(("US1",), create))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_create(("US1",), create))
+    await asyncio.sleep(0.01)
+    creator.cancel()
+
+    session = await waiter
+    assert creator.cancelled()
+    assert session.context == [0, 1, 2]
+    assert calls == 2
+    assert cache.stats()["size"] == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_the_evaluation():
+    """Test a waiter that goes away leaves the evaluation running for the others"""
+    cache = PrefixSessionCache()
+
+    async def create():
+        await asyncio.sleep(0.05)
+        return make_session()
+
+    creator = asyncio.create_task(cache.get_or_create(("US1",), create))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_create(("US1",), create))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+
+    assert (await creator).context == [0, 1, 2]
+    assert waiter.cancelled()
+
+@pytest.mark.asyncio
+async def test_fanout_evaluates_patent_prefix_once(analyzer_service, fake):
+    """Test each extra product only pays for its own turn"""
+    result = await analyzer_service.analyze_products_fanout_async(MOCK_PATENT, MOCK_PRODUCTS, top_k=4)
+
+    assert result["status_code"] == 200
+    assert {p["product_name"] for p in result["data"]} == {p["name"] for p in MOCK_PRODUCTS}
+    stats = analyzer_service.prefix_sessions.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 3
+    # One prefix evaluation plus one short turn per product
+    assert fake.requests == 5
+    metrics = analyzer_service.llm_metrics.stats()
+    full_prompt_tokens = analyzer_service.prefix_sessions._entries.popitem()[1].prefix_tokens
+    assert metrics["prompt_tokens"] < full_prompt_tokens + 4 * 400
+    await analyzer_service.client.aclose()
+
+@pytest.mark.asyncio
+async def test_sessions_skipped_without_context_support(analyzer_service, fake):
+    """Test OpenAI-compatible backends fall back to full prompts"""
+    analyzer_service.client = OpenAICompatibleClient(
+        "http://fake-llm", transport=httpx.ASGITransport(app=fake.app())
+    )
+    result = await analyzer_service.analyze_single_product_async(MOCK_PATENT, MOCK_PRODUCTS[0])
+    assert result["status_code"] == 200
+    assert analyzer_service.prefix_sessions.stats()["misses"] == 0
+    await analyzer_service.client.aclose()
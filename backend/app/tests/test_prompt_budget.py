@@ -0,0 +1,69 @@
+import pytest
+import json
+from app.services.claim_formatter import render_claims
+from app.services.patent_store import decode_claims
+from app.services.prompt_budget import PromptBudgeter, PromptTooLargeError, rank_claims_by_overlap
+from app.services.token_estimator import TokenEstimator
+
+CLAIMS = render_claims(decode_claims(json.dumps([
+    {"num": "1", "text": "A shopping list generated from a digital advertisement " * 5},
+    {"num": "2", "text": "A vehicle suspension with hydraulic dampers " * 5},
+    {"num": "3", "text": "The shopping list of claim 1 shared with another user " * 5}
+])))
+
+@pytest.fixture
+def estimator():
+    """Fixture to create a heuristic TokenEstimator"""
+    return TokenEstimator(scale=1.0)
+
+def test_estimator_counts_words_digits_and_punctuation(estimator):
+    """Test the heuristic counts digits and punctuation separately"""
+    assert estimator.count("") == 0
+    assert estimator.count("claim 12.") == estimator.count("claim") + 3
+    assert estimator.count("internationalization") > estimator.count("list")
+
+def test_all_claims_kept_when_they_fit(estimator):
+    """Test nothing is dropped when the budget is large enough"""
+    budgeter = PromptBudgeter(context_limit=10000, output_reserve=100, estimator=estimator)
+    prompt = budgeter.fit("HEAD\n", CLAIMS, "\nTAIL", "shopping list app")
+    assert prompt == "HEAD\n" + CLAIMS.text + "\nTAIL"
+
+def test_relevant_claims_selected_in_original_order(estimator):
+    """Test the budget keeps instructions and fills it with the most relevant claims"""
+    per_claim = max(c.tokens for c in CLAIMS.claims)
+    fixed = estimator.count("HEAD\n") + estimator.count("\nTAIL")
+    budgeter = PromptBudgeter(
+        context_limit=fixed + 2 * per_claim + 25,
+        output_reserve=0,
+        estimator=estimator
+    )
+    prompt = budgeter.fit("HEAD\n", CLAIMS, "\nTAIL", "shopping list advertisement app")
+
+    assert prompt.startswith("HEAD\n")
+    assert prompt.endswith("\nTAIL")
+    assert "Claim 2:" not in prompt
+    assert prompt.index("Claim 1:") < prompt.index("Claim 3:")
+    assert "2 of 3 claims" in prompt
+    assert budgeter.stats() == {"prompts": 1, "truncated": 1, "claims_dropped": 1, "rejected": 0}
+
+def test_prompt_without_room_for_an_independent_claim_is_refused(estimator):
+    """Test a prompt that could only show dependent claims, or none, is not built"""
+    claims = render_claims(decode_claims(json.dumps([
+        {"num": "1", "text": "A shopping list generated from a digital advertisement " * 10},
+        {"num": "2", "text": "The list of claim 1, shared."}
+    ])))
+    fixed = estimator.count("HEAD\n") + estimator.count("\nTAIL")
+    budgeter = PromptBudgeter(context_limit=fixed + claims.claims[0].tokens // 2, output_reserve=0, estimator=estimator)
+
+    with pytest.raises(PromptTooLargeError):
+        budgeter.fit("HEAD\n", claims, "\nTAIL", "shared list")
+    assert budgeter.select_claims(claims, "shared list", claims.claims[0].tokens // 2) == [claims.claims[1]]
+    with pytest.raises(PromptTooLargeError):
+        PromptBudgeter(context_limit=100, output_reserve=1024, estimator=estimator).fit("HEAD\n", CLAIMS, "\nTAIL", "")
+    assert budgeter.stats()["rejected"] == 1
+    assert budgeter.stats()["prompts"] == 0
+
+def test_rank_claims_by_overlap():
+    """Test claims sharing query terms rank first"""
+    ranked = rank_claims_by_overlap(CLAIMS.claims, "hydraulic suspension")
+    assert ranked[0].num == "2"
@@ -0,0 +1,53 @@
+import json
+from app.services.response_parser import IncrementalObjectParser, ParseMetrics, parse_tolerant, repair_json
+
+def feed_in_chunks(text, size):
+    """Feed text to a parser in fixed-size chunks and collect the objects"""
+    parser = IncrementalObjectParser()
+    objects = []
+    for i in range(0, len(text), size):
+        objects.extend(parser.feed(text[i:i + size]))
+    return objects
+
+def test_products_wrapped_in_object():
+    """Test objects inside a products array are yielded one by one"""
+    text = json.dumps({"products": [{"product_name": "A"}, {"product_name": "B"}]})
+    assert feed_in_chunks(text, 3) == [{"product_name": "A"}, {"product_name": "B"}]
+
+def test_top_level_array():
+    """Test a bare JSON array is handled too"""
+    text = json.dumps([{"product_name": "A"}])
+    assert feed_in_chunks(text, 1) == [{"product_name": "A"}]
+
+def test_braces_inside_strings_and_nested_objects():
+    """Test braces in strings and nested arrays do not split objects"""
+    product = {"explanation": "uses {json} and [lists]", "claims": [{"num": 1}], "quote": "a \"b\""}
+    text = json.dumps({"products": [product]})
+    assert feed_in_chunks(text, 5) == [product]
+
+def test_incomplete_object_is_not_yielded():
+    """Test a partially generated object is held back"""
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"products": [{"product_name": "A"}, {"product_') == [{"product_name": "A"}]
+
+def test_repair_strips_fences_and_trailing_commas():
+    """Test prose, code fences and trailing commas around valid JSON are repaired"""
+    text = 'Here you go:\n```json\n{"products": [{"product_name": "A, B",},],}\n```'
+    assert parse_tolerant(text) == ({"products": [{"product_name": "A, B"}]}, "repaired")
+    assert repair_json('{"text": "keep ,}"}') == '{"text": "keep ,}"}'
+
+def test_truncated_output_salvages_complete_objects():
+    """Test complete products are salvaged from output cut off mid-object"""
+    text = '{"products": [{"product_name": "A"}, {"product_name": "B"}, {"product_name": "C", "expl'
+    assert parse_tolerant(text) == ([{"product_name": "A"}, {"product_name": "B"}], "salvaged")
+    assert parse_tolerant('{"product_name": "A", "expl') == (None, "failed")
+
+def test_parse_metrics_salvage_rate():
+    """Test the salvage rate counts repaired and salvaged responses among malformed ones"""
+    metrics = ParseMetrics()
+    for outcome in ("clean", "repaired", "salvaged", "failed"):
+        metrics.record(outcome)
+    metrics.record_wasted(120)
+    stats = metrics.stats()
+    assert stats["salvage_rate"] == 0.667
+    assert stats["wasted_tokens"] == 120
@@ -0,0 +1,83 @@
+import pytest
+import json
+from unittest.mock import AsyncMock, Mock
+from app.services.data_service import DataService
+from app.services.screening_service import ProductScreener
+from app.database.models import ScreeningRequest
+from app.routers.analysis import run_screening
+
+MOCK_PATENT = {
+    "publication_number": "US123",
+    "title": "Generating shopping lists from digital advertisements",
+    "abstract": "Items in an advertisement are added to a shopping list.",
+    "claims": json.dumps([{"num": 1, "text": "A method of adding advertised items to a shopping list."}])
+}
+
+MOCK_COMPANIES = {"companies": [
+    {"name": "Grocer", "products": [
+        {"name": "List App", "description": "Shopping list with advertisement import"},
+        {"name": "Checkout", "description": "Self checkout kiosk"}
+    ]},
+    {"name": "Tractors", "products": [
+        {"name": "Harvester", "description": "Combine harvester with yield sensors"}
+    ]}
+]}
+
+@pytest.fixture
+def data_service():
+    """Fixture to create a DataService over mock data"""
+    service = DataService.__new__(DataService)
+    service.patents = [MOCK_PATENT]
+    service.companies = MOCK_COMPANIES
+    service.corpus = None
+    service._build_indexes()
+    return service
+
+@pytest.fixture
+def screener(data_service):
+    """Fixture to create a ProductScreener"""
+    return ProductScreener(data_service)
+
+def test_matrix_rows_are_normalized(screener):
+    """Test every product becomes a unit-length TF-IDF row"""
+    assert screener.matrix.shape[0] == 3
+    norms = (screener.matrix ** 2).sum(axis=1)
+    assert all(abs(norm - 1) < 1e-5 for norm in norms)
+
+def test_screen_ranks_similar_products_first(screener):
+    """Test the most similar product across all companies ranks first"""
+    results = screener.screen(MOCK_PATENT, top_k=2)
+    assert len(results) == 2
+    assert results[0]["company_name"] == "Grocer"
+    assert results[0]["product"]["name"] == "List App"
+    assert results[0]["similarity"] > results[1]["similarity"]
+
+def test_screen_top_k_larger_than_catalog(screener):
+    """Test top_k is capped at the catalog size"""
+    assert len(screener.screen(MOCK_PATENT, top_k=10)) == 3
+
+@pytest.mark.asyncio
+async def test_run_screening_analyzes_only_candidates(data_service, screener):
+    """Test only the top_k candidates are sent to the LLM and results are ordered by score"""
+    analyzer = Mock()
+    analyzer.fanout_concurrency = 2
+    analyzer.analyze_single_product_async = AsyncMock(side_effect=[
+        {"status_code": 200, "data": {"product_name": "List App", "infringement_score": 40}},
+        {"status_code": 503, "error": "LLM down"}
+    ])
+
+    result = await run_screening(
+        ScreeningRequest(patent_id="US123", top_k=2), data_service, analyzer, screener
+    )
+
+    assert analyzer.analyze_single_product_async.await_count == 2
+    data = result["data"]
+    assert data["products_screened"] == 3
+    assert data["candidates"][0]["analysis"]["infringement_score"] == 40
+    assert data["candidates"][1]["error"] == "LLM down"
+
+@pytest.mark.asyncio
+async def test_run_screening_unknown_patent(data_service, screener):
+    """Test screening an unknown patent returns 404"""
+    result = await run_screening(ScreeningRequest(patent_id="NOPE"), data_service, Mock(), screener)
+    assert result["status_code"] == 404
@@ -0,0 +1,107 @@
+import pytest
+import numpy as np
+from app.services.semantic_index import HashingEmbedder, SemanticIndex, quantize
+
+DOCUMENTS = [
+    ("US1", "Robotic lawnmower. A solar powered robotic lawnmower with a cutting blade."),
+    ("US2", "Shopping list. Generating a shopping list from a digital advertisement."),
+    ("US3", "Kitchen blender. A blender with a blade driven by an electric motor."),
+]
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder recording how many texts it embedded"""
+
+    def __init__(self):
+        super().__init__(dim=512)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+@pytest.fixture
+def embedder():
+    return CountingEmbedder()
+
+@pytest.fixture
+def index(tmp_path, embedder):
+    """Fixture to create a SemanticIndex holding DOCUMENTS, persisted to a temporary directory"""
+    index = SemanticIndex(embedder, tmp_path / "semantic_index")
+    index.sync(DOCUMENTS)
+    return index
+
+def test_embeddings_are_stable_unit_vectors():
+    """Test embeddings are normalised and identical across embedder instances"""
+    vectors = HashingEmbedder(64).embed(["robotic mower", ""])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1)
+    assert not vectors[1].any()
+    assert np.array_equal(vectors, HashingEmbedder(64).embed(["robotic mower", ""]))
+
+def test_embeddings_share_word_pieces():
+    """Test inflected words are closer than unrelated ones"""
+    vectors = HashingEmbedder().embed(["mowing lawns", "lawn mower", "antibody chain"])
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_quantize_keeps_similarities(dtype):
+    """Test quantized vectors score close to the float vectors"""
+    vectors = HashingEmbedder(128).embed([text for _, text in DOCUMENTS])
+    quantized, scales = quantize(vectors, dtype)
+    assert quantized.dtype == np.dtype(dtype)
+    restored = quantized.astype(np.float32) * scales[:, None]
+    assert np.allclose(restored @ vectors[0], vectors @ vectors[0], atol=0.02)
+
+def test_search_ranks_similar_patents_first(index):
+    """Test a product description finds the patent about the same thing"""
+    results = index.search("Robot mower charged by a solar panel", limit=2)
+    assert [key for key, _ in results][0] == "US1"
+    assert len(results) == 2
+    assert results[0][1] >= results[1][1]
+
+def test_search_scans_in_chunks(tmp_path):
+    """Test the running top-k over chunks matches a single pass"""
+    chunked = SemanticIndex(HashingEmbedder(), chunk_size=1)
+    chunked.sync(DOCUMENTS)
+    whole = SemanticIndex(HashingEmbedder())
+    whole.sync(DOCUMENTS)
+    assert chunked.search("blade", limit=3) == whole.search("blade", limit=3)
+
+def test_index_is_persisted_and_reloaded(index, tmp_path, embedder):
+    """Test a new index on the same directory answers without re-embedding"""
+    reloaded = SemanticIndex(embedder, tmp_path / "semantic_index")
+    embedded = embedder.embedded
+    assert reloaded.sync(DOCUMENTS) == {"added": 0, "updated": 0, "deleted": 0}
+    assert embedder.embedded == embedded
+    assert reloaded.search("blender motor") == index.search("blender motor")
+
+def test_changed_embedder_re_embeds(index, tmp_path):
+    """Test vectors from a different embedder are not reused"""
+    reloaded = SemanticIndex(HashingEmbedder(dim=64), tmp_path / "semantic_index")
+    assert len(reloaded) == 0
+    assert reloaded.sync(DOCUMENTS)["added"] == 3
+
+def test_sync_only_embeds_changes(index, embedder):
+    """Test only changed and new patents are embedded and missing ones removed"""
+    embedded = embedder.embedded
+    changed = [
+        ("US1", "Snow plough. A robotic snow plough with a heated blade."),
+        DOCUMENTS[1],
+        ("US4", "Snow blower with an auger."),
+    ]
+    assert index.sync(changed) == {"added": 1, "updated": 1, "deleted": 1}
+    assert embedder.embedded == embedded + 2
+    assert [key for key, _ in index.search("snow", limit=3)][:2] in (["US1", "US4"], ["US4", "US1"])
+    assert len(index) == 3
+
+def test_inverted_lists_probe_nearest_rows(tmp_path):
+    """Test the approximate index finds the same best match and follows updates"""
+    index = SemanticIndex(HashingEmbedder(), tmp_path / "semantic_index", ann_min_size=2, nprobe=1)
+    index.sync(DOCUMENTS)
+    assert index.stats()["lists"] == 1
+    assert index.search("solar lawnmower", limit=1) == index.search("solar lawnmower", limit=1, exact=True)
+
+    index.sync(DOCUMENTS + [("US4", "Snow blower with an auger.")])
+    assert len(index.lists) == 4
+    reloaded = SemanticIndex(HashingEmbedder(), tmp_path / "semantic_index", ann_min_size=2, nprobe=1)
+    assert np.array_equal(reloaded.lists, index.lists)
+    assert reloaded.search("snow blower", limit=1)[0][0] == "US4"
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_run():
+    """Test callers with the same key attach to the call in flight"""
+    flight = SingleFlight()
+    runs = []
+
+    async def call():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return {"status_code": 200}
+
+    results = await asyncio.gather(*(flight.do("key", call) for _ in range(3)))
+
+    assert len(runs) == 1
+    assert results == [{"status_code": 200}] * 3
+    stats = flight.stats()
+    assert stats["coalesced"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["seconds_saved"] >= 0.09
+
+@pytest.mark.asyncio
+async def test_finished_call_is_not_reused():
+    """Test a key is released once its call finishes"""
+    flight = SingleFlight()
+    runs = []
+
+    async def call():
+        runs.append(1)
+        return len(runs)
+
+    assert await flight.do("key", call) == 1
+    assert await flight.do("key", call) == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    """Test the shared call keeps running while another caller waits"""
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", call))
+    second = asyncio.create_task(flight.do("key", call))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+@pytest.mark.asyncio
+async def test_last_caller_leaving_cancels_call():
+    """Test the shared call is cancelled when nobody waits for it"""
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def call():
+        started.set()
+        await asyncio.sleep(10)
+
+    caller = asyncio.create_task(flight.do("key", call))
+    await started.wait()
+    caller.cancel()
+    await asyncio.gather(caller, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert flight.stats()["in_flight"] == 0
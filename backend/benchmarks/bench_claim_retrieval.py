@@ -0,0 +1,92 @@
+"""
+Benchmark the BM25 claim pre-filter on a fixed evaluation set.
+
+The evaluation set is every shipped patent paired with every shipped company
+product. Prompt tokens are compared with the pre-filter off (all claims, cut
+only by the context budget) and on (independent claims + top-N). With --llm N
+the first N pairs are also sent to the configured Ollama host under both
+settings to compare latency and infringement likelihood labels.
+
+    cd backend
+    python -m benchmarks.bench_claim_retrieval --top-n 8 --llm 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from statistics import mean
+from typing import Dict, List, Tuple
+
+from app.services.analyzer_service import AnalyzerService
+from app.services.cache_service import AnalysisCache
+from app.services.claim_retriever import ClaimRetriever
+from app.services.token_estimator import estimate_tokens
+
+DATA_DIR = Path(__file__).parent.parent / "app" / "data"
+
+
+def evaluation_set() -> List[Tuple[Dict, Dict]]:
+    """Every (patent, product) pair in the shipped data, in file order"""
+    with open(DATA_DIR / "patents.json") as f:
+        patents = json.load(f)
+    with open(DATA_DIR / "company_products.json") as f:
+        companies = json.load(f)["companies"]
+    products = [product for company in companies for product in company["products"]]
+    return [(patent, product) for patent in patents for product in products]
+
+
+def prompt_tokens(analyzer: AnalyzerService, pairs: List[Tuple[Dict, Dict]]) -> Tuple[List[int], float]:
+    """Prompt token counts and mean build time per prompt"""
+    start = time.perf_counter()
+    counts = [estimate_tokens(analyzer._create_single_product_prompt(p, product)) for p, product in pairs]
+    return counts, (time.perf_counter() - start) / len(pairs)
+
+
+async def run_llm(analyzer: AnalyzerService, pairs: List[Tuple[Dict, Dict]]) -> List[Tuple[float, Dict]]:
+    """Latency and result of each pair, uncached"""
+    results = []
+    for patent, product in pairs:
+        start = time.perf_counter()
+        result = await analyzer.analyze_single_product_async(patent, product, use_cache=False)
+        results.append((time.perf_counter() - start, result.get("data") or {}))
+    await analyzer.client.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-n", type=int, default=8)
+    parser.add_argument("--llm", type=int, default=0, help="pairs to run through the LLM")
+    args = parser.parse_args()
+
+    pairs = evaluation_set()
+    baseline = AnalyzerService(cache=AnalysisCache(None), claim_retriever=ClaimRetriever(None, top_n=0))
+    filtered = AnalyzerService(cache=AnalysisCache(None), claim_retriever=ClaimRetriever(None, top_n=args.top_n))
+
+    base_tokens, base_seconds = prompt_tokens(baseline, pairs)
+    filtered_tokens, filtered_seconds = prompt_tokens(filtered, pairs)
+    ratios = [b / f for b, f in zip(base_tokens, filtered_tokens)]
+
+    print(f"{len(pairs)} patent/product pairs, top_n={args.top_n}")
+    print(f"{'':<28}{'all claims':>14}{'pre-filter':>14}")
+    print(f"{'mean prompt tokens':<28}{mean(base_tokens):>14.0f}{mean(filtered_tokens):>14.0f}")
+    print(f"{'max prompt tokens':<28}{max(base_tokens):>14}{max(filtered_tokens):>14}")
+    print(f"{'prompt build (ms)':<28}{base_seconds * 1000:>14.3f}{filtered_seconds * 1000:>14.3f}")
+    print(f"token reduction: {mean(base_tokens) / mean(filtered_tokens):.2f}x overall, "
+          f"{min(ratios):.2f}x-{max(ratios):.2f}x per prompt")
+
+    if args.llm:
+        sample = pairs[:args.llm]
+        base_runs = asyncio.run(run_llm(baseline, sample))
+        filtered_runs = asyncio.run(run_llm(filtered, sample))
+        agree = sum(
+            b.get("infringement_likelihood") == f.get("infringement_likelihood")
+            for (_, b), (_, f) in zip(base_runs, filtered_runs)
+        )
+        print(f"LLM mean latency: {mean(t for t, _ in base_runs):.2f}s -> {mean(t for t, _ in filtered_runs):.2f}s")
+        print(f"likelihood agreement: {agree}/{len(sample)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark patent lookups and prompt claim formatting.
+
+Compares the previous linear scans / per-request claim decoding with the
+indexed PatentStore and the memoized ClaimFormatter on a synthetic corpus
+built by cloning patents.json.
+
+    cd backend
+    python -m benchmarks.bench_data_service --patents 100000
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from app.services.analyzer_service import AnalyzerService
+from app.services.cache_service import AnalysisCache
+from app.services.data_service import DataService
+
+DATA_DIR = Path(__file__).parent.parent / "app" / "data"
+
+
+def synthetic_corpus(size: int) -> List[Dict]:
+    """Clone the shipped patents under unique publication numbers"""
+    with open(DATA_DIR / "patents.json") as f:
+        seed = json.load(f)
+    corpus = []
+    for i in range(size):
+        patent = dict(seed[i % len(seed)])
+        patent["publication_number"] = f"US-{i:09d}-B1"
+        corpus.append(patent)
+    return corpus
+
+
+def timeit(fn: Callable, args: List, repeat: int = 1) -> float:
+    """Mean seconds per call of fn over args"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for arg in args:
+            fn(arg)
+    return (time.perf_counter() - start) / (len(args) * repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patents", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.patents)
+    ids = [p["publication_number"] for p in random.sample(corpus, args.queries)]
+
+    service = DataService.__new__(DataService)
+    service.patents = corpus
+    service.companies = {"companies": []}
+    service.corpus = None
+    start = time.perf_counter()
+    service._build_indexes()
+    build_seconds = time.perf_counter() - start
+
+    def linear_scan(patent_id):
+        return next((p for p in corpus if p["publication_number"] == patent_id), None)
+
+    analyzer = AnalyzerService(cache=AnalysisCache(None), data_service=service)
+
+    def format_raw(patent_id):
+        return analyzer._format_claims(linear_scan(patent_id)["claims"])
+
+    def format_decoded(patent_id):
+        return analyzer._format_claims(analyzer._get_claims(service.get_patent(patent_id)))
+
+    def format_memoized(patent_id):
+        return analyzer._formatted_claims(service.get_patent(patent_id)).text
+
+    scan_queries = ids[:max(1, args.queries // 10)]
+    results = [
+        ("get_patent (linear scan)", timeit(linear_scan, scan_queries)),
+        ("get_patent (indexed)", timeit(service.get_patent, ids, repeat=100)),
+        ("lookup + format claims (raw JSON)", timeit(format_raw, scan_queries)),
+        ("lookup + format claims (pre-decoded)", timeit(format_decoded, ids)),
+        ("lookup + format claims (memoized)", timeit(format_memoized, ids, repeat=10)),
+    ]
+
+    print(f"corpus: {args.patents} patents, index build {build_seconds:.2f}s")
+    for name, seconds in results:
+        print(f"{name:40s} {seconds * 1e6:12.1f} us/op")
+    print(f"lookup speedup: {results[0][1] / results[1][1]:.0f}x")
+    print(f"lookup + prompt claims speedup: {results[2][1] / results[3][1]:.0f}x (decoded),"
+          f" {results[2][1] / results[4][1]:.0f}x (memoized)")
+
+
+if __name__ == "__main__":
+    main()
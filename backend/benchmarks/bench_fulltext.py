@@ -0,0 +1,113 @@
+"""
+Benchmark FullTextIndex on a synthetic corpus grown from the shipped patents.
+
+Every synthetic patent stitches each field together from random spans of the
+same field in the real corpus, so term frequencies and adjacent-word
+statistics (and thus phrase hits) stay realistic at any size. The corpus is
+indexed in batches through sync(), as new patents would arrive, then queried
+with free terms, quoted phrases and both, drawn from the real text.
+
+    cd backend
+    python -m benchmarks.bench_fulltext --patents 1000000
+"""
+import argparse
+import random
+import resource
+import tempfile
+import time
+from statistics import mean
+from typing import Dict, Iterable, List, Tuple
+
+from app.services.claim_retriever import tokenize
+from app.services.data_service import DataService
+from app.services.fulltext_index import FIELD_BOOSTS, FullTextIndex, patent_documents
+
+# Synthetic field lengths in tokens; descriptions are kept short to fit 1M patents in memory
+LENGTHS = {"title": 6, "abstract": 40, "claims": 60, "description": 60}
+
+
+def source_streams() -> Dict[str, List[str]]:
+    streams: Dict[str, List[str]] = {field: [] for field in FIELD_BOOSTS}
+    for _, fields in patent_documents(DataService()):
+        for field, text in fields.items():
+            streams[field].extend(tokenize(text))
+    return streams
+
+
+def synthetic_documents(streams: Dict[str, List[str]], start: int, count: int, scale: float, seed: int = 0) -> Iterable[Tuple[str, Dict[str, str]]]:
+    rng = random.Random(seed + start)
+    for i in range(start, start + count):
+        fields = {}
+        for field, stream in streams.items():
+            words: List[str] = []
+            target = max(1, int(LENGTHS[field] * scale))
+            while len(words) < target:
+                offset = rng.randrange(len(stream))
+                words.extend(stream[offset:offset + rng.randint(4, 12)])
+            fields[field] = " ".join(words[:target])
+        yield f"US-{10_000_000 + i}-B2", fields
+
+
+def queries(streams: Dict[str, List[str]], count: int, seed: int = 1) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    text = streams["abstract"] + streams["claims"]
+
+    def window(size: int) -> List[str]:
+        offset = rng.randrange(len(text) - size)
+        return text[offset:offset + size]
+
+    return {
+        "2 terms": [" ".join(window(2)) for _ in range(count)],
+        "4 terms": [" ".join(rng.sample(text, 4)) for _ in range(count)],
+        "phrase": [f'"{" ".join(window(2))}"' for _ in range(count)],
+        "phrase+terms": [f'"{" ".join(window(3))}" {" ".join(rng.sample(text, 2))}' for _ in range(count)],
+    }
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patents", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=50_000, help="patents per sync() call, i.e. per segment")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the synthetic field lengths")
+    parser.add_argument("--queries", type=int, default=200, help="queries per type")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    streams = source_streams()
+    with tempfile.TemporaryDirectory() as index_dir:
+        # No merges while loading: the benchmark measures queries over the resulting segments
+        index = FullTextIndex(index_dir, max_segments=args.patents // args.batch + 1)
+        start = time.perf_counter()
+        for offset in range(0, args.patents, args.batch):
+            index.sync(synthetic_documents(streams, offset, min(args.batch, args.patents - offset), args.scale), delete_missing=False)
+        stats = index.stats()
+        print(f"{args.patents} patents indexed in {time.perf_counter() - start:.1f}s: {stats}")
+
+        count = len(index)
+        del index
+        start = time.perf_counter()
+        reopened = FullTextIndex(index_dir)
+        assert len(reopened) == count
+        print(f"reloaded in {time.perf_counter() - start:.1f}s, peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        print(f"{'query type':<14} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'matches':>10}")
+        for kind, batch in queries(streams, args.queries).items():
+            latencies, totals = [], []
+            for query in batch:
+                begin = time.perf_counter()
+                total, _ = reopened.search(query, args.limit)
+                latencies.append(time.perf_counter() - begin)
+                totals.append(total)
+            latencies.sort()
+            print(
+                f"{kind:<14} {percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+                f"{latencies[-1] * 1000:>8.2f} {mean(totals):>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark FuzzyMatcher.find_patent on a synthetic corpus of publication numbers.
+
+Ids follow the shipped data (US-11950524-B2, US-RE49889-E1, ...): mostly
+consecutive US grant numbers plus EP/WO publications. Queries are what the
+search box sends: growing prefixes of an id as it is typed, full ids, and full
+ids with one mistyped digit. Latency is reported per query type for the
+n-gram index and, on a sample, for the previous linear scan; results are
+checked to be identical.
+
+    cd backend
+    python -m benchmarks.bench_patent_search --patents 1000000
+"""
+import argparse
+import random
+import time
+from statistics import mean
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from rapidfuzz import fuzz
+
+from app.services.fuzzy_matcher import FuzzyMatcher
+
+
+TITLE_WORDS = ["solar", "robotic", "wireless", "battery", "lawn", "seed", "sensor", "vehicle", "optical", "data"]
+
+
+def synthetic_patents(count: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    patents = []
+    number = 10_000_000
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.8:
+            number += rng.randint(1, 3)
+            publication_number = f"US-{number}-{rng.choice(['B1', 'B2'])}"
+        elif roll < 0.82:
+            publication_number = f"US-RE{rng.randint(40000, 49999)}-E1"
+        else:
+            publication_number = f"{rng.choice(['EP', 'WO'])}-{rng.randint(1_000_000, 4_999_999)}-A1"
+        title = f"{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {rng.choice(['system', 'method', 'device'])}"
+        patents.append({"id": i, "publication_number": publication_number, "title": title})
+    return patents
+
+
+def queries(patents: List[Dict], count: int, seed: int = 1) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    picked = [rng.choice(patents)["publication_number"] for _ in range(count)]
+    typed = [pid[:rng.randint(4, len(pid) - 1)] for pid in picked]
+    typos = []
+    for pid in picked:
+        digits = [i for i, c in enumerate(pid) if c.isdigit()]
+        i = rng.choice(digits)
+        typos.append(pid[:i] + str((int(pid[i]) + 1) % 10) + pid[i + 1:])
+    return {"typed prefix": typed, "full id": picked, "one typo": typos}
+
+
+def linear_find_patent(patents: List[Dict], query: str, threshold: int = 80) -> List[Dict]:
+    """find_patent before the index: every id scored in a Python loop"""
+    query = query.upper().replace(" ", "")
+    matches = []
+    for patent in patents:
+        patent_id = patent["publication_number"]
+        if query == patent_id:
+            matches.append((patent, 100))
+            continue
+        if query in patent_id:
+            matches.append((patent, 90))
+            continue
+        ratio = fuzz.ratio(query, patent_id)
+        if ratio >= threshold:
+            matches.append((patent, ratio))
+    return [
+        {"patent": patent, "confidence": score, "is_exact": score == 100}
+        for patent, score in sorted(matches, key=lambda x: x[1], reverse=True)
+    ]
+
+
+def timed(search: Callable[[str], List[Dict]], batch: List[str]):
+    latencies, sizes = [], []
+    for query in batch:
+        start = time.perf_counter()
+        sizes.append(len(search(query)))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies, sizes
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=300, help="queries per type")
+    parser.add_argument("--linear", type=int, default=5, help="queries per type also run through the linear scan")
+    args = parser.parse_args()
+
+    patents = synthetic_patents(args.patents)
+    data_service = SimpleNamespace(get_patents=lambda: patents, get_companies=lambda: [])
+    start = time.perf_counter()
+    matcher = FuzzyMatcher(data_service)
+    print(f"{args.patents} ids indexed in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'query type':<14} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'matches':>8} {'linear ms':>10}")
+    for kind, batch in queries(patents, args.queries).items():
+        latencies, sizes = timed(matcher.find_patent, batch)
+        linear = ""
+        if args.linear:
+            sample = batch[:args.linear]
+            linear_latencies, _ = timed(lambda q: linear_find_patent(patents, q), sample)
+            for query in sample:
+                assert matcher.find_patent(query) == linear_find_patent(patents, query), query
+            linear = f"{mean(linear_latencies) * 1000:>10.2f}"
+        print(
+            f"{kind:<14} {percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+            f"{latencies[-1] * 1000:>8.2f} {mean(sizes):>8.0f} {linear}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark SemanticIndex: embedding throughput on the shipped patents and
+brute-force top-k latency over a large embedding matrix.
+
+The matrix is filled with noisy blends of the shipped patents' vectors, so
+search latency at 1M patents is measured without embedding 1M texts; the
+embedding rate shows how long a real build of that size would take. Exact
+brute-force search is compared with the inverted-file index, whose recall is
+the share of the exact top-k it returns.
+
+    cd backend
+    python -m benchmarks.bench_semantic --patents 1000000
+"""
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.data_service import DataService
+from app.services.semantic_index import SemanticIndex, embedder_from_env, patent_texts, quantize
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=32)
+    args = parser.parse_args()
+
+    data_service = DataService()
+    embedder = embedder_from_env()
+    texts = [text for _, text in patent_texts(data_service)]
+    start = time.perf_counter()
+    vectors = embedder.embed(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{embedder.name}: {len(texts) / elapsed:.0f} patents/s embedded, "
+          f"{args.patents * elapsed / len(texts) / 60:.1f} min for {args.patents}")
+
+    rng = np.random.default_rng(0)
+
+    def matrix(dtype: str):
+        """Blends of two patents' vectors plus noise, quantized chunk by chunk"""
+        parts, scales = [], []
+        for start in range(0, args.patents, 65536):
+            size = min(65536, args.patents - start)
+            chunk = vectors[rng.integers(len(vectors), size=size)] + 0.5 * vectors[rng.integers(len(vectors), size=size)]
+            chunk += rng.normal(scale=0.05, size=chunk.shape).astype(np.float32)
+            chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+            quantized, chunk_scales = quantize(chunk, dtype)
+            parts.append(quantized)
+            scales.append(chunk_scales)
+        return np.concatenate(parts), np.concatenate(scales)
+
+    queries = [product["product"]["description"] for product in data_service.get_products()][:args.queries]
+
+    def timed(index: SemanticIndex, exact: bool):
+        latencies, results = [], []
+        for query in queries:
+            begin = time.perf_counter()
+            results.append({key for key, _ in index.search(query, args.limit, exact=exact)})
+            latencies.append(time.perf_counter() - begin)
+        latencies.sort()
+        return latencies, results
+
+    print(f"{'dtype':<8} {'MB':>6} {'exact p50':>10} {'p99':>8} {'ivf p50':>8} {'p99':>8} {'recall':>7}")
+    for dtype in ("int8", "float16"):
+        index = SemanticIndex(embedder, dtype=dtype, nprobe=args.nprobe)
+        index.vectors, index.scales = matrix(dtype)
+        index.keys = [f"US-{10_000_000 + i}-B2" for i in range(args.patents)]
+        exact, expected = timed(index, exact=True)
+        start = time.perf_counter()
+        index.train_lists()
+        trained = time.perf_counter() - start
+        approximate, found = timed(index, exact=False)
+        recall = np.mean([len(a & b) / len(a) for a, b in zip(expected, found)])
+        print(f"{dtype:<8} {index.stats()['matrix_bytes'] / 2**20:>6.0f} "
+              f"{percentile(exact, 0.5) * 1000:>10.1f} {percentile(exact, 0.99) * 1000:>8.1f} "
+              f"{percentile(approximate, 0.5) * 1000:>8.1f} {percentile(approximate, 0.99) * 1000:>8.1f} "
+              f"{recall:>7.3f}  ({index.stats()['lists']} lists trained in {trained:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark startup time and memory of the data layer.
+
+"per-router" reproduces the old layout where each of the three routers built
+its own DataService; "shared" uses the process-wide instance from
+app.dependencies. The fork test loads the shared corpus, forks workers that
+walk every patent and reports how much memory each worker had to copy
+(Private_Dirty, Linux only), with and without gc.freeze().
+
+    cd backend
+    python -m benchmarks.bench_startup
+"""
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+SCENARIOS = {
+    "per-router": "services = [DataService() for _ in range(3)]\n",
+    "shared": "services = [get_data_service() for _ in range(3)]\n",
+}
+
+
+def run_scenario(name: str) -> dict:
+    """Run a scenario in a fresh interpreter and collect its load time and RSS growth"""
+    code = (
+        "import time, resource, json\n"
+        "from app.services.data_service import DataService\n"
+        "from app.dependencies import get_data_service\n"
+        "rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "start = time.perf_counter()\n"
+        + SCENARIOS[name] +
+        "print(json.dumps({'seconds': time.perf_counter() - start,"
+        " 'data_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def private_dirty_kb() -> int:
+    """Private_Dirty of the current process in kB, or -1 if unavailable"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Private_Dirty:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def fork_workers(freeze: bool, workers: int = 2) -> list:
+    """Fork workers after loading the corpus and report what each one copied"""
+    from app.dependencies import get_data_service
+    service = get_data_service()
+    if freeze:
+        gc.freeze()
+
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            before = private_dirty_kb()
+            gc.collect()
+            for patent in service.get_patents():
+                service.get_patent(patent["publication_number"])
+            os.write(write_fd, str(private_dirty_kb() - before).encode())
+            os._exit(0)
+        os.close(write_fd)
+        results.append(int(os.read(read_fd, 64) or b"-1"))
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+
+    if freeze:
+        gc.unfreeze()
+    return results
+
+
+def main():
+    for name in SCENARIOS:
+        result = run_scenario(name)
+        print(
+            f"{name:12s} load {result['seconds'] * 1000:8.1f} ms"
+            f"   RSS growth {result['data_rss_kb'] / 1024:8.1f} MB"
+        )
+
+    if hasattr(os, "fork"):
+        for freeze in (False, True):
+            copied = fork_workers(freeze)
+            label = "gc.freeze" if freeze else "no freeze"
+            print(f"fork ({label}): private memory copied per worker (kB): {copied}")
+
+
+if __name__ == "__main__":
+    main()
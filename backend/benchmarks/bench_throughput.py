@@ -0,0 +1,91 @@
+"""
+End-to-end analysis throughput against the deterministic fake LLM.
+
+Runs /api/analysis/batch's pipeline (run_batch) over every shipped
+patent x company pair with LLM_BACKEND=fake, so queuing, concurrency and
+caching can be measured without a GPU. The fake's latency and token rates
+default to roughly a 7B model on one consumer GPU.
+
+    cd backend
+    python -m benchmarks.bench_throughput --pairs 30 --concurrency 1 4 8
+    python -m benchmarks.bench_throughput --strategy fanout --prefix-sessions
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pairs", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=20000.0)
+    parser.add_argument("--strategy", choices=["single_prompt", "fanout", "two_phase"], default="single_prompt")
+    parser.add_argument("--prefix-sessions", action="store_true", help="reuse patent prefixes (fanout)")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp())
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": str(args.latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_PROMPT_TOKENS_PER_SECOND": str(args.prompt_tokens_per_second),
+        "OLLAMA_MAX_CONCURRENCY": str(max(args.concurrency)),
+        "ANALYSIS_CACHE_PATH": str(workdir / "cache.json"),
+        "CLAIM_INDEX_DIR": str(workdir / "claim_index"),
+        "PREFIX_SESSIONS": "true" if args.prefix_sessions else "false",
+    })
+    from app.database.models import BatchRequest
+    from app.dependencies import get_analyzer_service, get_data_service
+    from app.routers.analysis import run_batch
+
+    data_service = get_data_service()
+    companies = [c["name"] for c in data_service._companies_list()]
+    pairs = [
+        {"patent_id": patent["publication_number"], "company_name": company}
+        for patent in data_service.get_patents()
+        for company in companies
+    ][:args.pairs]
+    analyzer = get_analyzer_service()
+
+    async def run(concurrency: int, bypass_cache: bool) -> dict:
+        request = BatchRequest(
+            pairs=pairs,
+            concurrency=concurrency,
+            bypass_cache=bypass_cache,
+            strategy=args.strategy
+        )
+        summary = None
+        async for event in run_batch(request):
+            if event["event"] == "summary":
+                summary = event
+        return summary
+
+    async def bench():
+        print(f"{len(pairs)} pairs, strategy={args.strategy}, prefix sessions={args.prefix_sessions}, "
+              f"fake LLM latency={args.latency}s, {args.tokens_per_second:.0f} tok/s")
+        print(f"{'concurrency':<14}{'cache':<8}{'pairs/min':>12}{'seconds':>10}{'failed':>8}")
+        for concurrency in args.concurrency:
+            analyzer.cache.clear()
+            analyzer.llm_metrics.reset()
+            for label, bypass in (("cold", True), ("warm", False)):
+                start = time.perf_counter()
+                summary = await run(concurrency, bypass)
+                print(f"{concurrency:<14}{label:<8}{summary['pairs_per_minute']:>12.0f}"
+                      f"{time.perf_counter() - start:>10.2f}{summary['failed']:>8}")
+            metrics = analyzer.llm_metrics.stats()
+            print(f"{'':<14}prompt tokens evaluated: {metrics['prompt_tokens']}, "
+                  f"prompt eval {metrics['phases']['prompt_eval']['total_seconds']:.2f}s "
+                  f"over {metrics['generations']} generations")
+        await analyzer.client.aclose()
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()